@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from socket_server import app as socket_app
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+# The socket server authenticates against Django models, so load the apps first.
+django.setup()
+
+from backend.socket_server import app as socket_app  # noqa: E402
 
 application = socket_app
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from datetime import timedelta
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -66,6 +67,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "organizations.context.OrganizationContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -90,11 +92,31 @@ TEMPLATES = [
 WSGI_APPLICATION = "backend.wsgi.application"
 ASGI_APPLICATION = "backend.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+# With REDIS_URL set, channel layers, Socket.IO (see backend.socket_backends)
+# and the Django cache go through Redis, so several ASGI workers can serve the
+# same rooms and see each other's cache invalidations. Without it everything
+# stays in-process, which is enough for development.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
     }
-}
 
 
 # Database
@@ -134,6 +156,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing (core.hashers). The selected profile hashes new passwords;
+# the others stay listed so existing hashes verify and upgrade on login.
+# Compare profiles with `manage.py benchmark_password_hashers`.
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": "core.hashers.TunedPBKDF2PasswordHasher",
+    "scrypt": "core.hashers.TunedScryptPasswordHasher",
+    "argon2": "core.hashers.TunedArgon2PasswordHasher",  # needs argon2-cffi
+}
+PASSWORD_HASHER_PROFILE = os.environ.get("PASSWORD_HASHER_PROFILE", "pbkdf2")
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    hasher
+    for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+    if profile != PASSWORD_HASHER_PROFILE
+]
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", str(19 * 1024)))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", "1"))
+SCRYPT_WORK_FACTOR = int(os.environ.get("SCRYPT_WORK_FACTOR", str(2**14)))
+# Processes used to hash passwords of bulk user creation (default: CPU count).
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "0")) or None
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -185,6 +229,9 @@ CORS_ALLOWED_ORIGINS = [
     "https://zealous-pond-01ec7c503.3.azurestaticapps.net",
 ]
 CORS_ALLOW_CREDENTIALS = True
+# Conditional GETs on Kanban boards need the ETag round trip across origins
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
 
 # Session cookie settings for cross-origin authentication
 SESSION_COOKIE_SAMESITE = 'None'
@@ -202,6 +249,65 @@ SESSION_COOKIE_AGE = 60 * 30  # 30 minutes
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+# AUTH_MODE=jwt: API requests authenticate from the JWT access token alone
+# (core.jwt_auth) and never read or write a session; sessions are kept only
+# for SESSION_PATH_PREFIXES (the admin site). The default "session" mode keeps
+# session login alongside the tokens.
+AUTH_MODE = os.environ.get("AUTH_MODE", "session")
+SESSION_PATH_PREFIXES = ("/admin/",)
+if AUTH_MODE == "jwt":
+    MIDDLEWARE = [
+        {
+            "django.contrib.sessions.middleware.SessionMiddleware": "core.jwt_auth.AdminSessionMiddleware",
+            "django.contrib.auth.middleware.AuthenticationMiddleware": "core.jwt_auth.TokenAuthenticationMiddleware",
+        }.get(middleware, middleware)
+        for middleware in MIDDLEWARE
+    ]
+    # Admin sessions are short and interactive; they need no write per request.
+    SESSION_SAVE_EVERY_REQUEST = False
+    # Session-backed message storage would need a session on every request.
+    MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+# Cached permissions and calendar data are invalidated with cache.delete
+# (core.permissions_checker.invalidate_cached), which only reaches other worker
+# processes through a shared cache. Without REDIS_URL every process has its own
+# LocMemCache, so these timeouts drop to LOCAL_CACHE_TIMEOUT: a revoked tag or
+# membership, or an edited event, can still be served by another worker for
+# that long. Run several workers only with REDIS_URL set.
+LOCAL_CACHE_TIMEOUT = 5
+
+# How long compiled tag-permission bitsets stay cached (seconds)
+TAG_PERMISSION_CACHE_TIMEOUT = 60 * 5 if REDIS_URL else LOCAL_CACHE_TIMEOUT
+
+# How long a request's resolved organization/membership is reused across
+# requests (seconds, 0 disables)
+ORGANIZATION_CONTEXT_CACHE_TIMEOUT = 30 if REDIS_URL else LOCAL_CACHE_TIMEOUT
+
+# How long Kanban board change log entries are kept for delta sync (days)
+KANBAN_CHANGE_RETENTION_DAYS = 7
+
+# How long a chat's approximate message count stays cached (seconds)
+MESSAGE_COUNT_CACHE_TIMEOUT = 60 * 5
+
+# How long expanded occurrences of a recurring event are cached per window
+# (seconds), and how far ahead open-ended requests expand endless series (days)
+CALENDAR_OCCURRENCE_CACHE_TIMEOUT = 60 * 5 if REDIS_URL else LOCAL_CACHE_TIMEOUT
+CALENDAR_RECURRENCE_HORIZON_DAYS = 365
+
+# ICS feeds: how long a feed validator stays cached (seconds) and how far back
+# ended events are still included (days)
+CALENDAR_FEED_CACHE_TIMEOUT = 60 * 60 if REDIS_URL else LOCAL_CACHE_TIMEOUT
+CALENDAR_FEED_PAST_DAYS = 90
+
+# Write-behind chat persistence: save_message journals messages locally and a
+# background thread stores them in batches (see chatsAndMessaging.write_behind)
+CHAT_WRITE_BEHIND = os.environ.get("CHAT_WRITE_BEHIND", "") == "1"
+CHAT_WRITE_BEHIND_QUEUE_PATH = os.environ.get(
+    "CHAT_WRITE_BEHIND_QUEUE_PATH", str(BASE_DIR / "chat_write_behind.sqlite3")
+)
+CHAT_WRITE_BEHIND_BATCH_SIZE = 200
+CHAT_WRITE_BEHIND_FLUSH_INTERVAL = 0.5  # seconds
+
 # Trusted origins for CSRF validation
 CSRF_TRUSTED_ORIGINS = [
     "https://zealous-pond-01ec7c503-7.westeurope.3.azurestaticapps.net",
@@ -220,3 +326,13 @@ AZURE_COMMUNICATION_CONNECTION_STRING = "endpoint=https://zpi-uniorg-communicati
 AZURE_COMMUNICATION_SENDER_EMAIL = (
     "DoNotReply@3af5f752-8655-4840-b541-10927c5794da.azurecomm.net"
 )
+
+# Outbound email queue (core.email_queue). Credential emails go through ACS.
+# Backends that keep messages in plain text (console, file) are refused by the
+# core.E001 system check unless EMAIL_ALLOW_PLAIN_TEXT=1 is set explicitly,
+# e.g. on a developer machine; DEBUG alone never enables them.
+EMAIL_QUEUE_TRANSPORT = os.environ.get("EMAIL_QUEUE_TRANSPORT", "core.email_queue.AcsTransport")
+EMAIL_QUEUE_WORKERS = int(os.environ.get("EMAIL_QUEUE_WORKERS", "2"))
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_ALLOW_PLAIN_TEXT = os.environ.get("EMAIL_ALLOW_PLAIN_TEXT", "") == "1"
+DEFAULT_FROM_EMAIL = AZURE_COMMUNICATION_SENDER_EMAIL
@@ -0,0 +1,105 @@
+"""Handshake authentication for the Socket.IO server.
+
+The caller is resolved once per connection, from a JWT access token (the
+``auth`` payload's ``token``, an ``Authorization: Bearer`` header or a
+``?token=`` query parameter) or else from the Django session cookie. The
+chats they may see are loaded with it and kept on the socket session, so
+joining a channel and sending to it are checked in memory.
+"""
+
+import time
+from dataclasses import dataclass, field
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import get_user, get_user_model
+from django.db.models import Q
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from chatsAndMessaging.models import Chat
+from chatsAndMessaging.visibility import ensure_indexed
+from organizations.models import Membership
+
+# Access loaded at the handshake is reloaded after this many seconds, and at
+# most this often when a client asks for a chat it did not have.
+ACCESS_TTL = getattr(settings, "SOCKETIO_ACCESS_TTL", 300)
+ACCESS_MISS_REFRESH = getattr(settings, "SOCKETIO_ACCESS_MISS_REFRESH", 10)
+
+
+@dataclass
+class SocketAccess:
+    user_id: int
+    username: str
+    chats: dict = field(default_factory=dict)  # channel (str chat id) -> organization id
+    chat_names: dict = field(default_factory=dict)  # channel -> chat name
+    loaded_at: float = 0.0
+
+    def can_join(self, channel):
+        return str(channel) in self.chats
+
+    def organization_for(self, channel):
+        return self.chats.get(str(channel))
+
+    def is_stale(self, now, max_age=ACCESS_TTL):
+        return now - self.loaded_at > max_age
+
+
+def _bearer_token(environ, auth):
+    if isinstance(auth, dict) and auth.get("token"):
+        return auth["token"]
+    header = environ.get("HTTP_AUTHORIZATION", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    tokens = parse_qs(environ.get("QUERY_STRING", "")).get("token")
+    return tokens[0] if tokens else None
+
+
+def _session_user(environ):
+    cookie = SimpleCookie(environ.get("HTTP_COOKIE", ""))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    user = get_user(SimpleNamespace(session=engine.SessionStore(morsel.value)))
+    return user if user.is_authenticated else None
+
+
+def authenticate_socket(environ, auth=None):
+    """User behind a handshake, or None. Synchronous (runs ORM queries)."""
+    raw_token = _bearer_token(environ, auth)
+    if raw_token:
+        authenticator = JWTAuthentication()
+        try:
+            user = authenticator.get_user(authenticator.get_validated_token(raw_token))
+        except (InvalidToken, TokenError):
+            return None
+        return user if user.is_active else None
+    return _session_user(environ)
+
+
+def load_access(user):
+    """Chats ``user`` may see in every organization they belong to."""
+    memberships = list(Membership.objects.filter(user=user).values_list("organization_id", "role"))
+    admin_of = [org_id for org_id, role in memberships if role == Membership.Role.ADMIN]
+    ensure_indexed(org_id for org_id, role in memberships if role != Membership.Role.ADMIN)
+    # Admins see every chat; everyone else what the visibility index lists.
+    rows = (
+        Chat.objects.filter(Q(organization_id__in=admin_of) | Q(visibility__membership__user=user))
+        .values_list("chat_id", "organization_id", "name")
+        .distinct()
+    )
+    chats, chat_names = {}, {}
+    for chat_id, organization_id, name in rows:
+        chats[str(chat_id)] = organization_id
+        chat_names[str(chat_id)] = name
+    return SocketAccess(user.pk, user.username, chats, chat_names, time.time())
+
+
+def reload_access(access):
+    """Fresh access for the same user, or None once they are deleted or deactivated."""
+    user = get_user_model().objects.filter(pk=access.user_id, is_active=True).first()
+    return load_access(user) if user is not None else None
@@ -0,0 +1,52 @@
+"""Client managers that let several Socket.IO servers share rooms.
+
+``SOCKETIO_MESSAGE_QUEUE`` selects the manager:
+
+* unset / empty - python-socketio's in-process manager (single worker, dev);
+* ``redis://`` / ``rediss://`` - ``AsyncRedisManager`` (needs ``redis``);
+* ``memory://`` - ``LocalPubSubManager``, which connects every server of one
+  process through an in-process bus. Tests use it to stand in for Redis.
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+REDIS_SCHEMES = ("redis", "rediss", "unix")
+
+
+class LocalPubSubManager(AsyncPubSubManager):
+    """Pub/sub manager whose "broker" is a dict of asyncio queues."""
+
+    name = "local"
+    _subscribers = defaultdict(set)  # channel -> listener queues
+
+    async def _publish(self, data):
+        # Serialized like the Redis manager does, so payloads stay JSON-safe.
+        message = json.dumps(data)
+        for queue in list(self._subscribers[self.channel]):
+            queue.put_nowait(message)
+
+    async def _listen(self):
+        queue = asyncio.Queue()
+        self._subscribers[self.channel].add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[self.channel].discard(queue)
+
+
+def make_client_manager(url, channel="socketio", write_only=False):
+    """Client manager for ``url``; None selects the in-process default."""
+    if not url:
+        return None
+    scheme = url.split("://", 1)[0].lower()
+    if scheme == "memory":
+        return LocalPubSubManager(channel=channel, write_only=write_only)
+    if scheme in REDIS_SCHEMES:
+        return socketio.AsyncRedisManager(url, channel=channel, write_only=write_only)
+    raise ValueError(f"Unsupported Socket.IO message queue: {url}")
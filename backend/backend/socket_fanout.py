@@ -0,0 +1,73 @@
+"""Coalescing of chat fan-out per room.
+
+Messages for a room that arrive within ``window`` seconds of the first one
+go out as a single ``chat_messages`` frame (a lone message still goes out as
+``chat_message``), so a burst costs one serialization and one packet per
+member instead of one per message. Batches of a room are sent in order.
+
+Each room holds at most ``max_pending`` unsent messages. When it is full the
+sender waits for the batch to go out, up to ``max_wait`` seconds, and is then
+refused; slow delivery therefore pushes back on producers instead of
+growing memory.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    __slots__ = ("messages", "sent")
+
+    def __init__(self):
+        self.messages = []
+        self.sent = asyncio.get_running_loop().create_future()
+
+
+class RoomCoalescer:
+    def __init__(self, send, window=0.015, max_pending=500, max_wait=1.0):
+        self.send = send  # async send(room, messages)
+        self.window = window
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        self._open = {}  # room -> batch still collecting
+        self._last = {}  # room -> sent future of the newest scheduled batch
+        self._tasks = set()  # pending flushes; the loop only holds weak references
+
+    async def submit(self, room, message):
+        """Queue ``message`` for ``room``; False when the room stays full."""
+        batch = self._open.get(room)
+        while batch is not None and len(batch.messages) >= self.max_pending:
+            try:
+                await asyncio.wait_for(asyncio.shield(batch.sent), self.max_wait)
+            except asyncio.TimeoutError:
+                return False
+            batch = self._open.get(room)
+        if batch is None:
+            batch = self._open[room] = _Batch()
+            previous = self._last.get(room)
+            self._last[room] = batch.sent
+            task = asyncio.get_running_loop().create_task(self._flush(room, batch, previous))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch.messages.append(message)
+        return True
+
+    async def _flush(self, room, batch, previous):
+        try:
+            await asyncio.sleep(self.window)
+            if previous is not None:
+                await asyncio.shield(previous)
+            # Close the batch just before sending so late arrivals still join it.
+            if self._open.get(room) is batch:
+                del self._open[room]
+            await self.send(room, batch.messages)
+        except Exception:
+            logger.exception("Fan-out of %d messages to room %s failed", len(batch.messages), room)
+        finally:
+            if self._open.get(room) is batch:
+                del self._open[room]
+            if self._last.get(room) is batch.sent:
+                del self._last[room]
+            batch.sent.set_result(None)
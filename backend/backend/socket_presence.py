@@ -0,0 +1,180 @@
+"""Per-channel presence for the Socket.IO server.
+
+Presence is tracked per (channel, sid), so a user with several tabs open
+stays present until the last one leaves. Each worker refreshes the entries
+of its own sids on a heartbeat; entries left behind by a worker that died
+expire after ``ttl`` seconds and are reported as departures by whichever
+worker sweeps them.
+
+The store is shared between workers when ``SOCKETIO_MESSAGE_QUEUE`` points
+at Redis, and lives in process otherwise.
+"""
+
+import time
+from collections import Counter, defaultdict
+
+REDIS_SCHEMES = ("redis", "rediss", "unix")
+
+
+class MemoryPresenceStore:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = defaultdict(dict)  # channel -> {sid: [user, last_seen]}
+        self._counts = defaultdict(Counter)  # channel -> {user: live sids}
+
+    async def add(self, channel, sid, user, now):
+        """Register ``sid``; True when it is the user's first sid in ``channel``."""
+        if sid in self._entries[channel]:
+            await self.remove(channel, sid)
+        self._entries[channel][sid] = [user, now]
+        self._counts[channel][user] += 1
+        return self._counts[channel][user] == 1
+
+    async def remove(self, channel, sid):
+        """Unregister ``sid``; ``(user, was_last)`` or ``(None, False)``."""
+        entry = self._entries.get(channel, {}).pop(sid, None)
+        if entry is None:
+            return None, False
+        user = entry[0]
+        counts = self._counts[channel]
+        counts[user] -= 1
+        last = counts[user] <= 0
+        if last:
+            del counts[user]
+        if not self._entries[channel]:
+            del self._entries[channel]
+            del self._counts[channel]
+        return user, last
+
+    async def touch(self, pairs, now):
+        for channel, sid in pairs:
+            entry = self._entries.get(channel, {}).get(sid)
+            if entry is not None:
+                entry[1] = now
+
+    async def members(self, channel):
+        return sorted(self._counts.get(channel, ()))
+
+    async def expire(self, now):
+        """Drop stale entries; ``[(channel, user)]`` of users who left with them."""
+        cutoff = now - self.ttl
+        stale = [
+            (channel, sid)
+            for channel, entries in self._entries.items()
+            for sid, (_, last_seen) in entries.items()
+            if last_seen < cutoff
+        ]
+        departed = []
+        for channel, sid in stale:
+            user, last = await self.remove(channel, sid)
+            if last:
+                departed.append((channel, user))
+        return departed
+
+
+class RedisPresenceStore:
+    """The same store kept in Redis, so presence spans workers and nodes.
+
+    Per channel: a sorted set of sids scored by heartbeat, a hash sid -> user
+    and a hash user -> live sid count. ``ZREM`` decides which worker handles a
+    removal, so a departure is reported once even when workers race.
+    """
+
+    def __init__(self, url, ttl, prefix="socketio:presence"):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis = redis.from_url(url, decode_responses=True)
+
+    def _key(self, channel, kind):
+        return f"{self.prefix}:{channel}:{kind}"
+
+    async def add(self, channel, sid, user, now):
+        await self.remove(channel, sid)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(f"{self.prefix}:channels", channel)
+            pipe.zadd(self._key(channel, "seen"), {sid: now})
+            pipe.hset(self._key(channel, "users"), sid, user)
+            pipe.hincrby(self._key(channel, "counts"), user, 1)
+            *_, count = await pipe.execute()
+        return count == 1
+
+    async def remove(self, channel, sid):
+        if not await self.redis.zrem(self._key(channel, "seen"), sid):
+            return None, False
+        user = await self.redis.hget(self._key(channel, "users"), sid)
+        await self.redis.hdel(self._key(channel, "users"), sid)
+        if user is None:
+            return None, False
+        count = await self.redis.hincrby(self._key(channel, "counts"), user, -1)
+        if count <= 0:
+            await self.redis.hdel(self._key(channel, "counts"), user)
+        return user, count <= 0
+
+    async def touch(self, pairs, now):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for channel, sid in pairs:
+                pipe.zadd(self._key(channel, "seen"), {sid: now}, xx=True)
+            await pipe.execute()
+
+    async def members(self, channel):
+        return sorted(await self.redis.hkeys(self._key(channel, "counts")))
+
+    async def expire(self, now):
+        departed = []
+        for channel in await self.redis.smembers(f"{self.prefix}:channels"):
+            stale = await self.redis.zrangebyscore(self._key(channel, "seen"), 0, now - self.ttl)
+            for sid in stale:
+                user, last = await self.remove(channel, sid)
+                if last:
+                    departed.append((channel, user))
+            if not await self.redis.exists(self._key(channel, "seen")):
+                await self.redis.srem(f"{self.prefix}:channels", channel)
+        return departed
+
+
+def make_presence_store(url, ttl):
+    if url and url.split("://", 1)[0].lower() in REDIS_SCHEMES:
+        return RedisPresenceStore(url, ttl)
+    return MemoryPresenceStore(ttl)
+
+
+class Presence:
+    """Presence of this worker's sids on top of a (possibly shared) store."""
+
+    def __init__(self, store, clock=time.time):
+        self.store = store
+        self.clock = clock
+        self.local = {}  # sid -> {channel: user}
+
+    async def join(self, sid, channel, user):
+        """True when ``user`` just became present in ``channel``."""
+        self.local.setdefault(sid, {})[channel] = user
+        return await self.store.add(channel, sid, user, self.clock())
+
+    async def leave(self, sid, channel):
+        """``user`` when they are no longer present in ``channel``, else None."""
+        self.local.get(sid, {}).pop(channel, None)
+        user, last = await self.store.remove(channel, sid)
+        return user if last else None
+
+    async def drop(self, sid):
+        """Forget a disconnected sid; ``[(channel, user)]`` of departures."""
+        departed = []
+        for channel in self.local.pop(sid, {}):
+            user, last = await self.store.remove(channel, sid)
+            if last:
+                departed.append((channel, user))
+        return departed
+
+    async def members(self, channel):
+        return await self.store.members(channel)
+
+    async def heartbeat(self):
+        """Refresh this worker's sids and sweep stale ones; returns departures."""
+        now = self.clock()
+        await self.store.touch(
+            [(channel, sid) for sid, channels in self.local.items() for channel in channels], now
+        )
+        return await self.store.expire(now)
@@ -1,34 +1,196 @@
+import asyncio
+import os
+import time
+
 import socketio
+from asgiref.sync import sync_to_async
+
+from backend.socket_auth import ACCESS_MISS_REFRESH, authenticate_socket, load_access, reload_access
+from backend.socket_backends import make_client_manager
+from backend.socket_fanout import RoomCoalescer
+from backend.socket_presence import Presence, make_presence_store
+from backend.socket_store import persist_message
+
+# Shared message queue so several workers/nodes see each other's rooms.
+MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE", os.environ.get("REDIS_URL", ""))
+# Seconds between presence refreshes; entries expire after three missed beats.
+HEARTBEAT_INTERVAL = float(os.environ.get("SOCKETIO_PRESENCE_HEARTBEAT", "15"))
+# Coalescing window for chat fan-out in milliseconds (10-25 is sensible); 0 disables.
+COALESCE_MS = float(os.environ.get("SOCKETIO_COALESCE_MS", "0"))
+# Store chat messages here (then broadcast the stored row) instead of relying
+# on clients to POST them to messages/save/ as well.
+PERSIST_MESSAGES = os.environ.get("SOCKETIO_PERSIST_MESSAGES", "") == "1"
+# Longest chat message content accepted over the socket, in characters.
+MAX_CONTENT_LENGTH = int(os.environ.get("SOCKETIO_MAX_CONTENT_LENGTH", "10000"))
+# Room names are chat ids and message_uuid a UUID; both are short.
+MAX_CHANNEL_LENGTH = 100
+MAX_UUID_LENGTH = 36
 
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins="*",
+    client_manager=make_client_manager(MESSAGE_QUEUE),
+)
 app = socketio.ASGIApp(sio)
 
-rooms = {}
-users = set()
+presence = Presence(make_presence_store(MESSAGE_QUEUE, ttl=3 * HEARTBEAT_INTERVAL))
+_heartbeat_task = None
+
+
+async def _send_batch(room, messages):
+    if len(messages) == 1:
+        await sio.emit("chat_message", messages[0], room=room)
+    else:
+        await sio.emit("chat_messages", messages, room=room)
+
+
+coalescer = RoomCoalescer(_send_batch, window=COALESCE_MS / 1000) if COALESCE_MS > 0 else None
+
+
+async def _announce_leave(channel, user):
+    await sio.emit("presence_leave", {"channel": channel, "user": user}, room=channel)
+
+
+async def _heartbeat():
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        for channel, user in await presence.heartbeat():
+            await _announce_leave(channel, user)
+
+
+def _handshake(environ, auth):
+    user = authenticate_socket(environ, auth)
+    return load_access(user) if user is not None else None
+
+
+async def _leave(sid, channel):
+    await sio.leave_room(sid, channel)
+    departed = await presence.leave(sid, channel)
+    if departed is not None:
+        await _announce_leave(channel, departed)
+
+
+def _message_error(message):
+    """Polish error for a ``chat_message`` payload of the wrong shape, or None."""
+    if not isinstance(message, dict):
+        return "Nieprawidłowa wiadomość"
+    channel = message.get("channel")
+    # Channels are chat ids, which clients send as numbers or strings.
+    if isinstance(channel, bool) or not isinstance(channel, (str, int)):
+        return "Nieprawidłowy kanał"
+    if len(str(channel)) > MAX_CHANNEL_LENGTH:
+        return "Nieprawidłowy kanał"
+    message_uuid = message.get("message_uuid")
+    if message_uuid is not None and (
+        not isinstance(message_uuid, str) or len(message_uuid) > MAX_UUID_LENGTH
+    ):
+        return "Nieprawidłowy message_uuid"
+    content = message.get("content")
+    if not isinstance(content, str) or not content or len(content) > MAX_CONTENT_LENGTH:
+        return "Nieprawidłowa treść wiadomości"
+    return None
+
+
+async def _access(sid, channel):
+    """The sid's cached access, reloaded when stale or, rate-limited, on a miss.
+
+    A reload drops the sid from rooms it may no longer see; for a deleted or
+    deactivated user it disconnects the sid and returns None.
+    """
+    session = await sio.get_session(sid)
+    access = session["access"]
+    now = time.time()
+    if access.is_stale(now) or (
+        not access.can_join(channel) and access.is_stale(now, ACCESS_MISS_REFRESH)
+    ):
+        access = await sync_to_async(reload_access)(access)
+        if access is None:
+            await sio.disconnect(sid)
+            return None
+        session["access"] = access
+        await sio.save_session(sid, session)
+        for room in list(sio.rooms(sid)):
+            if room != sid and not access.can_join(room):
+                await _leave(sid, room)
+    return access
 
 
 @sio.event
-async def connect(sid, environ):
-    pass
+async def connect(sid, environ, auth=None):
+    global _heartbeat_task
+    access = await sync_to_async(_handshake)(environ, auth)
+    if access is None:
+        raise socketio.exceptions.ConnectionRefusedError("Authentication failed")
+    await sio.save_session(sid, {"access": access})
+    if _heartbeat_task is None:
+        _heartbeat_task = sio.start_background_task(_heartbeat)
 
 
 @sio.event
-async def join_channel(sid, channel, user):
-    sio.enter_room(sid, channel)
-    users.add(user)
-    await sio.emit("presence", list(users))
+async def join_channel(sid, channel, user=None):
+    # Channels are chat ids; ``user`` is ignored in favour of the handshake's.
+    channel = str(channel)
+    access = await _access(sid, channel)
+    if access is None or not access.can_join(channel):
+        return {"status": "error", "message": "Brak dostępu do czatu"}
+    user = access.username
+    await sio.enter_room(sid, channel)
+    joined = await presence.join(sid, channel, user)
+    # The joiner gets the room's roster once; everyone else only the delta.
+    await sio.emit(
+        "presence", {"channel": channel, "users": await presence.members(channel)}, to=sid
+    )
+    if joined:
+        await sio.emit("presence_join", {"channel": channel, "user": user}, room=channel, skip_sid=sid)
+    return {"status": "success"}
 
 
 @sio.event
-async def leave_channel(sid, channel, user):
-    sio.leave_room(sid, channel)
+async def leave_channel(sid, channel, user=None):
+    await _leave(sid, str(channel))
 
 
 @sio.event
 async def chat_message(sid, message):
-    await sio.emit("chat_message", message, room=message["channel"])
+    error = _message_error(message)
+    if error:
+        return {"status": "error", "message": error}
+    channel = str(message["channel"])
+    # Only rooms joined (and so authorized) on this connection; no queries
+    # here unless the cached access is due for a reload.
+    if channel not in sio.rooms(sid):
+        return {"status": "error", "message": "Nie dołączono do czatu"}
+    access = await _access(sid, channel)
+    if access is None or channel not in sio.rooms(sid):
+        return {"status": "error", "message": "Brak dostępu do czatu"}
+    if PERSIST_MESSAGES:
+        item = {
+            "message_uuid": message.get("message_uuid"),
+            "chat_id": int(channel),
+            "sender_id": access.user_id,
+            "author_username": access.username,
+            "content": message.get("content"),
+        }
+        message, error = await sync_to_async(persist_message)(
+            access.organization_for(channel), access.chat_names.get(channel), item
+        )
+        if error:
+            return {"status": "error", "message": error}
+    else:
+        message = {
+            **message,
+            "channel": channel,
+            "sender_id": access.user_id,
+            "author_username": access.username,
+        }
+    if coalescer is None:
+        await sio.emit("chat_message", message, room=channel)
+    elif not await coalescer.submit(channel, message):
+        return {"status": "error", "message": "Serwer jest przeciążony, spróbuj ponownie"}
+    return {"status": "success", "message": message}
 
 
 @sio.event
 async def disconnect(sid):
-    pass
+    for channel, user in await presence.drop(sid):
+        await _announce_leave(channel, user)
@@ -0,0 +1,48 @@
+"""Persistence of chat messages received over the socket.
+
+The socket server stores a message itself instead of relying on the client
+to POST it to ``messages/save/`` as well, and broadcasts the stored version.
+"""
+
+import uuid
+
+from django.utils import timezone
+
+from chatsAndMessaging import write_behind
+from chatsAndMessaging.ingest import item_error, store_messages
+from chatsAndMessaging.serializers import MessageSerializer
+
+
+def persist_message(organization_id, channel_name, item):
+    """Store one message; returns ``(serialized message, error)``.
+
+    The server assigns the timestamp and, unless the client sent one (which
+    keeps retries idempotent), the ``message_uuid``. In write-behind mode the
+    message is journalled and returned as it will be stored, without a
+    ``message_id`` yet. Synchronous (runs ORM queries).
+    """
+    item = {**item, "message_uuid": item.get("message_uuid") or str(uuid.uuid4())}
+    accepted_at = timezone.now()
+
+    if write_behind.ENABLED:
+        error = item_error(item)
+        if error:
+            return None, error
+        write_behind.enqueue(organization_id, item, accepted_at.timestamp())
+        return {
+            "message_id": None,
+            "message_uuid": item["message_uuid"],
+            "chat_id": item["chat_id"],
+            "sender_id": item["sender_id"],
+            "channel": channel_name,
+            "author_username": item["author_username"],
+            "content": item["content"],
+            "timestamp": MessageSerializer().fields["timestamp"].to_representation(accepted_at),
+        }, None
+
+    messages, rejected = store_messages(
+        organization_id, [item], timestamps={item["message_uuid"]: accepted_at}
+    )
+    if rejected:
+        return None, rejected[0]["error"]
+    return dict(MessageSerializer(messages[0]).data), None
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ChatsandmessagingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chatsAndMessaging"
+
+    def ready(self):
+        from . import pagination, visibility  # noqa: F401  (registers cache/index maintenance signals)
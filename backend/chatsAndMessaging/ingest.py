@@ -0,0 +1,146 @@
+"""Batch persistence of chat messages, deduplicated by ``message_uuid``."""
+
+from django.db.models import BooleanField, Exists, Value
+from django.utils import timezone
+
+from core.models import User
+
+from .models import Chat, Message
+from .pagination import invalidate_message_count
+
+MAX_BATCH_SIZE = 500
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def item_error(item):
+    """Error for an item whose fields are missing or of the wrong type, or None."""
+    message_uuid = item.get("message_uuid")
+    author_username = item.get("author_username")
+    if (
+        not message_uuid
+        or not item.get("content")
+        or not item.get("chat_id")
+        or not (author_username or item.get("sender_id"))
+    ):
+        return "Brakujące wymagane pola"
+    if (
+        not isinstance(message_uuid, str)
+        or len(message_uuid) > Message._meta.get_field("message_uuid").max_length
+    ):
+        return "Nieprawidłowy message_uuid"
+    if not isinstance(item["content"], str) or (
+        author_username and not isinstance(author_username, str)
+    ):
+        return "Nieprawidłowe pola wiadomości"
+    return None
+
+
+def check_item(organization_id, item):
+    """``(error, status)`` ``store_messages`` would reject ``item`` with, or None.
+
+    For callers that queue messages to be stored later: the chat and the
+    sender are checked with one indexed query, so a message is never
+    acknowledged and then dropped by the writer.
+    """
+    error = item_error(item)
+    if error:
+        return error, 400
+    chat_id = _as_int(item["chat_id"])
+    sender_id = _as_int(item.get("sender_id"))
+    if chat_id is None or (item.get("sender_id") and sender_id is None):
+        return "Nieprawidłowy identyfikator", 400
+
+    row = (
+        Chat.objects.filter(chat_id=chat_id, organization_id=organization_id)
+        .annotate(
+            sender_exists=Exists(User.objects.filter(id=sender_id)) if sender_id else Value(True, output_field=BooleanField())
+        )
+        .values_list("sender_exists", flat=True)
+        .first()
+    )
+    if row is None:
+        return "Nie znaleziono czatu", 404
+    if not row:
+        return "Nie znaleziono użytkownika nadawcy", 404
+    return None
+
+
+def store_messages(organization_id, items, timestamps=None):
+    """Insert ``items`` in bulk, leaving already stored UUIDs untouched.
+
+    Returns ``(messages, rejected)``: the canonical stored row for every
+    accepted UUID in request order, and ``{"message_uuid", "error"}`` entries
+    for items that could not be stored. Resending a batch is therefore safe.
+    ``timestamps`` optionally maps a UUID to the time it was accepted.
+    """
+    timestamps = timestamps or {}
+    rejected = []
+    pending = {}
+    for item in items:
+        message_uuid = item.get("message_uuid")
+        error = item_error(item)
+        if error:
+            rejected.append({"message_uuid": message_uuid, "error": error})
+        else:
+            # The first copy of a UUID within the batch wins, as it would in the DB.
+            pending.setdefault(message_uuid, item)
+
+    chats = Chat.objects.filter(organization_id=organization_id).in_bulk(
+        {_as_int(item["chat_id"]) for item in pending.values()} - {None}
+    )
+    sender_ids = {_as_int(item.get("sender_id")) for item in pending.values()} - {None}
+    senders = User.objects.only("id", "username").in_bulk(sender_ids) if sender_ids else {}
+
+    to_create = []
+    for message_uuid, item in list(pending.items()):
+        chat = chats.get(_as_int(item["chat_id"]))
+        sender = senders.get(_as_int(item.get("sender_id")))
+        error = None
+        if chat is None:
+            error = "Nie znaleziono czatu"
+        elif item.get("sender_id") and sender is None:
+            error = "Nie znaleziono użytkownika nadawcy"
+        if error:
+            rejected.append({"message_uuid": message_uuid, "error": error})
+            del pending[message_uuid]
+            continue
+        to_create.append(
+            Message(
+                message_uuid=message_uuid,
+                chat=chat,
+                sender=sender,
+                channel=chat.name,
+                author_username=item.get("author_username") or sender.username,
+                content=item["content"],
+                timestamp=timestamps.get(message_uuid) or timezone.now(),
+            )
+        )
+
+    if not to_create:
+        return [], rejected
+
+    # bulk_create skips post_save, so the cached counters are reset instead.
+    Message.objects.bulk_create(to_create, ignore_conflicts=True)
+    for chat_id in {message.chat_id for message in to_create}:
+        invalidate_message_count(chat_id)
+
+    stored = {
+        message.message_uuid: message
+        for message in Message.objects.filter(
+            message_uuid__in=pending, chat__organization_id=organization_id
+        ).select_related("chat", "sender")
+    }
+    messages = []
+    for message_uuid in pending:
+        if message_uuid in stored:
+            messages.append(stored[message_uuid])
+        else:
+            # The UUID is taken by a message outside this organization.
+            rejected.append({"message_uuid": message_uuid, "error": "Konflikt message_uuid"})
+    return messages, rejected
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from chatsAndMessaging import write_behind
+
+
+class Command(BaseCommand):
+    help = "Store every message waiting in the chat write-behind journal."
+
+    def handle(self, *args, **options):
+        journal = write_behind.get_journal()
+        flushed = write_behind.drain(journal, write_behind.FlushMetrics())
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} queued message(s)."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from chatsAndMessaging.visibility import rebuild_organization
+from organizations.models import Organization
+
+
+class Command(BaseCommand):
+    help = "Recompute the chat visibility index from current tag permissions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organization",
+            type=int,
+            help="Only rebuild this organization (all organizations by default).",
+        )
+
+    def handle(self, *args, **options):
+        organization_ids = (
+            [options["organization"]]
+            if options["organization"]
+            else Organization.objects.values_list("id", flat=True)
+        )
+        count = 0
+        for organization_id in organization_ids:
+            rebuild_organization(organization_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt chat visibility for {count} organization(s)."))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Chat(models.Model):
@@ -41,13 +42,42 @@ class Message(models.Model):
         max_length=150, default="Guest"
     )  # Store username directly for guests
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set explicitly when a message is persisted after it was accepted.
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         ordering = ["timestamp"]
         indexes = [
             models.Index(fields=["channel", "timestamp"]),
+            # Keyset pagination of a chat's history walks this index.
+            models.Index(fields=["chat", "timestamp", "message_id"]),
         ]
 
     def __str__(self):
         return f"Message from {self.author_username} at {self.timestamp}"
+
+
+class ChatVisibility(models.Model):
+    """Materialized "membership may see chat" pairs.
+
+    Maintained by ``chatsAndMessaging.visibility`` from tag permissions, so
+    listing a member's chats is a single indexed lookup. Admins bypass it.
+    """
+
+    membership = models.ForeignKey(
+        "organizations.Membership",
+        related_name="visible_chats",
+        on_delete=models.CASCADE,
+    )
+    chat = models.ForeignKey(
+        Chat,
+        related_name="visibility",
+        on_delete=models.CASCADE,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["membership", "chat"], name="unique_chat_visibility"
+            ),
+        ]
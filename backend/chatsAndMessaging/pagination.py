@@ -0,0 +1,114 @@
+"""Keyset pagination over a chat's message history.
+
+Pages are keyed on ``(timestamp, message_id)``, which matches the composite
+index on ``Message``, so fetching a page costs the same no matter how deep in
+the history it is. Cursors are opaque to clients.
+"""
+
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.permissions_checker import invalidate_cached
+
+from .models import Chat, Message
+
+COUNT_CACHE_TIMEOUT = getattr(settings, "MESSAGE_COUNT_CACHE_TIMEOUT", 300)
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    raw = f"{message.timestamp.isoformat()}|{message.message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def paginate_messages(queryset, limit, before=None, after=None):
+    """Return ``(messages, has_more)`` for one page, oldest message first.
+
+    Without cursors this is the newest page. ``before`` walks back towards
+    older messages and ``after`` forward towards newer ones; ``has_more``
+    tells whether another page exists in the direction of travel.
+    """
+    if after is not None:
+        timestamp, message_id = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, message_id__gt=message_id)
+        ).order_by("timestamp", "message_id")
+    else:
+        if before is not None:
+            timestamp, message_id = decode_cursor(before)
+            queryset = queryset.filter(
+                Q(timestamp__lt=timestamp)
+                | Q(timestamp=timestamp, message_id__lt=message_id)
+            )
+        queryset = queryset.order_by("-timestamp", "-message_id")
+
+    page = list(queryset[: limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    if after is None:
+        page.reverse()
+    return page, has_more
+
+
+# -----------------------------
+# Approximate message count
+# -----------------------------
+def _count_key(chat_id):
+    return f"chat:message_count:{chat_id}"
+
+
+def get_message_count(chat_id):
+    """Message count for a chat, cached and kept roughly current by signals."""
+    key = _count_key(chat_id)
+    count = cache.get(key)
+    if count is None:
+        count = Message.objects.filter(chat_id=chat_id).count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_message_count(chat_id):
+    invalidate_cached(_count_key(chat_id))
+
+
+def _adjust_count(chat_id, delta):
+    try:
+        cache.incr(_count_key(chat_id), delta)
+    except ValueError:
+        # Not cached - the next read counts from the database.
+        pass
+
+
+@receiver(post_save, sender=Message)
+def _message_saved(sender, instance, created, **kwargs):
+    if created:
+        _adjust_count(instance.chat_id, 1)
+
+
+@receiver(post_delete, sender=Message)
+def _message_deleted(sender, instance, **kwargs):
+    _adjust_count(instance.chat_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Chat)
+def _chat_changed(sender, instance, **kwargs):
+    invalidate_message_count(instance.chat_id)
@@ -1,13 +1,17 @@
 # python
+import os
+import tempfile
 from unittest.mock import patch
 
+from django.db import OperationalError
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from core.models import User
-from organizations.models import Membership, Organization, Tag
-from chatsAndMessaging.models import Chat, Message
+from organizations.models import CombinedTag, Membership, Organization, Tag
+from chatsAndMessaging import visibility, write_behind
+from chatsAndMessaging.models import Chat, ChatVisibility, Message
 
 
 class ChatsAndMessagingAPITests(APITestCase):
@@ -111,6 +115,55 @@ class ChatsAndMessagingAPITests(APITestCase):
         self.assertIn("messages", data)
         self.assertEqual(data["total"], 1)
 
+    def test_get_messages_cursor_pagination(self):
+        url = reverse("get_messages", args=[self.org.pk])
+        for i in range(4):
+            Message.objects.create(
+                message_uuid=f"uuid-page-{i}",
+                chat=self.restricted_chat,
+                author_username="admin",
+                content=f"Msg {i}",
+            )
+        # Wspólny znacznik czasu - kolejność rozstrzyga message_id
+        Message.objects.filter(chat=self.restricted_chat).update(
+            timestamp=self.msg1.timestamp
+        )
+
+        r = self.client.get(url, {"chat_id": self.restricted_chat.chat_id, "limit": 2})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        data = r.json()
+        self.assertEqual([m["content"] for m in data["messages"]], ["Msg 2", "Msg 3"])
+        self.assertTrue(data["has_more"])
+        self.assertEqual(data["total"], 5)
+
+        r = self.client.get(
+            url,
+            {"chat_id": self.restricted_chat.chat_id, "limit": 2, "before": data["before_cursor"]},
+        )
+        older = r.json()
+        self.assertEqual([m["content"] for m in older["messages"]], ["Msg 0", "Msg 1"])
+        self.assertTrue(older["has_more"])
+
+        r = self.client.get(
+            url,
+            {"chat_id": self.restricted_chat.chat_id, "limit": 2, "before": older["before_cursor"]},
+        )
+        oldest = r.json()
+        self.assertEqual([m["content"] for m in oldest["messages"]], ["Hello"])
+        self.assertFalse(oldest["has_more"])
+
+        # Kursor "after" zwraca nowsze wiadomości
+        r = self.client.get(
+            url,
+            {"chat_id": self.restricted_chat.chat_id, "limit": 10, "after": oldest["after_cursor"]},
+        )
+        newer = r.json()
+        self.assertEqual(len(newer["messages"]), 4)
+        self.assertFalse(newer["has_more"])
+
+        r = self.client.get(url, {"chat_id": self.restricted_chat.chat_id, "before": "???"})
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_save_message_validation_and_create(self):
         url = reverse("save_message", args=[self.org.pk])
 
@@ -141,6 +194,126 @@ class ChatsAndMessagingAPITests(APITestCase):
         data = r.json()
         self.assertEqual(data["author_username"], self.member_user.username)
 
+    def test_save_messages_batch_deduplicates_by_uuid(self):
+        url = reverse("save_messages_batch", args=[self.org.pk])
+        chat_id = self.restricted_chat.chat_id
+        payload = {
+            "messages": [
+                # uuid-1 już istnieje - zwracamy zapisany wiersz
+                {"message_uuid": "uuid-1", "content": "Changed", "author_username": "admin", "chat_id": chat_id},
+                {"message_uuid": "b1", "content": "First", "author_username": "admin", "chat_id": chat_id},
+                {"message_uuid": "b2", "content": "Second", "sender_id": self.member_user.id, "chat_id": chat_id},
+                {"message_uuid": "b1", "content": "Dup", "author_username": "admin", "chat_id": chat_id},
+                {"message_uuid": "b3", "content": "Missing chat", "author_username": "admin", "chat_id": 9999},
+                {"message_uuid": "b4", "author_username": "admin", "chat_id": chat_id},
+            ]
+        }
+        r = self.client.post(url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        data = r.json()
+        self.assertEqual(
+            [(m["message_uuid"], m["content"]) for m in data["messages"]],
+            [("uuid-1", "Hello"), ("b1", "First"), ("b2", "Second")],
+        )
+        self.assertEqual(data["messages"][2]["author_username"], self.member_user.username)
+        self.assertEqual({x["message_uuid"] for x in data["rejected"]}, {"b3", "b4"})
+        self.assertEqual(Message.objects.filter(chat=self.restricted_chat).count(), 3)
+
+        # Ponowne wysłanie tej samej paczki niczego nie duplikuje
+        r = self.client.post(url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(Message.objects.filter(chat=self.restricted_chat).count(), 3)
+
+    def test_write_behind_queue_flushes_in_order_and_deduplicates(self):
+        url = reverse("save_message", args=[self.org.pk])
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        journal = write_behind.MessageJournal(os.path.join(tmp_dir.name, "queue.sqlite3"))
+        metrics = write_behind.FlushMetrics()
+
+        # Tryb write-behind: zapis trafia do kolejki, odpowiedź 202
+        with patch.object(write_behind, "ENABLED", True), patch.object(
+            write_behind, "enqueue", side_effect=journal.append
+        ):
+            for i, uuid in enumerate(["q1", "q2", "q1"]):
+                payload = {"message_uuid": uuid, "content": f"Q{i}", "author_username": "admin", "chat_id": self.public_chat.chat_id}
+                r = self.client.post(url, payload, format="json")
+                self.assertEqual(r.status_code, status.HTTP_202_ACCEPTED)
+
+            # Nieistniejący czat, brak chat_id lub nadawca są odrzucane przed kolejką
+            bad = {"message_uuid": "q3", "content": "X", "author_username": "admin"}
+            r = self.client.post(url, bad, format="json")
+            self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+            r = self.client.post(url, {**bad, "chat_id": 999999}, format="json")
+            self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+            r = self.client.post(
+                url, {**bad, "chat_id": self.public_chat.chat_id, "sender_id": 999999}, format="json"
+            )
+            self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertFalse(Message.objects.filter(message_uuid__in=["q1", "q2"]).exists())
+        self.assertEqual(journal.stats()[0], 3)
+
+        self.assertEqual(write_behind.drain(journal, metrics, batch_size=2), 3)
+        self.assertEqual(journal.stats()[0], 0)
+        stored = list(
+            Message.objects.filter(message_uuid__in=["q1", "q2"]).order_by("timestamp", "message_id")
+        )
+        self.assertEqual([(m.message_uuid, m.content) for m in stored], [("q1", "Q0"), ("q2", "Q1")])
+        self.assertEqual(metrics.flushed_total, 3)
+        self.assertIsNotNone(metrics.last_flush_latency)
+
+    def test_write_behind_dead_letters_bad_rows(self):
+        url = reverse("save_message", args=[self.org.pk])
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        journal = write_behind.MessageJournal(os.path.join(tmp_dir.name, "queue.sqlite3"))
+        metrics = write_behind.FlushMetrics()
+        chat_id = self.public_chat.chat_id
+
+        # UUID, treść i autor muszą być napisami, zanim wiadomość trafi do kolejki
+        with patch.object(write_behind, "ENABLED", True), patch.object(
+            write_behind, "enqueue", side_effect=journal.append
+        ):
+            for bad in (
+                {"message_uuid": ["x"], "content": "X", "author_username": "admin"},
+                {"message_uuid": "d0", "content": {"a": 1}, "author_username": "admin"},
+                {"message_uuid": "d0", "content": "X", "author_username": ["admin"]},
+            ):
+                r = self.client.post(url, {**bad, "chat_id": chat_id}, format="json")
+                self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(journal.stats()[0], 0)
+
+        # Wadliwy wiersz zapisany wcześniej nie blokuje kolejnych
+        journal.append(self.org.pk, {"message_uuid": ["x"], "content": "X", "author_username": "admin", "chat_id": chat_id})
+        journal.append(self.org.pk, {"message_uuid": "d1", "content": "OK", "author_username": "admin", "chat_id": chat_id})
+        journal.append(self.org.pk, {"message_uuid": "d2", "content": "Boom", "author_username": "admin", "chat_id": chat_id})
+        journal.append(self.org.pk, {"message_uuid": "d3", "content": "OK", "author_username": "admin", "chat_id": chat_id})
+
+        real_store = write_behind.store_messages
+
+        def failing_store(organization_id, items, timestamps=None):
+            if any(item["message_uuid"] == "d2" for item in items):
+                raise ValueError("zły wiersz")
+            return real_store(organization_id, items, timestamps=timestamps)
+
+        with patch.object(write_behind, "store_messages", side_effect=failing_store):
+            self.assertEqual(write_behind.drain(journal, metrics), 4)
+        self.assertEqual(journal.stats()[0], 0)
+        self.assertEqual(
+            set(Message.objects.filter(message_uuid__in=["d1", "d2", "d3"]).values_list("message_uuid", flat=True)),
+            {"d1", "d3"},
+        )
+        self.assertEqual([row[0] for row in journal.dead_letters()], [1, 3])
+        self.assertEqual(metrics.rejected_total, 2)
+
+        # Błąd połączenia zostawia wiersze w kolejce do ponownej próby
+        journal.append(self.org.pk, {"message_uuid": "d4", "content": "OK", "author_username": "admin", "chat_id": chat_id})
+        with patch.object(write_behind, "store_messages", side_effect=OperationalError("down")):
+            with self.assertRaises(OperationalError):
+                write_behind.flush_once(journal, metrics)
+        self.assertEqual(journal.stats()[0], 1)
+
     def test_list_chats_returns_only_accessible_and_all_for_admin(self):
         url_my = reverse("list_chats_by_org", args=[self.org.pk])
         # admin sees both chats (admin has membership with no tags => code treats as allowed_permissions empty -> appends all)
@@ -170,6 +343,52 @@ class ChatsAndMessagingAPITests(APITestCase):
         r = self.client.get(url_all)
         self.assertEqual(r.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_list_chats_follows_tag_changes(self):
+        url = reverse("list_chats_by_org", args=[self.org.pk])
+        team = Chat.objects.create(name="Team", organization=self.org)
+        team.permissions.set([self.other_tag])
+        open_chat = Chat.objects.create(name="Open", organization=self.org)
+
+        def names():
+            r = self.client.get(url)
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            return {c["name"] for c in r.json()["chats"]}
+
+        self._login("member", "password123", self.org.slug)
+        self.assertIn("Open", names())
+        self.assertNotIn("Team", names())
+
+        # Indeks widoczności aktualizuje się po nadaniu i odebraniu tagu
+        self.member_membership.permissions.add(self.other_tag)
+        self.assertIn("Team", names())
+        self.member_membership.permissions.remove(self.other_tag)
+        self.assertNotIn("Team", names())
+
+        # Tag łączony wymaga wszystkich tagów bazowych
+        combined = Tag.objects.create(name="TagA+TagB", organization=self.org, combined=True)
+        CombinedTag.objects.create(combined_tag_id=combined, basic_tag_id=self.tag)
+        team.permissions.set([combined])
+        self.assertIn("Team", names())
+        CombinedTag.objects.create(combined_tag_id=combined, basic_tag_id=self.other_tag)
+        self.assertNotIn("Team", names())
+
+        # Usunięcie jedynego tagu czyni czat publicznym
+        combined.delete()
+        self.assertIn("Team", names())
+        open_chat.delete()
+        self.assertNotIn("Open", names())
+
+    def test_list_chats_backfills_index_for_existing_chats(self):
+        # Czaty sprzed wprowadzenia indeksu nie mają wpisów widoczności
+        ChatVisibility.objects.all().delete()
+        with patch.object(visibility, "_indexed", set()):
+            self.client.logout()
+            self._login("member", "password123", self.org.slug)
+            response = self.client.get(reverse("list_chats_by_org", args=[self.org.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["chats"])
+        self.assertTrue(ChatVisibility.objects.filter(membership=self.member_membership).exists())
+
     def test_list_chats_by_tag_behaviour(self):
         # admin can list by tag
         self._login("admin", "password123", self.org.slug)
@@ -0,0 +1,344 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import socketio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend import socket_server
+from backend.socket_auth import SocketAccess, authenticate_socket, load_access
+from backend.socket_backends import LocalPubSubManager, make_client_manager
+from backend.socket_fanout import RoomCoalescer
+from backend.socket_presence import MemoryPresenceStore, Presence
+from backend.socket_store import persist_message
+from chatsAndMessaging import write_behind
+from chatsAndMessaging.models import Chat, Message
+from core.models import User
+from organizations.models import Membership, Organization, Tag
+
+
+class SocketBackendTests(SimpleTestCase):
+    def test_make_client_manager_selects_backend(self):
+        self.assertIsNone(make_client_manager(""))
+        self.assertIsInstance(make_client_manager("memory://"), LocalPubSubManager)
+        with self.assertRaises(ValueError):
+            make_client_manager("amqp://localhost")
+
+    def test_local_pubsub_broadcasts_across_servers(self):
+        # Dwa serwery (jak dwa workery) współdzielą pokoje przez wspólną kolejkę
+        async def scenario():
+            servers = []
+            for _ in range(2):
+                server = socketio.AsyncServer(
+                    async_mode="asgi", client_manager=LocalPubSubManager(channel="test-bus")
+                )
+                server.manager_initialized = True
+                server.manager.initialize()
+                servers.append(server)
+            sender, receiver = servers
+
+            delivered = asyncio.Queue()
+
+            async def send_eio_packet(eio_sid, packet):
+                await delivered.put((eio_sid, packet.data))
+
+            receiver._send_eio_packet = send_eio_packet
+            sid = await receiver.manager.connect("eio-1", "/")
+            await receiver.enter_room(sid, "general")
+            await asyncio.sleep(0)  # listeners subscribe
+
+            await sender.emit("chat_message", {"content": "hej"}, room="general")
+            eio_sid, encoded = await asyncio.wait_for(delivered.get(), timeout=2)
+            for server in servers:
+                server.manager.thread.cancel()
+            return eio_sid, encoded
+
+        eio_sid, encoded = asyncio.run(scenario())
+        self.assertEqual(eio_sid, "eio-1")
+        self.assertEqual(json.loads(encoded[1:]), ["chat_message", {"content": "hej"}])
+
+
+class PresenceTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.store = MemoryPresenceStore(ttl=30)
+
+    def _presence(self):
+        return Presence(self.store, clock=lambda: self.now)
+
+    def test_user_stays_present_until_last_tab_leaves(self):
+        async def scenario():
+            presence = self._presence()
+            first = await presence.join("tab-1", "general", "ala")
+            second = await presence.join("tab-2", "general", "ala")
+            after_one = await presence.leave("tab-1", "general")
+            members = await presence.members("general")
+            after_two = await presence.leave("tab-2", "general")
+            return first, second, after_one, members, after_two
+
+        first, second, after_one, members, after_two = asyncio.run(scenario())
+        self.assertTrue(first)
+        self.assertFalse(second)
+        self.assertIsNone(after_one)
+        self.assertEqual(members, ["ala"])
+        self.assertEqual(after_two, "ala")
+
+    def test_disconnect_and_heartbeat_expiry(self):
+        async def scenario():
+            alive, crashed = self._presence(), self._presence()  # dwa workery, wspólny magazyn
+            await alive.join("sid-a", "general", "ala")
+            await alive.join("sid-a", "random", "ala")
+            await crashed.join("sid-b", "general", "ola")
+
+            dropped = await alive.drop("sid-a")
+            await alive.join("sid-c", "general", "ela")
+            # Worker "crashed" przestaje wysyłać heartbeat
+            self.now += 31
+            expired = await alive.heartbeat()
+            return dropped, expired, await alive.members("general")
+
+        dropped, expired, members = asyncio.run(scenario())
+        self.assertEqual(sorted(dropped), [("general", "ala"), ("random", "ala")])
+        self.assertEqual(expired, [("general", "ola")])
+        self.assertEqual(members, ["ela"])
+
+    def test_join_sends_roster_to_joiner_and_delta_to_room(self):
+        async def scenario():
+            access = SocketAccess(1, "ala", {"general": 1}, loaded_at=self.now)
+            with patch.object(socket_server, "presence", self._presence()), patch.object(
+                socket_server, "_access", AsyncMock(return_value=access)
+            ), patch.object(socket_server.sio, "enter_room", AsyncMock()), patch.object(
+                socket_server.sio, "emit", AsyncMock()
+            ) as emit:
+                await socket_server.join_channel("sid-1", "general", "ala")
+                await socket_server.join_channel("sid-2", "general", "ala")
+                return emit.await_args_list
+
+        calls = asyncio.run(scenario())
+        self.assertEqual(
+            [(c.args[0], c.kwargs) for c in calls],
+            [
+                ("presence", {"to": "sid-1"}),
+                ("presence_join", {"room": "general", "skip_sid": "sid-1"}),
+                ("presence", {"to": "sid-2"}),
+            ],
+        )
+        self.assertEqual(calls[2].args[1], {"channel": "general", "users": ["ala"]})
+
+
+class CoalescingTests(SimpleTestCase):
+    def test_burst_goes_out_as_one_frame_in_order(self):
+        async def scenario():
+            frames = []
+
+            async def send(room, messages):
+                frames.append((room, list(messages)))
+
+            coalescer = RoomCoalescer(send, window=0.01)
+            for i in range(5):
+                await coalescer.submit("general", i)
+            await coalescer.submit("random", "x")
+            # Zadania wysyłki są trzymane do końca, żeby GC ich nie zebrał
+            pending = len(coalescer._tasks)
+            await asyncio.sleep(0.05)
+            await coalescer.submit("general", 5)
+            await asyncio.sleep(0.05)
+            return frames, pending, len(coalescer._tasks)
+
+        frames, pending, remaining = asyncio.run(scenario())
+        self.assertEqual(
+            frames, [("general", [0, 1, 2, 3, 4]), ("random", ["x"]), ("general", [5])]
+        )
+        self.assertEqual((pending, remaining), (2, 0))
+
+    def test_full_room_pushes_back_on_senders(self):
+        async def scenario():
+            release = asyncio.Event()
+            frames = []
+
+            async def slow_send(room, messages):
+                await release.wait()  # wolny odbiorca
+                frames.append(list(messages))
+
+            coalescer = RoomCoalescer(slow_send, window=0.001, max_pending=2, max_wait=0.02)
+            accepted = [await coalescer.submit("general", i) for i in range(2)]
+            await asyncio.sleep(0.01)  # pierwsza paczka utknęła w wysyłce
+            accepted += [await coalescer.submit("general", i) for i in range(2, 5)]
+            release.set()
+            await asyncio.sleep(0.05)
+            return accepted, frames
+
+        accepted, frames = asyncio.run(scenario())
+        self.assertEqual(accepted, [True, True, True, True, False])
+        self.assertEqual(frames, [[0, 1], [2, 3]])
+
+
+class SocketAuthTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username="owner", password="password123", identifier="owner_SockOrg"
+        )
+        self.org = Organization.objects.create(name="SockOrg", created_by=self.owner, slug="SockOrg")
+        self.member_user = User.objects.create_user(
+            username="member", password="password123", identifier="member_SockOrg"
+        )
+        Membership.objects.create(organization=self.org, user=self.member_user, role="member")
+        self.public_chat = Chat.objects.create(name="Public", organization=self.org)
+        self.restricted_chat = Chat.objects.create(name="Restricted", organization=self.org)
+        self.restricted_chat.permissions.add(Tag.objects.create(name="Zarzad", organization=self.org))
+
+    def test_handshake_accepts_jwt_or_session(self):
+        token = str(RefreshToken.for_user(self.member_user).access_token)
+        self.assertEqual(authenticate_socket({}, {"token": token}), self.member_user)
+        self.assertEqual(
+            authenticate_socket({"HTTP_AUTHORIZATION": f"Bearer {token}"}), self.member_user
+        )
+        self.assertIsNone(authenticate_socket({}, {"token": "zly-token"}))
+        self.assertIsNone(authenticate_socket({}))
+
+        self.client.force_login(self.member_user)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        environ = {"HTTP_COOKIE": f"{settings.SESSION_COOKIE_NAME}={session_key}"}
+        self.assertEqual(authenticate_socket(environ), self.member_user)
+
+    def test_joins_and_messages_are_authorized_from_the_session(self):
+        access = load_access(self.member_user)
+        public, restricted = str(self.public_chat.chat_id), str(self.restricted_chat.chat_id)
+        self.assertEqual(access.chats, {public: self.org.id})
+
+        async def scenario():
+            session = {"access": access}
+            with patch.object(socket_server.sio, "get_session", AsyncMock(return_value=session)), \
+                    patch.object(socket_server.sio, "enter_room", AsyncMock()), \
+                    patch.object(socket_server.sio, "rooms", lambda sid: [sid, public]), \
+                    patch.object(socket_server.sio, "emit", AsyncMock()) as emit, \
+                    patch.object(socket_server, "presence", Presence(MemoryPresenceStore(ttl=30))):
+                denied = await socket_server.join_channel("sid-1", restricted)
+                joined = await socket_server.join_channel("sid-1", public)
+                blocked = await socket_server.chat_message("sid-1", {"channel": restricted})
+                sent = await socket_server.chat_message(
+                    "sid-1", {"channel": public, "content": "hej", "author_username": "admin"}
+                )
+                return denied, joined, blocked, sent, emit.await_args_list[-1]
+
+        # Autoryzacja odbywa się w pamięci - bez zapytań do bazy
+        with self.assertNumQueries(0):
+            denied, joined, blocked, sent, broadcast = asyncio.run(scenario())
+        self.assertEqual(denied["status"], "error")
+        self.assertEqual(joined["status"], "success")
+        self.assertEqual(blocked["status"], "error")
+        self.assertEqual(sent["status"], "success")
+        self.assertEqual(broadcast.args[1]["author_username"], "member")
+        self.assertEqual(broadcast.kwargs["room"], public)
+
+    def test_persist_message_journals_in_write_behind_mode(self):
+        item = {
+            "message_uuid": None,
+            "chat_id": self.public_chat.chat_id,
+            "sender_id": self.member_user.id,
+            "author_username": "member",
+            "content": "hej",
+        }
+        with patch.object(write_behind, "ENABLED", True), patch.object(
+            write_behind, "enqueue"
+        ) as enqueue:
+            data, error = persist_message(self.org.id, "Public", item)
+        self.assertIsNone(error)
+        self.assertIsNone(data["message_id"])
+        self.assertEqual(data["channel"], "Public")
+        organization_id, queued, accepted_at = enqueue.call_args.args
+        self.assertEqual(queued["message_uuid"], data["message_uuid"])
+        self.assertFalse(Message.objects.exists())
+
+
+class SocketPersistenceTests(APITransactionTestCase):
+    # Zapis idzie przez sync_to_async (inne połączenie), więc dane muszą być zatwierdzone
+    def setUp(self):
+        owner = User.objects.create_user(username="owner", password="pwd", identifier="owner_SockOrg")
+        self.org = Organization.objects.create(name="SockOrg", created_by=owner, slug="SockOrg")
+        self.member_user = User.objects.create_user(
+            username="member", password="pwd", identifier="member_SockOrg"
+        )
+        Membership.objects.create(organization=self.org, user=self.member_user, role="member")
+        self.public_chat = Chat.objects.create(name="Public", organization=self.org)
+
+    def test_chat_message_persists_before_broadcast(self):
+        access = load_access(self.member_user)
+        public = str(self.public_chat.chat_id)
+
+        async def scenario():
+            session = {"access": access}
+            with patch.object(socket_server, "PERSIST_MESSAGES", True), \
+                    patch.object(socket_server.sio, "get_session", AsyncMock(return_value=session)), \
+                    patch.object(socket_server.sio, "rooms", lambda sid: [sid, public]), \
+                    patch.object(socket_server.sio, "emit", AsyncMock()) as emit:
+                ack = await socket_server.chat_message(
+                    "sid-1", {"channel": public, "content": "hej", "sender_id": 999}
+                )
+                empty = await socket_server.chat_message("sid-1", {"channel": public})
+                # Pola o złym typie lub za długie dostają błąd zamiast wyjątku
+                malformed = [
+                    await socket_server.chat_message("sid-1", payload)
+                    for payload in (
+                        {"channel": public, "content": "hej", "message_uuid": ["x"]},
+                        {"channel": public, "content": "hej", "message_uuid": "u" * 37},
+                        {"channel": public, "content": {"tekst": "hej"}},
+                        {"channel": public, "content": "x" * (socket_server.MAX_CONTENT_LENGTH + 1)},
+                        {"channel": [public], "content": "hej"},
+                    )
+                ]
+                return ack, empty, malformed, emit.await_args_list
+
+        ack, empty, malformed, broadcasts = asyncio.run(scenario())
+        stored = Message.objects.get(chat=self.public_chat)
+        self.assertEqual(ack["status"], "success")
+        self.assertEqual(empty["status"], "error")
+        self.assertEqual({result["status"] for result in malformed}, {"error"})
+        # Rozgłaszana jest zapisana wersja: UUID i czas nadane przez serwer
+        self.assertEqual(len(broadcasts), 1)
+        broadcast = broadcasts[0].args[1]
+        self.assertEqual(broadcast["message_id"], stored.message_id)
+        self.assertEqual(broadcast["message_uuid"], stored.message_uuid)
+        self.assertEqual(broadcast["sender_id"], self.member_user.id)
+        self.assertIsNotNone(broadcast["timestamp"])
+
+    def test_stale_access_drops_revoked_rooms_and_inactive_users(self):
+        access = load_access(self.member_user)
+        public = str(self.public_chat.chat_id)
+        # Czat staje się niedostępny, a zapamiętany dostęp jest przeterminowany
+        self.public_chat.permissions.add(Tag.objects.create(name="Zarzad", organization=self.org))
+        access.loaded_at = 0
+        rooms = {"sid-1", public}
+
+        async def leave_room(sid, room):
+            rooms.discard(room)
+
+        async def scenario():
+            session = {"access": access}
+            with patch.object(socket_server.sio, "get_session", AsyncMock(return_value=session)), \
+                    patch.object(socket_server.sio, "save_session", AsyncMock()), \
+                    patch.object(socket_server.sio, "rooms", lambda sid: list(rooms)), \
+                    patch.object(socket_server.sio, "leave_room", leave_room), \
+                    patch.object(socket_server.sio, "disconnect", AsyncMock()) as disconnect, \
+                    patch.object(socket_server.sio, "emit", AsyncMock()), \
+                    patch.object(socket_server, "presence", Presence(MemoryPresenceStore(ttl=30))):
+                malformed = await socket_server.chat_message("sid-1", "tekst")
+                revoked = await socket_server.chat_message("sid-1", {"channel": public, "content": "hej"})
+                left = set(rooms)
+
+                await sync_to_async(User.objects.filter(pk=self.member_user.pk).update)(is_active=False)
+                session["access"].loaded_at = 0
+                inactive = await socket_server.join_channel("sid-1", public)
+                return malformed, revoked, left, inactive, disconnect.await_args_list
+
+        malformed, revoked, left, inactive, disconnects = asyncio.run(scenario())
+        self.assertEqual(malformed["status"], "error")
+        self.assertEqual(revoked["status"], "error")
+        self.assertEqual(left, {"sid-1"})
+        self.assertEqual(inactive["status"], "error")
+        self.assertEqual([call.args for call in disconnects], [("sid-1",)])
+
@@ -3,6 +3,8 @@ from .views import (
     negotiate,
     get_messages,
     save_message,
+    save_messages_batch,
+    message_queue_metrics,
     delete_message,
     list_chats,
     create_chat, list_chats_all, list_chats_by_tag,
@@ -12,6 +14,8 @@ urlpatterns = [
     path("negotiate/", negotiate, name="negotiate"),
     path("messages/<int:organization_id>/", get_messages, name="get_messages"),
     path("messages/save/<int:organization_id>/", save_message, name="save_message"),
+    path("messages/save/batch/<int:organization_id>/", save_messages_batch, name="save_messages_batch"),
+    path("messages/queue/metrics/", message_queue_metrics, name="message_queue_metrics"),
     path("messages/delete/<int:organization_id>/<str:message_uuid>/", delete_message, name="delete_message"),
     path("chats/my/<int:organization_id>/", list_chats, name="list_chats_by_org"),
     path("chats/all/<int:organization_id>/", list_chats_all, name="list_all_chats_by_org"),
@@ -8,9 +8,19 @@ from django.db import IntegrityError, transaction
 from azure.messaging.webpubsubservice import WebPubSubServiceClient
 
 from .models import Message, Chat
-from organizations.models import Membership, Organization, Tag, CombinedTag
+from organizations.models import Organization, Tag, CombinedTag
 from .serializers import MessageSerializer, ChatSerializer
-from core.permissions_checker import permission_to_access
+from core.permissions_checker import filter_by_tag, get_membership_permissions
+from . import write_behind
+from .ingest import MAX_BATCH_SIZE, check_item, store_messages
+from .visibility import visible_chats
+from .pagination import (
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    encode_cursor,
+    get_message_count,
+    paginate_messages,
+)
 
 
 # -----------------------------
@@ -74,8 +84,9 @@ def get_messages(request, organization_id):
 
         chat_id = request.GET.get("chat_id")
         channel_name = request.GET.get("channel")
-        limit = int(request.GET.get("limit", 10))
-        offset = int(request.GET.get("offset", 0))
+        limit = min(int(request.GET.get("limit", 10)), MAX_PAGE_SIZE)
+        before = request.GET.get("before")
+        after = request.GET.get("after")
 
         if not chat_id and not channel_name:
             return JsonResponse({"error": "Wymagane chat_id lub channel"}, status=400)
@@ -84,35 +95,41 @@ def get_messages(request, organization_id):
         if not chat_id:
            return JsonResponse({"error": "Wymagane chat_id"}, status=400)
 
+        if before and after:
+            return JsonResponse({"error": "Podaj tylko jeden z kursorów: before lub after"}, status=400)
+
         try:
             chat = Chat.objects.get(chat_id=chat_id, organization_id=organization_id)
-            user_membership = Membership.objects.get(user=request.user, organization_id=organization_id)
+            user_membership = request.org_context.membership
             
             # Administrators have access to all chats
             # Chats without permissions/tags are visible to everyone
             if user_membership.role != 'admin':
-                chat_permissions = chat.permissions.all()
-                
+                chat_tag_ids = list(chat.permissions.values_list("id", flat=True))
+
                 # If chat has permissions, check if user has access
-                if chat_permissions.exists():
-                    user_permissions = user_membership.permissions.all()
-                    if not permission_to_access(user_permissions, chat_permissions):
+                if chat_tag_ids:
+                    if not get_membership_permissions(user_membership).can_access(chat_tag_ids):
                         return JsonResponse({"error": "Brak dostępu do tego czatu"}, status=403)
 
-            total_count = Message.objects.filter(chat=chat).count()
-            messages = Message.objects.filter(chat=chat).order_by("-timestamp")[offset:offset+limit]
-            # Reverse to get chronological order (oldest first in result)
-            messages = list(reversed(messages))
+            messages, has_more = paginate_messages(
+                Message.objects.filter(chat=chat), limit, before=before, after=after
+            )
         except Chat.DoesNotExist:
             return JsonResponse({"error": "Nie znaleziono czatu"}, status=404)
+        except InvalidCursor:
+            return JsonResponse({"error": "Nieprawidłowy kursor"}, status=400)
 
         serializer = MessageSerializer(messages, many=True)
         return JsonResponse({
             "messages": serializer.data,
-            "total": total_count,
+            # Approximate - served from a cached counter, not a COUNT(*) per page
+            "total": get_message_count(chat.chat_id),
             "limit": limit,
-            "offset": offset,
-            "has_more": (offset + limit) < total_count
+            "has_more": has_more,
+            # Pass back as ?before= for older messages or ?after= for newer ones
+            "before_cursor": encode_cursor(messages[0]) if messages else before,
+            "after_cursor": encode_cursor(messages[-1]) if messages else after,
         }, status=200)
 
     except Exception as e:
@@ -147,6 +164,23 @@ def save_message(request, organization_id):
         if not all([message_uuid, content]) or (not author_username and not sender_id):
             return JsonResponse({"error": "Brakujące wymagane pola"}, status=400)
 
+        if write_behind.ENABLED:
+            # Persisted by the background writer; checked now so that an
+            # accepted message is never rejected there.
+            item = {
+                "message_uuid": message_uuid,
+                "chat_id": chat_id,
+                "sender_id": sender_id,
+                "author_username": author_username,
+                "content": content,
+            }
+            problem = check_item(organization_id, item)
+            if problem:
+                error, error_status = problem
+                return JsonResponse({"error": error}, status=error_status)
+            write_behind.enqueue(organization_id, item)
+            return JsonResponse({"message_uuid": message_uuid, "queued": True}, status=202)
+
         # Try to link to Chat if chat_id provided
         chat_obj = None
         channel_name = None
@@ -184,16 +218,10 @@ def save_message(request, organization_id):
             # Check if message with this UUID already exists
             existing = Message.objects.filter(message_uuid=message_uuid).first()
             if existing:
-                print(f"⚠️ Duplicate message_uuid: {message_uuid}")
-                print(f"   Existing: chat={existing.chat_id}, sender={existing.sender_id}, content={existing.content[:50]}")
-                print(f"   New attempt: chat={chat_id}, sender={sender_id}, content={content[:50]}")
                 # Return the existing message instead of error
                 serializer = MessageSerializer(existing)
                 return JsonResponse(serializer.data, status=200)
-            else:
-                # Some other integrity error
-                print(f"❌ IntegrityError but no existing message found: {str(e)}")
-                return JsonResponse({"error": f"Błąd integralności bazy danych: {str(e)}"}, status=400)
+            return JsonResponse({"error": f"Błąd integralności bazy danych: {str(e)}"}, status=400)
 
         serializer = MessageSerializer(message)
         return JsonResponse(serializer.data, status=201)
@@ -202,6 +230,57 @@ def save_message(request, organization_id):
         return JsonResponse({"error": f"Błąd: {str(e)}"}, status=400)
 
 
+# -----------------------------
+# SAVE MESSAGES (BATCH)
+# -----------------------------
+@require_http_methods(["POST"])
+@csrf_exempt
+def save_messages_batch(request, organization_id):
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
+
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Nieprawidłowy JSON"}, status=400)
+
+        items = data.get("messages")
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return JsonResponse({"error": "Wymagana lista messages"}, status=400)
+        if len(items) > MAX_BATCH_SIZE:
+            return JsonResponse(
+                {"error": f"Maksymalnie {MAX_BATCH_SIZE} wiadomości w jednym żądaniu"},
+                status=400,
+            )
+
+        messages, rejected = store_messages(organization_id, items)
+
+        serializer = MessageSerializer(messages, many=True)
+        return JsonResponse({"messages": serializer.data, "rejected": rejected}, status=200)
+
+    except Exception as e:
+        return JsonResponse({"error": f"Błąd: {str(e)}"}, status=400)
+
+
+# -----------------------------
+# WRITE-BEHIND QUEUE METRICS
+# -----------------------------
+@require_http_methods(["GET"])
+@csrf_exempt
+def message_queue_metrics(request):
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
+        if not request.user.is_staff:
+            return JsonResponse({"error": "Brak uprawnień"}, status=403)
+
+        return JsonResponse(write_behind.get_metrics(), status=200)
+
+    except Exception as e:
+        return JsonResponse({"error": f"Błąd: {str(e)}"}, status=400)
+
+
 # -----------------------------
 # DELETE MESSAGE
 # -----------------------------
@@ -250,30 +329,17 @@ def list_chats(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(organization__id=organization_id, user__username=username)
+        membership = request.org_context.membership
 
         if not membership:
             return JsonResponse({"error": "Brak dostępu"}, status=403)
 
-        organization = Organization.objects.get(id=organization_id)
-        
         if membership.role == 'admin':
-            chats = list(Chat.objects.filter(organization=organization))
+            chats = Chat.objects.filter(organization_id=membership.organization_id)
         else:
-            user_permissions = membership.permissions.all()
-            chats = []
-
-            for chat in Chat.objects.filter(organization=organization):
-                chat_permissions = chat.permissions.all()
-
-                if not chat_permissions.exists():
-                    chats.append(chat)
-                elif len(user_permissions) == 0:
-                    continue
-                elif permission_to_access(user_permissions, chat_permissions):
-                    chats.append(chat)
+            chats = visible_chats(membership)
 
+        chats = chats.prefetch_related("permissions").order_by("chat_id")
         serializer = ChatSerializer(chats, many=True)
 
         return JsonResponse({"chats": serializer.data}, status=200)
@@ -290,7 +356,7 @@ def list_chats_all(request, organization_id):
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
         org_id = organization_id or request.GET.get("organization")
-        membership = Membership.objects.get(user=request.user, organization_id=org_id)
+        membership = request.org_context.membership
 
         if membership.role != 'admin':
             return JsonResponse({"error": "Tylko administratorzy mogą uzyskać dostęp do wszystkich czatów"}, status=403)
@@ -312,28 +378,17 @@ def list_chats_by_tag(request, organization_id, tag_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        membership = Membership.objects.get(user=request.user, organization_id=organization_id)
+        membership = request.org_context.membership
 
         if membership.role != 'admin':
             if tag_id not in membership.permissions.values_list('id', flat=True):
                 return JsonResponse({"error": "Niewystarczające uprawnienia do dostępu do czatów z tym tagiem"}, status=403)
 
-        organization = Organization.objects.get(id=organization_id)
-
-        chats = []
-
-        for chat in Chat.objects.filter(organization_id=organization.id):
-            if chat.permissions.filter(id=tag_id).exists():
-                chats.append(chat)
-            else:
-                combined_tags = chat.permissions.filter(combined=True)
-                for combined_tag in combined_tags:
-                    basic_tags = CombinedTag.objects.filter(combined_tag_id=combined_tag)
-                    basic_tag_ids = [bt.basic_tag_id.id for bt in basic_tags]
-                    if tag_id in basic_tag_ids:
-                        if permission_to_access(membership.permissions.all(), chat.permissions.all()):
-                            chats.append(chat)
-                            break
+        chats = filter_by_tag(
+            Chat.objects.filter(organization_id=membership.organization_id),
+            membership,
+            tag_id,
+        )
 
         serializer = ChatSerializer(chats, many=True)
 
@@ -351,7 +406,7 @@ def create_chat(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        membership = Membership.objects.get(user=request.user, organization_id=organization_id)
+        membership = request.org_context.membership
 
         if membership.role != 'admin':
             allowed_permissions = membership.permissions.all()
@@ -374,7 +429,7 @@ def create_chat(request, organization_id):
         if not name or not organization_id:
             return JsonResponse({"error": "Wymagane pola: nazwa i organizacja"}, status=400)
 
-        organization = Organization.objects.get(id=organization_id)
+        organization = request.org_context.organization
 
         permissions_ids = []
 
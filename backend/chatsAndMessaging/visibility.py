@@ -0,0 +1,213 @@
+"""Incremental maintenance of the ``ChatVisibility`` index.
+
+A chat without tags is visible to every member. Otherwise a member sees it
+when they satisfy at least one of its tags (see ``TagIndex.can_access``).
+Every change to chat tags, member tags or combined-tag composition
+recomputes only the chats or memberships it can affect.
+
+Organizations whose chats predate the index are filled in by
+``ensure_indexed`` the first time each process reads them, so a deploy needs
+no manual ``rebuild_chat_visibility`` run.
+"""
+
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.permissions_checker import get_tag_index
+from organizations.models import CombinedTag, Membership, Tag
+
+from .models import Chat, ChatVisibility
+
+ChatTags = Chat.permissions.through
+MembershipTags = Membership.permissions.through
+
+# Organizations this process has seen with a populated (or rebuilt) index.
+_indexed = set()
+_indexed_lock = threading.Lock()
+
+
+def _chat_tags(chat_filter):
+    tags = defaultdict(list)
+    for chat_id, tag_id in ChatTags.objects.filter(**chat_filter).values_list(
+        "chat_id", "tag_id"
+    ):
+        tags[chat_id].append(tag_id)
+    return tags
+
+
+def _membership_bits(index, membership_filter):
+    tags = defaultdict(list)
+    for membership_id, tag_id in MembershipTags.objects.filter(
+        **membership_filter
+    ).values_list("membership_id", "tag_id"):
+        tags[membership_id].append(tag_id)
+    return {membership_id: index.bits_for(tag_ids) for membership_id, tag_ids in tags.items()}
+
+
+def _visible_pairs(index, chat_ids, chat_tags, membership_ids, membership_bits):
+    for chat_id in chat_ids:
+        tag_ids = chat_tags.get(chat_id)
+        for membership_id in membership_ids:
+            if not tag_ids or index.can_access(membership_bits.get(membership_id, 0), tag_ids):
+                yield ChatVisibility(membership_id=membership_id, chat_id=chat_id)
+
+
+def refresh_chats(chat_ids):
+    """Recompute who can see each of ``chat_ids``."""
+    chats_by_org = defaultdict(list)
+    for chat_id, organization_id in Chat.objects.filter(pk__in=chat_ids).values_list(
+        "chat_id", "organization_id"
+    ):
+        chats_by_org[organization_id].append(chat_id)
+
+    with transaction.atomic():
+        ChatVisibility.objects.filter(chat_id__in=chat_ids).delete()
+        for organization_id, org_chat_ids in chats_by_org.items():
+            index = get_tag_index(organization_id)
+            membership_ids = list(
+                Membership.objects.filter(organization_id=organization_id).values_list(
+                    "id", flat=True
+                )
+            )
+            ChatVisibility.objects.bulk_create(
+                _visible_pairs(
+                    index,
+                    org_chat_ids,
+                    _chat_tags({"chat_id__in": org_chat_ids}),
+                    membership_ids,
+                    _membership_bits(index, {"membership__organization_id": organization_id}),
+                ),
+                # A concurrent rebuild may insert the same pairs.
+                ignore_conflicts=True,
+            )
+
+
+def refresh_memberships(membership_ids):
+    """Recompute which chats each of ``membership_ids`` can see."""
+    memberships_by_org = defaultdict(list)
+    for membership_id, organization_id in Membership.objects.filter(
+        pk__in=membership_ids
+    ).values_list("id", "organization_id"):
+        memberships_by_org[organization_id].append(membership_id)
+
+    with transaction.atomic():
+        ChatVisibility.objects.filter(membership_id__in=membership_ids).delete()
+        for organization_id, org_membership_ids in memberships_by_org.items():
+            index = get_tag_index(organization_id)
+            chat_ids = list(
+                Chat.objects.filter(organization_id=organization_id).values_list(
+                    "chat_id", flat=True
+                )
+            )
+            ChatVisibility.objects.bulk_create(
+                _visible_pairs(
+                    index,
+                    chat_ids,
+                    _chat_tags({"chat__organization_id": organization_id}),
+                    org_membership_ids,
+                    _membership_bits(index, {"membership_id__in": org_membership_ids}),
+                ),
+                ignore_conflicts=True,
+            )
+
+
+def rebuild_organization(organization_id):
+    refresh_chats(
+        list(Chat.objects.filter(organization_id=organization_id).values_list("chat_id", flat=True))
+    )
+
+
+def ensure_indexed(organization_ids):
+    """Rebuild the index of any of ``organization_ids`` that has no rows yet.
+
+    Checked once per organization and process; afterwards the signal
+    handlers below keep the index current.
+    """
+    pending = set(organization_ids) - _indexed
+    if not pending:
+        return
+    populated = set(
+        ChatVisibility.objects.filter(chat__organization_id__in=pending)
+        .values_list("chat__organization_id", flat=True)
+        .distinct()
+    )
+    for organization_id in pending - populated:
+        rebuild_organization(organization_id)
+    with _indexed_lock:
+        _indexed.update(pending)
+
+
+def visible_chats(membership):
+    """Chats the (non-admin) membership may see, via the index."""
+    ensure_indexed([membership.organization_id])
+    return Chat.objects.filter(visibility__membership=membership)
+
+
+# -----------------------------
+# Incremental maintenance
+# -----------------------------
+@receiver(post_save, sender=Chat)
+def _chat_saved(sender, instance, created, **kwargs):
+    if created:
+        refresh_chats([instance.pk])
+
+
+@receiver(post_save, sender=Membership)
+def _membership_saved(sender, instance, created, **kwargs):
+    if created:
+        refresh_memberships([instance.pk])
+
+
+@receiver(m2m_changed, sender=ChatTags)
+def _chat_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        refresh_chats([instance.pk])
+    elif pk_set:
+        refresh_chats(pk_set)
+    else:
+        # post_clear from the tag side does not report which chats lost it.
+        rebuild_organization(instance.organization_id)
+
+
+@receiver(m2m_changed, sender=MembershipTags)
+def _membership_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        refresh_memberships([instance.pk])
+    elif pk_set:
+        refresh_memberships(pk_set)
+    else:
+        rebuild_organization(instance.organization_id)
+
+
+@receiver([post_save, post_delete], sender=CombinedTag)
+def _combined_tag_changed(sender, instance, **kwargs):
+    # A changed combination only affects chats guarded by that combined tag.
+    chat_ids = list(
+        ChatTags.objects.filter(tag_id=instance.combined_tag_id_id).values_list(
+            "chat_id", flat=True
+        )
+    )
+    if chat_ids:
+        refresh_chats(chat_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def _tag_deleting(sender, instance, **kwargs):
+    instance._guarded_chat_ids = list(
+        ChatTags.objects.filter(tag=instance).values_list("chat_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+def _tag_deleted(sender, instance, **kwargs):
+    chat_ids = getattr(instance, "_guarded_chat_ids", None)
+    if chat_ids:
+        refresh_chats(chat_ids)
@@ -0,0 +1,269 @@
+"""Write-behind persistence for chat messages.
+
+Opt-in via ``CHAT_WRITE_BEHIND``. ``save_message`` then appends the message to
+a local SQLite journal and answers right away, and a background thread drains
+the journal into the database in batches through ``store_messages``.
+
+Rows are drained in the order they were accepted and are removed from the
+journal only after they are stored. A crash therefore replays them on the
+next drain, and ``message_uuid`` deduplication makes the replay harmless.
+Rows that can never be stored (unreadable or invalid payloads, or ones the
+database refuses for anything but a lost connection) are moved to the
+``dead_letter`` table instead, so they do not hold up the rows behind them.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections
+
+from .ingest import item_error, store_messages
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, "CHAT_WRITE_BEHIND", False)
+QUEUE_PATH = getattr(
+    settings, "CHAT_WRITE_BEHIND_QUEUE_PATH", "chat_write_behind.sqlite3"
+)
+BATCH_SIZE = getattr(settings, "CHAT_WRITE_BEHIND_BATCH_SIZE", 200)
+FLUSH_INTERVAL = getattr(settings, "CHAT_WRITE_BEHIND_FLUSH_INTERVAL", 0.5)
+
+# Errors worth retrying the whole batch for; anything else is blamed on a row.
+TRANSIENT_ERRORS = (InterfaceError, OperationalError)
+
+
+class MessageJournal:
+    """Append-only FIFO of accepted messages, stored in a local SQLite file."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " organization_id INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " accepted_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter ("
+            " seq INTEGER PRIMARY KEY,"
+            " organization_id INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " accepted_at REAL NOT NULL,"
+            " error TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def append(self, organization_id, item, accepted_at=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO journal (organization_id, payload, accepted_at) VALUES (?, ?, ?)",
+                (organization_id, json.dumps(item), accepted_at or time.time()),
+            )
+
+    def peek(self, limit):
+        with self._lock:
+            return self._db.execute(
+                "SELECT seq, organization_id, payload, accepted_at FROM journal"
+                " ORDER BY seq LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def remove_through(self, seq):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM journal WHERE seq <= ?", (seq,))
+
+    def dead_letter(self, failures):
+        """Move ``(seq, error)`` rows out of the journal into ``dead_letter``."""
+        with self._lock, self._db:
+            for seq, error in failures:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO dead_letter"
+                    " (seq, organization_id, payload, accepted_at, error)"
+                    " SELECT seq, organization_id, payload, accepted_at, ? FROM journal"
+                    " WHERE seq = ?",
+                    (error, seq),
+                )
+                self._db.execute("DELETE FROM journal WHERE seq = ?", (seq,))
+
+    def dead_letters(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT seq, organization_id, payload, error FROM dead_letter ORDER BY seq"
+            ).fetchall()
+
+    def stats(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*), MIN(accepted_at) FROM journal"
+            ).fetchone()
+
+
+class FlushMetrics:
+    def __init__(self):
+        self.flushed_total = 0
+        self.rejected_total = 0
+        self.last_flush_at = None
+        self.last_flush_duration = None
+        self.last_flush_latency = None
+
+    def record(self, flushed, rejected, started, finished, oldest_accepted_at):
+        self.flushed_total += flushed
+        self.rejected_total += rejected
+        self.last_flush_at = finished
+        self.last_flush_duration = finished - started
+        self.last_flush_latency = finished - oldest_accepted_at
+
+
+def _store(organization_id, entries, timestamps, failures):
+    """Store ``(seq, item)`` entries; returns the items ``store_messages`` rejected.
+
+    When the batch fails for a reason other than the connection, the entries
+    are retried one by one and those that still fail go to ``failures``.
+    """
+    try:
+        _, rejected = store_messages(
+            organization_id, [item for _, item in entries], timestamps=timestamps
+        )
+        return rejected
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as exc:
+        if len(entries) == 1:
+            logger.exception("Dead-lettering queued message row %s", entries[0][0])
+            failures.append((entries[0][0], str(exc) or type(exc).__name__))
+            return []
+    rejected = []
+    for entry in entries:
+        rejected.extend(_store(organization_id, [entry], timestamps, failures))
+    return rejected
+
+
+def flush_once(journal, metrics, limit=BATCH_SIZE):
+    """Store up to ``limit`` journalled messages and drop them from the journal.
+
+    Returns the number of journal rows handled. Connection errors propagate and
+    leave the rows in place for the next attempt; rows that fail on their own
+    are moved to the dead-letter table.
+    """
+    rows = journal.peek(limit)
+    if not rows:
+        return 0
+
+    started = time.time()
+    by_organization = defaultdict(list)
+    timestamps = {}
+    failures = []
+    for seq, organization_id, payload, accepted_at in rows:
+        try:
+            item = json.loads(payload)
+        except ValueError:
+            item = None
+        error = item_error(item) if isinstance(item, dict) else "Nieczytelny wpis"
+        if error:
+            logger.warning("Dead-lettering queued message row %s: %s", seq, error)
+            failures.append((seq, error))
+            continue
+        by_organization[organization_id].append((seq, item))
+        timestamps.setdefault(
+            item["message_uuid"], datetime.fromtimestamp(accepted_at, tz=dt_timezone.utc)
+        )
+
+    rejected_count = 0
+    for organization_id, entries in by_organization.items():
+        rejected = _store(organization_id, entries, timestamps, failures)
+        for entry in rejected:
+            logger.warning(
+                "Dropping queued message %s: %s", entry["message_uuid"], entry["error"]
+            )
+        rejected_count += len(rejected)
+
+    if failures:
+        journal.dead_letter(failures)
+    journal.remove_through(rows[-1][0])
+    metrics.record(len(rows), rejected_count + len(failures), started, time.time(), rows[0][3])
+    return len(rows)
+
+
+def drain(journal, metrics, batch_size=BATCH_SIZE):
+    """Flush full batches until the journal is empty; returns rows handled."""
+    total = 0
+    while True:
+        flushed = flush_once(journal, metrics, batch_size)
+        total += flushed
+        if flushed < batch_size:
+            return total
+
+
+class WriteBehindWorker(threading.Thread):
+    def __init__(self, journal, metrics):
+        super().__init__(name="chat-write-behind", daemon=True)
+        self.journal = journal
+        self.metrics = metrics
+        self.wake = threading.Event()
+
+    def run(self):
+        while True:
+            self.wake.wait(FLUSH_INTERVAL)
+            self.wake.clear()
+            close_old_connections()
+            try:
+                drain(self.journal, self.metrics)
+            except Exception:
+                logger.exception("Chat write-behind flush failed, retrying")
+
+
+_journal = None
+_worker = None
+_metrics = FlushMetrics()
+_start_lock = threading.Lock()
+
+
+def get_journal():
+    global _journal
+    with _start_lock:
+        if _journal is None:
+            _journal = MessageJournal(QUEUE_PATH)
+        return _journal
+
+
+def _ensure_worker():
+    global _worker
+    journal = get_journal()
+    with _start_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = WriteBehindWorker(journal, _metrics)
+            _worker.start()
+        return _worker
+
+
+def enqueue(organization_id, item, accepted_at=None):
+    """Journal one message for the background writer."""
+    get_journal().append(organization_id, item, accepted_at)
+    _ensure_worker()
+
+
+def get_metrics():
+    depth, oldest = get_journal().stats()
+    now = time.time()
+
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 1)
+
+    return {
+        "enabled": ENABLED,
+        "queue_depth": depth,
+        "oldest_pending_age_ms": ms(now - oldest) if oldest else None,
+        "flushed_total": _metrics.flushed_total,
+        "rejected_total": _metrics.rejected_total,
+        "last_flush_duration_ms": ms(_metrics.last_flush_duration),
+        "last_flush_latency_ms": ms(_metrics.last_flush_latency),
+    }
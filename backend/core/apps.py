@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from . import email_queue  # noqa: F401  (registers the email transport check)
+        from . import permissions_checker  # noqa: F401  (registers cache invalidation signals)
@@ -2,12 +2,25 @@ import uuid
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
 
 
 class UsernameOrIdentifierBackend(ModelBackend):
-    """Allow staff users to authenticate via username in addition to identifier."""
+    """Allow staff users to authenticate via username in addition to identifier.
+
+    Identifier logins (``identifier=...``, used by the organization login)
+    are decided here: a failure raises ``PermissionDenied`` so that
+    ``ModelBackend`` does not repeat the lookup and the password hash.
+    ``candidate`` may carry the user the caller already loaded for that
+    identifier.
+    """
+
+    def authenticate(
+        self, request, username=None, password=None, identifier=None, candidate=None, **kwargs
+    ):
+        if identifier is not None:
+            return self._authenticate_identifier(str(identifier), password, candidate)
 
-    def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None or password is None:
             return None
 
@@ -33,3 +46,17 @@ class UsernameOrIdentifierBackend(ModelBackend):
                 return candidate
 
         return None
+
+    def _authenticate_identifier(self, identifier, password, candidate):
+        if password is None:
+            raise PermissionDenied
+        UserModel = get_user_model()
+        user = candidate
+        if user is None or str(user.identifier) != identifier:
+            user = UserModel.objects.filter(identifier=identifier).first()
+        if user is None:
+            # Hash anyway, so unknown identifiers take as long as wrong passwords.
+            UserModel().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
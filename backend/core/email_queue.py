@@ -0,0 +1,328 @@
+"""Background delivery of outbound email.
+
+``enqueue`` stores the message as an ``OutboundEmail`` row inside the
+caller's transaction and wakes the worker pool once it commits, so request
+handlers never wait for the email provider. Workers claim due rows in
+batches, pass them to the configured transport and retry failures with
+exponential backoff. Rows claimed by a worker that died are reclaimed after
+``SENDING_TIMEOUT``.
+
+Transports (``EMAIL_QUEUE_TRANSPORT``):
+
+* ``core.email_queue.AcsTransport`` - Azure Communication Services, with one
+  client reused for every send;
+* ``core.email_queue.DjangoMailTransport`` - Django's ``EMAIL_BACKEND``, i.e.
+  an SMTP server, or locmem in tests.
+
+A transport that is not configured, or one that would keep the credentials in
+plain text (unless ``EMAIL_ALLOW_PLAIN_TEXT`` opts in), fails the
+``core.E001`` system check and is never instantiated, so the queue waits
+instead of leaking or dropping emails.
+"""
+
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.checks import Error, register
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboundEmail
+
+try:
+    from azure.communication.email import EmailClient
+    from azure.core.exceptions import AzureError
+except ImportError:  # pragma: no cover
+    EmailClient = None  # type: ignore
+    AzureError = Exception  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+TRANSPORT = getattr(settings, "EMAIL_QUEUE_TRANSPORT", "core.email_queue.AcsTransport")
+# In-process workers; 0 leaves delivery to the send_queued_emails command.
+WORKERS = getattr(settings, "EMAIL_QUEUE_WORKERS", 2)
+BATCH_SIZE = getattr(settings, "EMAIL_QUEUE_BATCH_SIZE", 20)
+MAX_ATTEMPTS = getattr(settings, "EMAIL_QUEUE_MAX_ATTEMPTS", 6)
+RETRY_BASE = getattr(settings, "EMAIL_QUEUE_RETRY_BASE", 30)  # seconds
+RETRY_MAX = getattr(settings, "EMAIL_QUEUE_RETRY_MAX", 60 * 60)
+POLL_INTERVAL = getattr(settings, "EMAIL_QUEUE_POLL_INTERVAL", 5)
+SENDING_TIMEOUT = timedelta(minutes=10)
+# Django mail backends that print or store messages; only allowed with
+# EMAIL_ALLOW_PLAIN_TEXT.
+PLAIN_TEXT_BACKENDS = {
+    "django.core.mail.backends.console.EmailBackend",
+    "django.core.mail.backends.filebased.EmailBackend",
+}
+
+
+# -----------------------------
+# Transports
+# -----------------------------
+def _extract_message_id(result: object) -> str | None:
+    if isinstance(result, dict):
+        for key in ("id", "message_id", "messageId"):
+            value = result.get(key)  # type: ignore[arg-type]
+            if value:
+                return value  # type: ignore[return-value]
+        return None
+    for attr in ("id", "message_id", "messageId"):
+        value = getattr(result, attr, None)
+        if value:
+            return value  # type: ignore[return-value]
+    return None
+
+
+class AcsTransport:
+    def __init__(self):
+        connection_string = getattr(settings, "AZURE_COMMUNICATION_CONNECTION_STRING", "")
+        self.sender = getattr(settings, "AZURE_COMMUNICATION_SENDER_EMAIL", "")
+        if EmailClient is None:
+            raise ImproperlyConfigured("azure-communication-email is not installed")
+        if not connection_string or not self.sender:
+            raise ImproperlyConfigured("Missing ACS connection string or sender address")
+        self.client = EmailClient.from_connection_string(connection_string)
+
+    def send_batch(self, emails):
+        """Start every send, then wait for them; returns ``{pk: error or None}``."""
+        results, pollers = {}, []
+        for email in emails:
+            message = {
+                "senderAddress": self.sender,
+                "recipients": {"to": [{"address": email.recipient}]},
+                "content": {
+                    "subject": email.subject,
+                    "plainText": email.plain_text,
+                    "html": email.html,
+                },
+            }
+            try:
+                pollers.append((email, self.client.begin_send(message)))
+            except AzureError as exc:  # type: ignore
+                results[email.pk] = str(exc)
+        for email, poller in pollers:
+            try:
+                result = poller.result()
+            except AzureError as exc:  # type: ignore
+                results[email.pk] = str(exc)
+                continue
+            logger.info(
+                "Email sent via ACS to %s message_id=%s",
+                email.recipient,
+                _extract_message_id(result) or "<unknown>",
+            )
+            results[email.pk] = None
+        return results
+
+
+class DjangoMailTransport:
+    def send_batch(self, emails):
+        """Send over one backend connection; returns ``{pk: error or None}``."""
+        results = {}
+        with get_connection() as connection:
+            for email in emails:
+                message = EmailMultiAlternatives(
+                    email.subject,
+                    email.plain_text,
+                    settings.DEFAULT_FROM_EMAIL,
+                    [email.recipient],
+                    connection=connection,
+                )
+                if email.html:
+                    message.attach_alternative(email.html, "text/html")
+                try:
+                    message.send()
+                    results[email.pk] = None
+                except Exception as exc:
+                    results[email.pk] = str(exc)
+        return results
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def transport_problem():
+    """Why the configured transport must not be used, or None."""
+    transport = import_string(TRANSPORT)
+    if (
+        issubclass(transport, DjangoMailTransport)
+        and settings.EMAIL_BACKEND in PLAIN_TEXT_BACKENDS
+        and not getattr(settings, "EMAIL_ALLOW_PLAIN_TEXT", False)
+    ):
+        return (
+            f"{settings.EMAIL_BACKEND} keeps credential emails in plain text;"
+            " set EMAIL_QUEUE_TRANSPORT or EMAIL_ALLOW_PLAIN_TEXT=1"
+        )
+    if issubclass(transport, AcsTransport):
+        if EmailClient is None:
+            return "azure-communication-email is not installed"
+        if not getattr(settings, "AZURE_COMMUNICATION_CONNECTION_STRING", "") or not getattr(
+            settings, "AZURE_COMMUNICATION_SENDER_EMAIL", ""
+        ):
+            return "Missing ACS connection string or sender address"
+    return None
+
+
+@register()
+def check_email_transport(app_configs, **kwargs):
+    problem = transport_problem()
+    if problem is None:
+        return []
+    return [Error(f"Outbound email transport {TRANSPORT} is unusable: {problem}", id="core.E001")]
+
+
+def get_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            problem = transport_problem()
+            if problem:
+                raise ImproperlyConfigured(problem)
+            _transport = import_string(TRANSPORT)()
+        return _transport
+
+
+# -----------------------------
+# Queue
+# -----------------------------
+def retry_delay(attempts):
+    """Backoff after ``attempts`` failed tries: doubling, capped, +/-20% jitter."""
+    delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """Mark up to ``limit`` due emails as being sent by this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutboundEmail.Status.PENDING, OutboundEmail.Status.SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at")[:limit]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            status=OutboundEmail.Status.SENDING,
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + SENDING_TIMEOUT,
+        )
+    for email in batch:
+        email.attempts += 1
+    return batch
+
+
+def process_batch(transport=None, limit=BATCH_SIZE):
+    """Send one batch of due emails; returns how many were attempted.
+
+    A misconfigured transport raises before anything is claimed, so the
+    emails stay pending without using up their attempts.
+    """
+    transport = transport or get_transport()
+    batch = claim_batch(limit)
+    if not batch:
+        return 0
+    try:
+        results = transport.send_batch(batch)
+    except Exception as exc:
+        logger.exception("Email transport failed for a batch of %d", len(batch))
+        results = {email.pk: str(exc) for email in batch}
+
+    now = timezone.now()
+    for email in batch:
+        error = results.get(email.pk, "No result from transport")
+        rows = OutboundEmail.objects.filter(pk=email.pk)
+        if error is None:
+            # The bodies carry credentials; they are not kept once delivered.
+            rows.update(
+                status=OutboundEmail.Status.SENT, sent_at=now, last_error="", plain_text="", html=""
+            )
+        elif email.attempts >= MAX_ATTEMPTS:
+            logger.error("Giving up on email %s to %s: %s", email.pk, email.recipient, error)
+            # Nor once they can no longer be delivered.
+            rows.update(
+                status=OutboundEmail.Status.FAILED, last_error=error, plain_text="", html=""
+            )
+        else:
+            rows.update(
+                status=OutboundEmail.Status.PENDING,
+                next_attempt_at=now + retry_delay(email.attempts),
+                last_error=error,
+            )
+    return len(batch)
+
+
+def drain(transport=None, batch_size=BATCH_SIZE):
+    """Send batches until no email is due; returns emails attempted."""
+    total = 0
+    while True:
+        handled = process_batch(transport, batch_size)
+        total += handled
+        if handled < batch_size:
+            return total
+
+
+class EmailWorker(threading.Thread):
+    def __init__(self, number, wake):
+        super().__init__(name=f"email-queue-{number}", daemon=True)
+        self.wake = wake
+
+    def run(self):
+        while True:
+            self.wake.wait(POLL_INTERVAL)
+            self.wake.clear()
+            close_old_connections()
+            try:
+                drain()
+            except Exception:
+                logger.exception("Email queue worker failed, retrying")
+
+
+_workers = []
+_wake = threading.Event()
+_start_lock = threading.Lock()
+
+
+def _ensure_workers():
+    with _start_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        while len(_workers) < WORKERS:
+            worker = EmailWorker(len(_workers), _wake)
+            worker.start()
+            _workers.append(worker)
+
+
+def _wake_workers():
+    if WORKERS:
+        _ensure_workers()
+        _wake.set()
+
+
+def enqueue(recipient, subject, plain_text, html=""):
+    """Queue an email; it is sent after the surrounding transaction commits."""
+    email = OutboundEmail.objects.create(
+        recipient=recipient, subject=subject, plain_text=plain_text, html=html
+    )
+    transaction.on_commit(_wake_workers)
+    return email
+
+
+def enqueue_many(messages):
+    """Queue ``(recipient, subject, plain_text, html)`` tuples with one insert."""
+    emails = OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(recipient=recipient, subject=subject, plain_text=plain_text, html=html)
+            for recipient, subject, plain_text, html in messages
+        ]
+    )
+    if emails:
+        transaction.on_commit(_wake_workers)
+    return emails
@@ -0,0 +1,35 @@
+"""Password hashers whose cost parameters come from settings.
+
+``PASSWORD_HASHER_PROFILE`` picks the hasher new passwords are hashed with
+(see ``settings.PASSWORD_HASHER_PROFILES``); the others stay installed so
+existing hashes still verify and are upgraded on the next login. Use the
+``benchmark_password_hashers`` command to measure a profile before
+switching to it.
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = getattr(settings, "PBKDF2_ITERATIONS", PBKDF2PasswordHasher.iterations)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id; needs ``argon2-cffi``. Defaults follow the OWASP minimum."""
+
+    time_cost = getattr(settings, "ARGON2_TIME_COST", 2)
+    memory_cost = getattr(settings, "ARGON2_MEMORY_COST", 19 * 1024)  # KiB
+    parallelism = getattr(settings, "ARGON2_PARALLELISM", 1)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = getattr(settings, "SCRYPT_WORK_FACTOR", 2**14)
+    block_size = getattr(settings, "SCRYPT_BLOCK_SIZE", 8)
+    parallelism = getattr(settings, "SCRYPT_PARALLELISM", 1)
+    # OpenSSL refuses to use more than 32 MiB unless told otherwise.
+    maxmem = 2 * 128 * work_factor * block_size * parallelism
@@ -0,0 +1,107 @@
+"""Stateless API authentication (``AUTH_MODE = "jwt"``).
+
+API requests are authenticated from the ``Authorization: Bearer`` access
+token alone: no session row is read or written, and the user is only loaded
+when a view touches ``request.user``. The token carries the user id and the
+user's organization memberships at login (``memberships``: organization
+id -> role). ``OrganizationContext`` treats them as a hint only: access is
+still decided by the (cached) membership lookup, so memberships added or
+removed after login apply without a new token. Sessions are still used for ``SESSION_PATH_PREFIXES`` (the admin site).
+
+The two middleware classes subclass Django's session and authentication
+middleware, so they replace them in ``MIDDLEWARE`` one for one.
+"""
+
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from organizations.models import Membership
+
+STATELESS = getattr(settings, "AUTH_MODE", "session") == "jwt"
+SESSION_PATH_PREFIXES = tuple(getattr(settings, "SESSION_PATH_PREFIXES", ("/admin/",)))
+
+_authentication = JWTAuthentication()
+
+
+def token_for(user):
+    """Refresh token for ``user``; it and its access tokens carry the memberships."""
+    refresh = RefreshToken.for_user(user)
+    refresh["username"] = user.username
+    refresh["memberships"] = {
+        str(organization_id): role
+        for organization_id, role in Membership.objects.filter(user=user).values_list(
+            "organization_id", "role"
+        )
+    }
+    return refresh
+
+
+def token_memberships(request):
+    """``{organization id: role}`` from the request's token, or None without one."""
+    token = getattr(request, "auth_token", None)
+    if token is None:
+        return None
+    memberships = token.get("memberships")
+    if memberships is None:
+        return None
+    return {int(organization_id): role for organization_id, role in memberships.items()}
+
+
+def _validated_token(request):
+    header = _authentication.get_header(request)
+    raw_token = _authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return _authentication.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+
+
+def _token_user(token):
+    if token is None:
+        return AnonymousUser()
+    try:
+        return _authentication.get_user(token)
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+
+def _uses_session(request):
+    return request.path.startswith(SESSION_PATH_PREFIXES)
+
+
+class AdminSessionMiddleware(SessionMiddleware):
+    """``SessionMiddleware`` that only runs for ``SESSION_PATH_PREFIXES``."""
+
+    def process_request(self, request):
+        if _uses_session(request):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if not hasattr(request, "session"):
+            return response
+        return super().process_response(request, response)
+
+
+class TokenAuthenticationMiddleware(AuthenticationMiddleware):
+    """Set ``request.user`` from the JWT, or from the session where there is one."""
+
+    def process_request(self, request):
+        if hasattr(request, "session"):
+            request.auth_token = None
+            return super().process_request(request)
+        token = _validated_token(request)
+        request.auth_token = token
+        request.user = SimpleLazyObject(lambda: _token_user(token))
+        request.auser = partial(sync_to_async(_token_user), token)
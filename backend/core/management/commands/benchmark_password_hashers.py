@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from core import passwords
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure hashing latency and bulk throughput of the password hasher "
+        "profiles, to pick PASSWORD_HASHER_PROFILE and its cost parameters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            default=list(settings.PASSWORD_HASHER_PROFILES),
+            help="Profiles to measure (default: all).",
+        )
+        parser.add_argument(
+            "--samples", type=int, default=10, help="Single hashes timed for latency."
+        )
+        parser.add_argument(
+            "--count", type=int, default=64, help="Passwords hashed for bulk throughput."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Hashing processes: {passwords.WORKERS}")
+        self.stdout.write(
+            f"{'profile':<8} {'median ms':>10} {'p95 ms':>8} {'seq/s':>8} {'pool/s':>8}"
+        )
+        for profile in options["profiles"]:
+            algorithm = import_string(settings.PASSWORD_HASHER_PROFILES[profile]).algorithm
+            try:
+                hasher = get_hasher(algorithm)
+                hasher.encode("warm-up", hasher.salt())
+            except ValueError as exc:  # e.g. argon2-cffi is not installed
+                self.stdout.write(f"{profile:<8} skipped: {exc}")
+                continue
+
+            latencies = []
+            for i in range(options["samples"]):
+                started = time.perf_counter()
+                hasher.encode(f"benchmark-{i}", hasher.salt())
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            median = statistics.median(latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+            started = time.perf_counter()
+            passwords.hash_passwords(
+                (f"benchmark-{i}" for i in range(options["count"])), hasher=algorithm
+            )
+            pool_rate = options["count"] / (time.perf_counter() - started)
+
+            self.stdout.write(
+                f"{profile:<8} {median * 1000:>10.1f} {p95 * 1000:>8.1f}"
+                f" {1 / median:>8.1f} {pool_rate:>8.1f}"
+            )
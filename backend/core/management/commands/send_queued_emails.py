@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import email_queue
+
+
+class Command(BaseCommand):
+    help = "Send every email that is due in the outbound email queue."
+
+    def handle(self, *args, **options):
+        attempted = email_queue.drain()
+        self.stdout.write(self.style.SUCCESS(f"Attempted {attempted} queued email(s)."))
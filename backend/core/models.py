@@ -2,6 +2,7 @@ import uuid
 
 from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.db import models
 
@@ -17,6 +18,33 @@ class UserManager(DjangoUserManager):
         user.save(using=self._db)
         return user
 
+    def build_users(self, users):
+        """Unsaved users from ``create_user``-style dicts, hashed in a process pool.
+
+        Each dict holds ``username`` and optionally ``email``, ``password``,
+        ``identifier`` and other model fields.
+        """
+        from .passwords import hash_passwords
+
+        specs = [dict(spec) for spec in users]
+        hashes = hash_passwords(spec.pop("password", None) for spec in specs)
+        built = []
+        for spec, encoded in zip(specs, hashes):
+            if not spec.get("username"):
+                raise ValueError("The username must be set")
+            identifier = spec.pop("identifier", None) or uuid.uuid4().hex
+            identifier = self.model.normalize_username(identifier)
+            user = self.model(
+                email=self.normalize_email(spec.pop("email", None)), password=encoded, **spec
+            )
+            setattr(user, self.model.USERNAME_FIELD, identifier)
+            built.append(user)
+        return built
+
+    def bulk_create_users(self, users, batch_size=500):
+        """Create many users with one insert per ``batch_size``; sends no signals."""
+        return self.bulk_create(self.build_users(users), batch_size=batch_size)
+
     def create_user(self, username, email=None, password=None, **extra_fields):
         if not username:
             raise ValueError("The username must be set")
@@ -67,3 +95,31 @@ class User(AbstractUser):
         if self.get_full_name():
             return self.get_full_name()
         return str(self.identifier)
+
+
+class OutboundEmail(models.Model):
+    """An email handed to the background delivery queue (``core.email_queue``)."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Oczekuje"
+        SENDING = "sending", "Wysyłanie"
+        SENT = "sent", "Wysłano"
+        FAILED = "failed", "Błąd"
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    plain_text = models.TextField(blank=True)
+    html = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a pending email is due, or when a claimed one may be reclaimed.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.subject} ({self.status})"
@@ -0,0 +1,50 @@
+"""Password hashing for many users at once.
+
+Hashing is deliberately slow, so hashing hundreds of passwords on the
+request thread dominates bulk operations. ``hash_passwords`` spreads the
+work over a process pool that is started on first use and then reused.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+WORKERS = getattr(settings, "PASSWORD_HASH_WORKERS", None) or os.cpu_count() or 1
+# Below this many passwords the pool's overhead is not worth it.
+PARALLEL_THRESHOLD = getattr(settings, "PASSWORD_HASH_PARALLEL_THRESHOLD", 8)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:  # spawned (not forked) workers start without Django
+        django.setup()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, initializer=_init_worker)
+        return _pool
+
+
+def hash_passwords(passwords, hasher="default"):
+    """``make_password`` for each of ``passwords``, in order.
+
+    ``hasher`` is an algorithm name from ``PASSWORD_HASHERS`` or "default".
+    """
+    passwords = list(passwords)
+    encode = partial(make_password, hasher=hasher)
+    if WORKERS <= 1 or len(passwords) < PARALLEL_THRESHOLD:
+        return [encode(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (WORKERS * 4))
+    return list(_get_pool().map(encode, passwords, chunksize=chunksize))
@@ -1,34 +1,220 @@
-from organizations.models import CombinedTag
+from dataclasses import dataclass, field
+import uuid
 
-def permission_to_access(user_permissions, required_permissions):
-    basicTags = required_permissions.filter(combined=False)
-    combinedTags = required_permissions.filter(combined=True)
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from organizations.models import CombinedTag, Membership, Tag
+
+CACHE_TIMEOUT = getattr(settings, "TAG_PERMISSION_CACHE_TIMEOUT", 300)
+
+
+def _index_key(organization_id):
+    return f"tagperm:index:{organization_id}"
+
+
+def _membership_key(membership_id):
+    return f"tagperm:membership:{membership_id}"
+
+
+@dataclass(frozen=True)
+class TagIndex:
+    """Compiled view of one organization's Tag/CombinedTag graph.
+
+    Every tag gets its own bit. ``masks`` maps a tag id to the bits a user must
+    hold to satisfy it: its own bit for a basic tag, the AND-mask of its basic
+    tags for a combined tag. ``containing`` is the closure the other way round:
+    a basic tag id to the combined tags built from it.
+    """
+
+    organization_id: int
+    generation: str
+    bits: dict = field(default_factory=dict)
+    masks: dict = field(default_factory=dict)
+    containing: dict = field(default_factory=dict)
+
+    def bits_for(self, tag_ids):
+        value = 0
+        for tag_id in tag_ids:
+            value |= self.bits.get(tag_id, 0)
+        return value
+
+    def can_access(self, user_bits, required_tag_ids):
+        for tag_id in required_tag_ids:
+            mask = self.masks.get(tag_id)
+            if mask is not None and user_bits & mask == mask:
+                return True
+        return False
+
+    def can_add(self, user_bits, required_tag_ids):
+        for tag_id in required_tag_ids:
+            mask = self.masks.get(tag_id)
+            if mask is None or user_bits & mask != mask:
+                return False
+        return True
+
+
+def build_tag_index(organization_id):
+    tags = list(
+        Tag.objects.filter(organization_id=organization_id)
+        .order_by("id")
+        .values_list("id", "combined")
+    )
+    bits = {tag_id: 1 << position for position, (tag_id, _) in enumerate(tags)}
+    masks = {tag_id: 0 if combined else bits[tag_id] for tag_id, combined in tags}
+
+    links = CombinedTag.objects.filter(
+        combined_tag_id__organization_id=organization_id
+    ).values_list("combined_tag_id", "basic_tag_id")
+    containing = {}
+    for combined_id, basic_id in links:
+        if combined_id in masks:
+            masks[combined_id] |= bits.get(basic_id, 0)
+            containing.setdefault(basic_id, set()).add(combined_id)
+
+    return TagIndex(
+        organization_id=organization_id,
+        generation=uuid.uuid4().hex,
+        bits=bits,
+        masks=masks,
+        containing={tag_id: frozenset(ids) for tag_id, ids in containing.items()},
+    )
+
+
+def get_tag_index(organization_id):
+    index = cache.get(_index_key(organization_id))
+    if index is None:
+        index = build_tag_index(organization_id)
+        cache.set(_index_key(organization_id), index, CACHE_TIMEOUT)
+    return index
+
+
+class MembershipPermissions:
+    """A membership's permission bitset bound to its organization's tag index."""
+
+    def __init__(self, index, bits):
+        self.index = index
+        self.bits = bits
 
-    for tag in basicTags:
-        if tag in user_permissions:
-            return True
+    def can_access(self, required_tag_ids):
+        return self.index.can_access(self.bits, required_tag_ids)
 
-    for combinedTag in combinedTags:
-        basic_tags = CombinedTag.objects.filter(combined_tag_id=combinedTag)
-        has_all_basic_tags = all(basic_tag.basic_tag_id in user_permissions for basic_tag in basic_tags)
-        if has_all_basic_tags:
-            return True
+    def can_add(self, required_tag_ids):
+        return self.index.can_add(self.bits, required_tag_ids)
 
-    return False
+
+def get_membership_permissions(membership):
+    index = get_tag_index(membership.organization_id)
+    cached = cache.get(_membership_key(membership.pk))
+    if cached is not None and cached[0] == index.generation:
+        return MembershipPermissions(index, cached[1])
+
+    tag_ids = membership.permissions.values_list("id", flat=True)
+    bits = index.bits_for(tag_ids)
+    cache.set(_membership_key(membership.pk), (index.generation, bits), CACHE_TIMEOUT)
+    return MembershipPermissions(index, bits)
+
+
+def filter_by_tag(queryset, membership, tag_id):
+    """Items of ``queryset`` (a model with a ``permissions`` tag m2m) for one tag.
+
+    An item matches when it carries ``tag_id`` itself, or carries a combined
+    tag built from it and ``membership`` can access the item. The candidates
+    come from a single query through the cached tag closure.
+    """
+    index = get_tag_index(membership.organization_id)
+    tag_ids = {tag_id, *index.containing.get(tag_id, ())}
+    candidates = (
+        queryset.filter(permissions__id__in=tag_ids)
+        .distinct()
+        .prefetch_related("permissions")
+    )
+
+    permissions = None
+    items = []
+    for item in candidates:
+        item_tag_ids = [tag.id for tag in item.permissions.all()]
+        if tag_id in item_tag_ids:
+            items.append(item)
+            continue
+        if permissions is None:
+            permissions = get_membership_permissions(membership)
+        if permissions.can_access(item_tag_ids):
+            items.append(item)
+    return items
+
+
+def permission_to_access(user_permissions, required_permissions):
+    required_tags = list(required_permissions)
+    if not required_tags:
+        return False
+
+    index = get_tag_index(required_tags[0].organization_id)
+    user_bits = index.bits_for(tag.id for tag in user_permissions)
+    return index.can_access(user_bits, [tag.id for tag in required_tags])
 
 
 def permission_to_add(user_permissions, required_permissions):
-    basicTags = required_permissions.filter(combined=False)
-    combinedTags = required_permissions.filter(combined=True)
+    required_tags = list(required_permissions)
+    if not required_tags:
+        return True
+
+    index = get_tag_index(required_tags[0].organization_id)
+    user_bits = index.bits_for(tag.id for tag in user_permissions)
+    return index.can_add(user_bits, [tag.id for tag in required_tags])
+
+
+# -----------------------------
+# Cache invalidation
+# -----------------------------
+def invalidate_cached(key):
+    # Drop the entry now and again after commit, so a concurrent reader cannot
+    # re-cache the pre-commit state for the rest of the timeout.
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_tag_index(organization_id):
+    invalidate_cached(_index_key(organization_id))
+
+
+def invalidate_membership_permissions(membership_id):
+    invalidate_cached(_membership_key(membership_id))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def _tag_changed(sender, instance, **kwargs):
+    invalidate_tag_index(instance.organization_id)
+
+
+@receiver([post_save, post_delete], sender=CombinedTag)
+def _combined_tag_changed(sender, instance, **kwargs):
+    organization_id = (
+        Tag.objects.filter(pk=instance.combined_tag_id_id)
+        .values_list("organization_id", flat=True)
+        .first()
+    )
+    if organization_id is not None:
+        invalidate_tag_index(organization_id)
+
 
-    for tag in basicTags:
-        if tag not in user_permissions:
-            return False
+@receiver(m2m_changed, sender=Membership.permissions.through)
+def _membership_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_membership_permissions(instance.pk)
+    elif pk_set:
+        for membership_id in pk_set:
+            invalidate_membership_permissions(membership_id)
+    else:
+        # post_clear from the tag side does not report which memberships lost it.
+        invalidate_tag_index(instance.organization_id)
 
-    for combinedTag in combinedTags:
-        basic_tags = CombinedTag.objects.filter(combined_tag_id=combinedTag)
-        has_all_basic_tags = all(basic_tag.basic_tag_id in user_permissions for basic_tag in basic_tags)
-        if not has_all_basic_tags:
-            return False
 
-    return True
+@receiver(post_delete, sender=Membership)
+def _membership_deleted(sender, instance, **kwargs):
+    invalidate_membership_permissions(instance.pk)
@@ -1,4 +1,7 @@
 # python
+from unittest.mock import patch
+
+from django.contrib.auth.backends import ModelBackend
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -53,6 +56,26 @@ class AuthAPITests(APITestCase):
         response = self.client.post(url, {"username": "admin", "password": "wrongpassword"})
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_login_wrong_password_does_not_fall_through_to_model_backend(self):
+        url = reverse("login", args=[self.org.slug])
+        with patch.object(ModelBackend, "authenticate") as fallback:
+            response = self.client.post(url, {"username": "admin", "password": "wrongpassword"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        fallback.assert_not_called()
+
+    def test_login_non_member_returns_403(self):
+        User.objects.create_user(username="outsider", password="password123", identifier="outsider_TestOrg")
+        url = reverse("login", args=[self.org.slug])
+        response = self.client.post(url, {"username": "outsider", "password": "password123"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_login_after_slug_change(self):
+        # Zapamiętany slug nie może blokować logowania po zmianie slugu
+        self._login()
+        self.org.slug = "renamed-organization"
+        self.org.save()
+        self._login(org_slug="renamed-organization")
+
     def test_logout_and_check_auth(self):
         # Najpierw zaloguj
         self._login()
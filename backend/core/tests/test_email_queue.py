@@ -0,0 +1,89 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import email_queue
+from core.email_utils import send_new_user_credentials_email
+from core.models import OutboundEmail
+
+
+class FailingTransport:
+    def send_batch(self, emails):
+        return {email.pk: "Serwer SMTP niedostępny" for email in emails}
+
+
+class EmailQueueTests(TestCase):
+    def test_credentials_email_is_queued_not_sent(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            queued = send_new_user_credentials_email("nowy@example.com", "nowy", "sekret", "Org")
+        self.assertTrue(queued)
+        self.assertEqual(len(callbacks), 1)  # workery budzone dopiero po commicie
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+        self.assertIn("sekret", email.plain_text)
+        self.assertEqual(mail.outbox, [])
+
+    def test_batch_is_delivered_and_bodies_cleared(self):
+        for i in range(3):
+            email_queue.enqueue(f"user{i}@example.com", "Temat", "Treść", "<p>Treść</p>")
+
+        attempted = email_queue.drain(email_queue.DjangoMailTransport())
+
+        self.assertEqual(attempted, 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        for email in OutboundEmail.objects.all():
+            self.assertEqual(email.status, OutboundEmail.Status.SENT)
+            self.assertEqual(email.plain_text, "")
+            self.assertIsNotNone(email.sent_at)
+
+    def test_failures_back_off_then_give_up(self):
+        email = email_queue.enqueue("user@example.com", "Temat", "Treść")
+
+        email_queue.process_batch(FailingTransport())
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=20))
+        # Jeszcze nie czas na kolejną próbę
+        self.assertEqual(email_queue.process_batch(FailingTransport()), 0)
+
+        with patch.object(email_queue, "MAX_ATTEMPTS", 2):
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            email_queue.process_batch(FailingTransport())
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.FAILED)
+        self.assertEqual(email.last_error, "Serwer SMTP niedostępny")
+        # Treść z hasłem nie zostaje w bazie po porzuceniu wysyłki
+        self.assertEqual(email.plain_text, "")
+
+    def test_abandoned_claims_are_retried(self):
+        email = email_queue.enqueue("user@example.com", "Temat", "Treść")
+        email_queue.claim_batch()  # worker "umiera" po przejęciu
+        self.assertEqual(email_queue.claim_batch(), [])
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual([e.pk for e in email_queue.claim_batch()], [email.pk])
+
+    def test_plain_text_backends_require_explicit_opt_in(self):
+        console = "django.core.mail.backends.console.EmailBackend"
+        with patch.object(email_queue, "TRANSPORT", "core.email_queue.DjangoMailTransport"):
+            # DEBUG nie wystarcza, by hasła trafiały na konsolę
+            for debug in (False, True):
+                with override_settings(DEBUG=debug, EMAIL_BACKEND=console, EMAIL_ALLOW_PLAIN_TEXT=False):
+                    self.assertEqual(len(email_queue.check_email_transport(None)), 1)
+                    with patch.object(email_queue, "_transport", None):
+                        with self.assertRaises(ImproperlyConfigured):
+                            email_queue.process_batch()
+            with override_settings(EMAIL_BACKEND=console, EMAIL_ALLOW_PLAIN_TEXT=True):
+                self.assertEqual(email_queue.check_email_transport(None), [])
+
+    def test_unconfigured_acs_fails_the_check(self):
+        with patch.object(email_queue, "TRANSPORT", "core.email_queue.AcsTransport"), override_settings(
+            DEBUG=True, AZURE_COMMUNICATION_CONNECTION_STRING=""
+        ):
+            self.assertEqual(len(email_queue.check_email_transport(None)), 1)
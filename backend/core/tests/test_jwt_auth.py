@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from core import jwt_auth
+from organizations.context import OrganizationContext
+from organizations.models import Membership, Organization
+
+User = get_user_model()
+
+STATELESS_MIDDLEWARE = [
+    {
+        "django.contrib.sessions.middleware.SessionMiddleware": "core.jwt_auth.AdminSessionMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware": "core.jwt_auth.TokenAuthenticationMiddleware",
+    }.get(middleware, middleware)
+    for middleware in settings.MIDDLEWARE
+]
+
+
+@override_settings(
+    MIDDLEWARE=STATELESS_MIDDLEWARE,
+    MESSAGE_STORAGE="django.contrib.messages.storage.cookie.CookieStorage",
+)
+class StatelessAuthTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="admin", password="password123", identifier="admin_TestOrg"
+        )
+        self.org = Organization.objects.create(
+            name="TestOrg", created_by=self.user, slug="test-organization"
+        )
+        Membership.objects.create(organization=self.org, user=self.user, role="admin")
+        patcher = patch.object(jwt_auth, "STATELESS", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _login(self):
+        url = reverse("login", args=[self.org.slug])
+        response = self.client.post(url, {"username": "admin", "password": "password123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_login_issues_tokens_without_session(self):
+        data = self._login()
+        self.assertIsNone(data["sessionKey"])
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        # Token niesie członkostwa użytkownika
+        token = jwt_auth._authentication.get_validated_token(data["access"])
+        self.assertEqual(token["memberships"], {str(self.org.id): "admin"})
+
+    def test_api_authenticates_from_bearer_token(self):
+        data = self._login()
+        check_url = reverse("check-auth")
+        self.assertEqual(self.client.get(check_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['access']}")
+        response = self.client.get(check_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["username"], "admin")
+        self.assertFalse(Session.objects.exists())
+
+    def test_invalid_token_is_anonymous(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer nie-token")
+        response = self.client.get(reverse("check-auth"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_blacklists_refresh_token(self):
+        data = self._login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['access']}")
+        response = self.client.post(
+            reverse("logout", args=[self.org.slug]), {"refresh": data["refresh"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+    def test_membership_changes_apply_without_new_token(self):
+        data = self._login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['access']}")
+        other = Organization.objects.create(name="Other", created_by=self.user, slug="other")
+        url = reverse("get_organization_membership", args=[other.id])
+
+        # Organizacji nie ma w tokenie, ale członkostwo z bazy wystarcza
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        Membership.objects.create(organization=other, user=self.user, role="member")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        # Usunięcie działa od razu, mimo że token wciąż wymienia organizację
+        url = reverse("get_organization_membership", args=[self.org.id])
+        Membership.objects.filter(organization=self.org, user=self.user).delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unlisted_organizations_are_refused_from_the_cached_ids(self):
+        context = OrganizationContext(self.user, self.org.id + 1, memberships={self.org.id: "admin"})
+        with self.assertRaises(Membership.DoesNotExist):
+            context.membership
+        # Kolejna odmowa korzysta z zapamiętanej listy organizacji
+        context = OrganizationContext(self.user, self.org.id + 1, memberships={self.org.id: "admin"})
+        with self.assertNumQueries(0):
+            with self.assertRaises(Membership.DoesNotExist):
+                context.membership
@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.test import SimpleTestCase, TestCase
+
+from core import passwords
+
+User = get_user_model()
+
+
+class HashPasswordsTests(SimpleTestCase):
+    def test_pool_hashes_in_order(self):
+        secrets = [f"haslo-{i}" for i in range(12)]
+        with patch.object(passwords, "WORKERS", 2), patch.object(passwords, "PARALLEL_THRESHOLD", 4):
+            hashes = passwords.hash_passwords(secrets)
+        self.assertEqual(len(hashes), len(secrets))
+        for secret, encoded in zip(secrets, hashes):
+            self.assertTrue(check_password(secret, encoded))
+
+
+class BulkCreateUsersTests(TestCase):
+    def test_bulk_create_users_hashes_and_sets_identifier(self):
+        users = User.objects.bulk_create_users(
+            [
+                {"username": "ala", "identifier": "ala_org", "password": "tajne-1"},
+                {"username": "ola", "email": "ola@EXAMPLE.com"},
+            ]
+        )
+        self.assertEqual(User.objects.count(), 2)
+        ala = User.objects.get(identifier="ala_org")
+        self.assertTrue(ala.check_password("tajne-1"))
+        # Bez hasła konto dostaje hasło nieużywalne i losowy identyfikator
+        ola = User.objects.get(username="ola")
+        self.assertFalse(ola.has_usable_password())
+        self.assertEqual(ola.email, "ola@example.com")
+        self.assertTrue(ola.identifier)
+        self.assertEqual(len(users), 2)
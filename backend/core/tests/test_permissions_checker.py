@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.models import User
+from chatsAndMessaging.models import Chat
+from core.permissions_checker import filter_by_tag, get_membership_permissions, get_tag_index
+from organizations.models import CombinedTag, Membership, Organization, Tag
+
+
+class TagPermissionIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="member", password="password123", identifier="member_PermOrg"
+        )
+        self.org = Organization.objects.create(
+            name="PermOrg", created_by=self.user, slug="perm-org"
+        )
+        self.membership = Membership.objects.create(
+            organization=self.org, user=self.user, role="member"
+        )
+
+        self.dev = Tag.objects.create(name="Dev", organization=self.org)
+        self.qa = Tag.objects.create(name="QA", organization=self.org)
+        self.dev_qa = Tag.objects.create(name="Dev+QA", organization=self.org, combined=True)
+        CombinedTag.objects.create(combined_tag_id=self.dev_qa, basic_tag_id=self.dev)
+        CombinedTag.objects.create(combined_tag_id=self.dev_qa, basic_tag_id=self.qa)
+
+    def test_combined_tag_requires_all_basic_tags(self):
+        self.membership.permissions.add(self.dev)
+        permissions = get_membership_permissions(self.membership)
+
+        self.assertTrue(permissions.can_access([self.dev.id]))
+        self.assertFalse(permissions.can_access([self.qa.id]))
+        self.assertFalse(permissions.can_access([self.dev_qa.id]))
+        self.assertTrue(permissions.can_access([self.qa.id, self.dev.id]))
+        self.assertFalse(permissions.can_add([self.qa.id, self.dev.id]))
+
+        self.membership.permissions.add(self.qa)
+        permissions = get_membership_permissions(self.membership)
+        self.assertTrue(permissions.can_access([self.dev_qa.id]))
+        self.assertTrue(permissions.can_add([self.dev.id, self.dev_qa.id]))
+
+    def test_checks_run_without_queries_once_cached(self):
+        self.membership.permissions.add(self.dev, self.qa)
+        get_membership_permissions(self.membership)
+
+        with self.assertNumQueries(0):
+            permissions = get_membership_permissions(self.membership)
+            self.assertTrue(permissions.can_access([self.dev_qa.id]))
+
+    def test_index_is_invalidated_when_tags_change(self):
+        generation = get_tag_index(self.org.id).generation
+
+        ops = Tag.objects.create(name="Ops", organization=self.org)
+        index = get_tag_index(self.org.id)
+        self.assertNotEqual(index.generation, generation)
+        self.assertIn(ops.id, index.masks)
+
+        CombinedTag.objects.create(combined_tag_id=self.dev_qa, basic_tag_id=ops)
+        self.membership.permissions.add(self.dev, self.qa)
+        self.assertFalse(get_membership_permissions(self.membership).can_access([self.dev_qa.id]))
+
+        self.membership.permissions.add(ops)
+        self.assertTrue(get_membership_permissions(self.membership).can_access([self.dev_qa.id]))
+
+        self.membership.permissions.remove(self.dev)
+        self.assertFalse(get_membership_permissions(self.membership).can_access([self.dev_qa.id]))
+
+    def test_filter_by_tag_expands_combined_tags(self):
+        direct = Chat.objects.create(name="Dev", organization=self.org)
+        direct.permissions.set([self.dev])
+        combined = Chat.objects.create(name="Dev+QA", organization=self.org)
+        combined.permissions.set([self.dev_qa])
+        other = Chat.objects.create(name="QA", organization=self.org)
+        other.permissions.set([self.qa])
+        self.assertEqual(get_tag_index(self.org.id).containing[self.dev.id], {self.dev_qa.id})
+
+        chats = Chat.objects.filter(organization=self.org)
+        self.membership.permissions.add(self.dev)
+        self.assertEqual(filter_by_tag(chats, self.membership, self.dev.id), [direct])
+
+        self.membership.permissions.add(self.qa)
+        self.assertEqual(
+            {chat.name for chat in filter_by_tag(chats, self.membership, self.dev.id)},
+            {"Dev", "Dev+QA"},
+        )
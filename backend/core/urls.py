@@ -7,7 +7,7 @@ from organizations.views import (
     remove_organization_member, change_member_role, update_member_profile, edit_permissions, get_all_tags, get_tags,
     create_tag, delete_tag,
     create_project, update_project, delete_project, get_projects, get_user_projects, get_user_membership,
-    get_project_members, add_tag_to_user, remove_tag_from_user,
+    get_project_members, add_tag_to_user, remove_tag_from_user, import_members,
 )
 
 from .views import login_view, logout_view, change_password_view, login_status_view, get_csrf_token
@@ -31,6 +31,7 @@ urlpatterns += [
     path('membership/<int:organization_id>/',  get_user_membership, name='get_organization_membership'),
     path('organization/update/<int:organization_id>/', edit_organization, name='edit_organization'),
     path('invite-member/<int:organization_id>/', invite_member, name='invite_member'),
+    path('members/import/<int:organization_id>/', import_members, name='import_members'),
     path('members/<int:organization_id>/', get_organization_users, name='get_organization_users'),
     path('project-members/<int:organization_id>/<int:project_id>/', get_project_members, name='get_project_members'),
     path('members/delete/<int:organization_id>/<str:username>/', remove_organization_member, name='remove_organization_member'),
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model, authenticate, login, logout
+from django.contrib.auth.signals import user_logged_in
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
@@ -7,9 +8,12 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from organizations.models import Organization, Membership
+from core import jwt_auth
+from organizations.context import organization_id_for_slug
+from organizations.models import Membership
 
 User = get_user_model()
 
@@ -18,19 +22,30 @@ def get_csrf_token(request):
     token = get_token(request)
     return JsonResponse({"csrfToken": token})
 
+
+def _login_membership(organization_slug, username):
+    """The membership of ``username``, with its user and organization, in one query."""
+    for refresh in (False, True):
+        organization_id = organization_id_for_slug(organization_slug, refresh=refresh)
+        try:
+            return Membership.objects.select_related("user", "organization").get(
+                organization_id=organization_id,
+                organization__slug=organization_slug,
+                user__username=username,
+            )
+        except Membership.DoesNotExist:
+            if refresh:
+                return None
+
+
 @require_http_methods(["POST"])
 @csrf_exempt
 def login_view(request, organization_name):
     try:
         username = request.POST.get("username")
         password = request.POST.get("password")
-        organization = Organization.objects.get(slug=organization_name)
-        membership = Membership.objects.get(
-            user__username=username, organization=organization
-        )
-        user = authenticate(
-            request, identifier=username + "_" + organization.name, password=password
-        )
+        # organization_name in the URL is the organization slug
+        membership = _login_membership(organization_name, username)
 
         if membership is None:
             return JsonResponse(
@@ -41,10 +56,23 @@ def login_view(request, organization_name):
                 status=403,
             )
 
+        organization = membership.organization
+        user = authenticate(
+            request,
+            identifier=username + "_" + organization.name,
+            password=password,
+            candidate=membership.user,
+        )
+
         if user is not None:
-            login(request, user)
-            session_key = request.session.session_key
-            refresh = RefreshToken.for_user(user)
+            if jwt_auth.STATELESS:
+                # No session: only record the login (last_login).
+                user_logged_in.send(sender=user.__class__, request=request, user=user)
+                session_key = None
+            else:
+                login(request, user)
+                session_key = request.session.session_key
+            refresh = jwt_auth.token_for(user)
             return JsonResponse(
                 {
                     "status": "success",
@@ -79,11 +107,20 @@ def login_view(request, organization_name):
 def logout_view(request, organization_name):
     try:
         if request.user.is_authenticated:
-            logout(request)
+            username = request.user.username
+            if jwt_auth.STATELESS:
+                # The access token expires by itself; the refresh token is revoked.
+                try:
+                    if request.POST.get("refresh"):
+                        RefreshToken(request.POST["refresh"]).blacklist()
+                except TokenError:
+                    pass  # expired or already revoked
+            else:
+                logout(request)
             return JsonResponse(
                 {
                     "status": "success",
-                    "message": f"User {request.user.username} logged out",
+                    "message": f"User {username} logged out",
                 },
                 status=200,
             )
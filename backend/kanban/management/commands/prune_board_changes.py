@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from kanban.models import BoardChange, KanbanBoard
+
+
+class Command(BaseCommand):
+    help = "Drop Kanban change log entries older than the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "KANBAN_CHANGE_RETENTION_DAYS", 7),
+            help="Retention window in days.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        stale = BoardChange.objects.filter(changed_at__lt=cutoff)
+
+        with transaction.atomic():
+            floors = stale.values("board").annotate(floor=Max("version"))
+            for row in floors:
+                # Clients older than the pruned versions have to resync fully.
+                KanbanBoard.objects.filter(
+                    pk=row["board"], changes_floor__lt=row["floor"]
+                ).update(changes_floor=row["floor"])
+            deleted, _ = stale.delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} board change(s)."))
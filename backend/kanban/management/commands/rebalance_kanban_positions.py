@@ -0,0 +1,37 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+
+from kanban.models import KanbanBoard, KanbanColumn, Task
+from kanban.ordering import needs_rebalance, rebalance_board_columns, rebalance_column_tasks
+
+
+class Command(BaseCommand):
+    help = "Respace Kanban columns and tasks whose ordering keys are running out of room."
+
+    def handle(self, *args, **options):
+        boards = 0
+        columns = 0
+
+        column_rows = KanbanColumn.objects.order_by("board_id", "position").values_list(
+            "board_id", "position"
+        ).iterator()
+        for board_id, rows in groupby(column_rows, key=lambda row: row[0]):
+            if needs_rebalance([position for _, position in rows]):
+                rebalance_board_columns(KanbanBoard.objects.get(pk=board_id))
+                boards += 1
+
+        task_rows = Task.objects.order_by("column_id", "position").values_list(
+            "column_id", "position"
+        ).iterator()
+        for column_id, rows in groupby(task_rows, key=lambda row: row[0]):
+            if needs_rebalance([position for _, position in rows]):
+                column = KanbanColumn.objects.select_related("board").get(pk=column_id)
+                rebalance_column_tasks(column)
+                columns += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebalanced columns on {boards} board(s) and tasks in {columns} column(s)."
+            )
+        )
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 
 # Create your models here.
 class KanbanBoard(models.Model):
@@ -14,10 +15,47 @@ class KanbanBoard(models.Model):
         related_name="kanban_boards",
         on_delete=models.CASCADE,
     )
+    # Bumped on every column/task change; used as the board's ETag.
+    version = models.PositiveIntegerField(default=0)
+    # Highest version whose changes were pruned from the change log.
+    changes_floor = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.title
 
+    def record_changes(self, changes):
+        """Bump the version and log the columns/tasks touched by one mutation.
+
+        ``changes`` is an iterable of ``(kind, object_id, action)`` tuples. The
+        log keeps a single row per object, so it only grows with board size.
+        Call it in the same transaction as the mutation, so that the change
+        and its version become visible together.
+        """
+        # Postgres rejects an upsert that touches the same row twice.
+        latest = {(kind, object_id): action for kind, object_id, action in changes}
+
+        with transaction.atomic():
+            KanbanBoard.objects.filter(pk=self.pk).update(version=F("version") + 1)
+            self.version = KanbanBoard.objects.values_list("version", flat=True).get(
+                pk=self.pk
+            )
+            BoardChange.objects.bulk_create(
+                [
+                    BoardChange(
+                        board=self,
+                        kind=kind,
+                        object_id=object_id,
+                        action=action,
+                        version=self.version,
+                    )
+                    for (kind, object_id), action in latest.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["board", "kind", "object_id"],
+                update_fields=["action", "version", "changed_at"],
+            )
+        return self.version
+
 
 class KanbanColumn(models.Model):
     column_id = models.AutoField(primary_key=True)
@@ -59,4 +97,39 @@ class Task(models.Model):
     status = models.IntegerField(choices=Status.choices, default=Status.TODO)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+
+class BoardChange(models.Model):
+    class Kind(models.TextChoices):
+        COLUMN = "column", "Column"
+        TASK = "task", "Task"
+
+    class Action(models.TextChoices):
+        UPSERT = "upsert", "Upsert"
+        DELETE = "delete", "Delete"
+
+    change_id = models.AutoField(primary_key=True)
+    board = models.ForeignKey(
+        KanbanBoard,
+        related_name="changes",
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=16, choices=Action.choices)
+    version = models.PositiveIntegerField()
+    changed_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["board", "kind", "object_id"], name="unique_board_change"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["board", "version"]),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.kind} {self.object_id} (v{self.version})"
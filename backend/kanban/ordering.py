@@ -0,0 +1,124 @@
+"""Sparse ordering keys for Kanban columns and tasks.
+
+Positions are spaced ``POSITION_GAP`` apart, so moving an item between two
+neighbours only rewrites the moved row. When two neighbours end up adjacent
+the container is respaced: inline if a move needs the room right away, or
+ahead of time by the ``rebalance_kanban_positions`` command.
+"""
+
+from django.db import transaction
+from django.db.models import Max
+
+from .models import BoardChange, KanbanColumn, Task
+
+POSITION_GAP = 1024
+# Containers whose tightest gap falls below this get respaced in the background.
+MIN_GAP = 16
+
+
+def position_between(before, after):
+    """Return a position strictly between two neighbours, or None if there is no room.
+
+    Either neighbour may be None at the start or end of the container.
+    """
+    if before is None and after is None:
+        return 0
+    if before is None:
+        return after - POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+
+def next_position(queryset):
+    """Position that appends after every item in ``queryset``."""
+    last = queryset.aggregate(last=Max("position"))["last"]
+    return 0 if last is None else last + POSITION_GAP
+
+
+def position_after(queryset, anchor_position):
+    """Position right after ``anchor_position`` (None = first) in ``queryset``."""
+    positions = queryset.order_by("position").values_list("position", flat=True)
+    if anchor_position is None:
+        return position_between(None, positions.first())
+    return position_between(
+        anchor_position, positions.filter(position__gt=anchor_position).first()
+    )
+
+
+def needs_rebalance(positions):
+    """True if sorted ``positions`` have duplicates or gaps tighter than MIN_GAP."""
+    return any(b - a < MIN_GAP for a, b in zip(positions, positions[1:]))
+
+
+def _respace(items, model, kind, id_attr, board):
+    changed = []
+    for index, item in enumerate(items):
+        position = index * POSITION_GAP
+        if item.position != position:
+            item.position = position
+            changed.append(item)
+    if changed:
+        model.objects.bulk_update(changed, ["position"])
+        board.record_changes(
+            [(kind, getattr(item, id_attr), BoardChange.Action.UPSERT) for item in changed]
+        )
+    return len(changed)
+
+
+def rebalance_column_tasks(column):
+    """Respace the tasks of one column, keeping their current order."""
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update()
+            .filter(column=column)
+            .order_by("position", "task_id")
+        )
+        return _respace(tasks, Task, BoardChange.Kind.TASK, "task_id", column.board)
+
+
+def rebalance_board_columns(board):
+    """Respace the columns of one board, keeping their current order."""
+    with transaction.atomic():
+        columns = list(
+            KanbanColumn.objects.select_for_update()
+            .filter(board=board)
+            .order_by("position", "column_id")
+        )
+        return _respace(columns, KanbanColumn, BoardChange.Kind.COLUMN, "column_id", board)
+
+
+def task_position_after(column, after_task_id, moving_task_id):
+    """Position that places a task right after ``after_task_id`` in ``column``.
+
+    ``after_task_id`` of None puts the task first. Respaces the column inline
+    when the neighbours have run out of room.
+    """
+    siblings = Task.objects.filter(column=column).exclude(task_id=moving_task_id)
+    for _ in range(2):
+        anchor = None
+        if after_task_id is not None:
+            anchor = siblings.values_list("position", flat=True).get(task_id=after_task_id)
+        position = position_after(siblings, anchor)
+        if position is not None:
+            return position
+        rebalance_column_tasks(column)
+    raise ValueError("Nie można wyznaczyć pozycji zadania")
+
+
+def column_position_after(board, after_column_id, moving_column_id):
+    """Position that places a column right after ``after_column_id`` on ``board``."""
+    siblings = KanbanColumn.objects.filter(board=board).exclude(column_id=moving_column_id)
+    for _ in range(2):
+        anchor = None
+        if after_column_id is not None:
+            anchor = siblings.values_list("position", flat=True).get(
+                column_id=after_column_id
+            )
+        position = position_after(siblings, anchor)
+        if position is not None:
+            return position
+        rebalance_board_columns(board)
+    raise ValueError("Nie można wyznaczyć pozycji kolumny")
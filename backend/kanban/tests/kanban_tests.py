@@ -1,4 +1,8 @@
 # python
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -6,6 +10,7 @@ from rest_framework.test import APITestCase
 from core.models import User
 from organizations.models import Membership, Organization, Project, Tag
 from kanban.models import KanbanBoard, KanbanColumn, Task
+from kanban.ordering import POSITION_GAP
 
 
 class ComprehensiveKanbanAPITests(APITestCase):
@@ -91,6 +96,147 @@ class ComprehensiveKanbanAPITests(APITestCase):
                     found = True
         self.assertTrue(found)
 
+    def test_get_board_with_content_query_count_is_constant(self):
+        url = reverse("get_kanban_boards_with_content", args=[self.org.pk, self.project.pk])
+        self.client.get(url)  # rozgrzanie pamięci podręcznej członkostwa
+
+        with CaptureQueriesContext(connection) as small_board:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        # Rozbudowana tablica: więcej kolumn i zadań z przypisanymi użytkownikami
+        for col_index in range(5):
+            column = KanbanColumn.objects.create(
+                title=f"Col {col_index}", board=self.board, position=col_index + 2
+            )
+            Task.objects.bulk_create(
+                Task(
+                    title=f"Task {col_index}-{task_index}",
+                    column=column,
+                    position=task_index,
+                    assigned_to=self.member_user if task_index % 2 else self.other_user,
+                )
+                for task_index in range(20)
+            )
+
+        with CaptureQueriesContext(connection) as large_board:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        data = resp.json()
+        self.assertEqual(len(data["columns"]), 7)
+        self.assertEqual(sum(len(col["tasks"]) for col in data["columns"]), 101)
+        assigned = [t for col in data["columns"] for t in col["tasks"] if t["assigned_to"]]
+        self.assertEqual(assigned[0]["assigned_to"]["id"], assigned[0]["assigned_to_id"])
+        self.assertEqual(len(large_board), len(small_board))
+
+    def test_get_board_with_content_honours_if_none_match(self):
+        url = reverse("get_kanban_boards_with_content", args=[self.org.pk, self.project.pk])
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp["ETag"], etag)
+        self.assertFalse(any("kanban_task" in q["sql"] for q in queries.captured_queries))
+
+        # Każda zmiana zadania unieważnia ETag
+        update_url = reverse("update_task", args=[self.org.pk, self.board.board_id, self.column.column_id, self.task.task_id])
+        self.client.put(update_url, {"title": "Renamed"}, format="json")
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_board_changes_returns_only_delta_since_version(self):
+        full_url = reverse("get_kanban_boards_with_content", args=[self.org.pk, self.project.pk])
+        version = self.client.get(full_url).json()["version"]
+
+        create_url = reverse("create_task", args=[self.org.pk, self.board.board_id, self.other_column.column_id])
+        resp = self.client.post(create_url, {"title": "New Task"})
+        new_task_id = resp.json()["task_id"]
+        delete_url = reverse("delete_task", args=[self.org.pk, self.board.board_id, self.column.column_id, self.task.task_id])
+        self.client.delete(delete_url)
+
+        changes_url = reverse("get_kanban_board_changes", args=[self.org.pk, self.project.pk])
+        data = self.client.get(changes_url, {"since": version}).json()
+        self.assertFalse(data["full_sync"])
+        self.assertEqual(data["version"], version + 2)
+        self.assertEqual([t["task_id"] for t in data["tasks"]], [new_task_id])
+        self.assertEqual(data["tasks"][0]["column_id"], self.other_column.column_id)
+        self.assertEqual(data["deleted_tasks"], [self.task.task_id])
+        self.assertEqual(data["columns"], [])
+
+        data = self.client.get(changes_url, {"since": data["version"]}).json()
+        self.assertEqual(data["tasks"], [])
+        self.assertEqual(data["deleted_tasks"], [])
+
+        # Wersje sprzed przyciętego logu wymagają pełnej synchronizacji
+        KanbanBoard.objects.filter(pk=self.board.pk).update(changes_floor=version + 1)
+        data = self.client.get(changes_url, {"since": version}).json()
+        self.assertTrue(data["full_sync"])
+        self.assertIn("columns", data["board"])
+
+    def test_reorder_tasks_moves_many_tasks_in_one_request(self):
+        tasks = [self.task] + [
+            Task.objects.create(title=f"Task {i}", column=self.column, position=i)
+            for i in range(1, 30)
+        ]
+        url = reverse("reorder_tasks", args=[self.org.pk, self.board.board_id])
+        payload = {
+            "tasks": [
+                {
+                    "task_id": task.task_id,
+                    "column_id": self.other_column.column_id if i % 2 else self.column.column_id,
+                    "position": len(tasks) - i,
+                }
+                for i, task in enumerate(tasks)
+            ]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.put(url, payload, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertLess(len(queries), 20)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.position, len(tasks))
+        moved = Task.objects.get(pk=tasks[1].pk)
+        self.assertEqual(moved.column_id, self.other_column.column_id)
+        self.assertEqual(moved.position, len(tasks) - 1)
+
+        # Kolumna spoza tablicy jest odrzucana, a nic nie zostaje zmienione
+        payload = {"tasks": [{"task_id": self.task.task_id, "column_id": 999999, "position": 0}]}
+        resp = self.client.put(url, payload, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.position, len(tasks))
+
+    def test_move_task_after_neighbour_writes_only_moved_task(self):
+        first = Task.objects.create(title="First", column=self.other_column, position=0)
+        second = Task.objects.create(title="Second", column=self.other_column, position=POSITION_GAP)
+        url = reverse("update_task", args=[self.org.pk, self.board.board_id, self.column.column_id, self.task.task_id])
+
+        resp = self.client.put(
+            url, {"new_column_id": self.other_column.column_id, "after_task_id": first.task_id}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.column_id, self.other_column.column_id)
+        self.assertTrue(0 < self.task.position < POSITION_GAP)
+        self.assertEqual(Task.objects.get(pk=second.pk).position, POSITION_GAP)
+
+        # Brak miejsca między sąsiadami wymusza przenumerowanie kolumny
+        Task.objects.filter(pk=second.pk).update(position=1)
+        url = reverse("update_task", args=[self.org.pk, self.board.board_id, self.other_column.column_id, self.task.task_id])
+        resp = self.client.put(url, {"after_task_id": first.task_id}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        ordered = list(
+            Task.objects.filter(column=self.other_column).order_by("position").values_list("task_id", flat=True)
+        )
+        self.assertEqual(ordered, [first.task_id, self.task.task_id, second.task_id])
+
     def test_create_column_by_admin(self):
         url = reverse("create_column", args=[self.org.pk, self.board.board_id])
         payload = {"title": "New Column", "position": 2}
@@ -98,6 +244,14 @@ class ComprehensiveKanbanAPITests(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
         self.assertTrue(KanbanColumn.objects.filter(title="New Column", board=self.board).exists())
 
+    def test_failed_version_bump_rolls_back_the_mutation(self):
+        # Zmiana i podbicie wersji zapisują się razem albo wcale
+        url = reverse("create_column", args=[self.org.pk, self.board.board_id])
+        with patch.object(KanbanBoard, "record_changes", side_effect=RuntimeError("awaria")):
+            resp = self.client.post(url, {"title": "Lost Column", "position": 2})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(KanbanColumn.objects.filter(title="Lost Column").exists())
+
     def test_member_without_coordination_cannot_create_column(self):
         # login as plain member (not coordinator)
         self._login("member", "password123", self.org.slug)
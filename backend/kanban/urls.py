@@ -1,18 +1,20 @@
 from django.urls import path
 from .views import (
-    get_board, get_board_with_content, add_column, update_column_position, delete_column, get_column,
-    add_task, update_task, delete_task, get_task,
+    get_board, get_board_with_content, get_board_changes, add_column, update_column_position, delete_column, get_column,
+    add_task, update_task, reorder_tasks, delete_task, get_task,
 )
 
 urlpatterns = [
     path('kanban/board/basic/<int:organization_id>/<int:project_id>/', get_board, name='get_kanban_board'),
     path('kanban/board/full/<int:organization_id>/<int:project_id>/', get_board_with_content, name='get_kanban_boards_with_content'),
+    path('kanban/board/changes/<int:organization_id>/<int:project_id>/', get_board_changes, name='get_kanban_board_changes'),
     path('kanban/column/create/<int:organization_id>/<int:board_id>/', add_column, name='create_column'),
     path('kanban/column/move/<int:organization_id>/<int:board_id>/<int:column_id>/', update_column_position, name='update_column'),
     path('kanban/column/delete/<int:organization_id>/<int:board_id>/<int:column_id>/', delete_column, name='delete_column'),
     path('kanban/column/<int:organization_id>/<int:board_id>/<int:column_id>/', get_column, name='get_column'),
     path('kanban/task/create/<int:organization_id>/<int:board_id>/<int:column_id>/', add_task, name='create_task'),
     path('kanban/task/update/<int:organization_id>/<int:board_id>/<int:column_id>/<int:task_id>/', update_task, name='update_task'),
+    path('kanban/task/reorder/<int:organization_id>/<int:board_id>/', reorder_tasks, name='reorder_tasks'),
     path('kanban/task/delete/<int:organization_id>/<int:board_id>/<int:column_id>/<int:task_id>/', delete_task, name='delete_task'),
     path('kanban/task/<int:organization_id>/<int:board_id>/<int:column_id>/<int:task_id>/', get_task, name='get_task'),
 ]
@@ -1,11 +1,80 @@
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from .models import KanbanBoard, KanbanColumn, Task
-from organizations.models import Organization, Membership, Project
+from .models import BoardChange, KanbanBoard, KanbanColumn, Task
+from .ordering import column_position_after, next_position, task_position_after
+from organizations.models import Organization, Project
 import json
 
 
+def _assignee_to_dict(user):
+    if user is None:
+        return None
+    return {
+        "id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+    }
+
+
+def _board_etag(kanban_board):
+    return quote_etag(f"{kanban_board.board_id}-{kanban_board.version}")
+
+
+def _column_to_dict(column):
+    return {
+        "column_id": column.column_id,
+        "title": column.title,
+        "position": column.position,
+    }
+
+
+def _task_to_dict(task):
+    return {
+        "task_id": task.task_id,
+        "title": task.title,
+        "description": task.description,
+        "column_id": task.column_id,
+        "position": task.position,
+        "due_date": task.due_date,
+        "assigned_to_id": task.assigned_to_id,
+        "assigned_to": _assignee_to_dict(task.assigned_to),
+        "status": task.status,
+    }
+
+
+def _board_snapshot(kanban_board):
+    """Serialize a board with all its columns and tasks in two queries."""
+    tasks = Task.objects.select_related("assigned_to").order_by("position", "task_id")
+    columns = (
+        KanbanColumn.objects.filter(board=kanban_board)
+        .order_by("position", "column_id")
+        .prefetch_related(Prefetch("tasks", queryset=tasks))
+    )
+
+    columns_data = [
+        {
+            **_column_to_dict(column),
+            "tasks": [_task_to_dict(task) for task in column.tasks.all()],
+        }
+        for column in columns
+    ]
+
+    return {
+        "board_id": kanban_board.board_id,
+        "title": kanban_board.title,
+        "organization_id": kanban_board.organization_id,
+        "project_id": kanban_board.project_id,
+        "version": kanban_board.version,
+        "columns": columns_data,
+    }
+
+
 @require_http_methods(["GET"])
 @csrf_exempt
 def get_board(request, organization_id, project_id):
@@ -15,10 +84,7 @@ def get_board(request, organization_id, project_id):
                 {"error": "Użytkownik nie jest uwierzytelniony"}, status=401
             )
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         project = Project.objects.get(id=project_id)
 
@@ -28,7 +94,7 @@ def get_board(request, organization_id, project_id):
         ):
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
 
-        organization = Organization.objects.get(id=organization_id)
+        organization = request.org_context.organization
         kanban_board = KanbanBoard.objects.get(
             organization=organization, project=project
         )
@@ -59,71 +125,32 @@ def get_board_with_content(request, organization_id, project_id):
                 {"error": "Użytkownik nie jest uwierzytelniony"}, status=401
             )
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         project = Project.objects.get(id=project_id)
 
         if (
             membership.role != "admin"
-            and project.tag not in membership.permissions.all()
+            and not membership.permissions.filter(id=project.tag_id).exists()
         ):
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
 
-        organization = Organization.objects.get(id=organization_id)
+        organization = request.org_context.organization
         kanban_board = KanbanBoard.objects.get(
             organization=organization, project=project
         )
 
-        columns = KanbanColumn.objects.filter(board=kanban_board)
-        columns_data = []
-        for column in columns:
-            tasks = Task.objects.filter(column=column)
-            tasks_data = []
-            for task in tasks:
-                assigned_payload = None
-                if task.assigned_to:
-                    assigned_payload = {
-                        "id": task.assigned_to.id,
-                        "username": task.assigned_to.username,
-                        "first_name": task.assigned_to.first_name,
-                        "last_name": task.assigned_to.last_name,
-                        "email": task.assigned_to.email,
-                    }
-                tasks_data.append(
-                    {
-                        "task_id": task.task_id,
-                        "title": task.title,
-                        "description": task.description,
-                        "position": task.position,
-                        "due_date": task.due_date,
-                        "assigned_to_id": task.assigned_to.id
-                        if task.assigned_to
-                        else None,
-                        "assigned_to": assigned_payload,
-                        "status": task.status,
-                    }
-                )
-            columns_data.append(
-                {
-                    "column_id": column.column_id,
-                    "title": column.title,
-                    "position": column.position,
-                    "tasks": tasks_data,
-                }
-            )
+        etag = _board_etag(kanban_board)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
 
-        board_data = {
-            "board_id": kanban_board.board_id,
-            "title": kanban_board.title,
-            "organization_id": kanban_board.organization.id,
-            "project_id": kanban_board.project.id,
-            "columns": columns_data,
-        }
+        board_data = _board_snapshot(kanban_board)
 
-        return JsonResponse(board_data, status=200)
+        response = JsonResponse(board_data, status=200)
+        response["ETag"] = etag
+        return response
     except Organization.DoesNotExist:
         return JsonResponse({"error": "Organizacja nie znaleziona"}, status=404)
     except Project.DoesNotExist:
@@ -134,6 +161,82 @@ def get_board_with_content(request, organization_id, project_id):
         return JsonResponse({"error": str(e)}, status=400)
 
 
+@require_http_methods(["GET"])
+@csrf_exempt
+def get_board_changes(request, organization_id, project_id):
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"error": "Użytkownik nie jest uwierzytelniony"}, status=401
+            )
+
+        since = int(request.GET.get("since", 0))
+
+        membership = request.org_context.membership
+
+        project = Project.objects.get(id=project_id)
+
+        if (
+            membership.role != "admin"
+            and not membership.permissions.filter(id=project.tag_id).exists()
+        ):
+            return JsonResponse({"error": "Brak uprawnień"}, status=403)
+
+        kanban_board = KanbanBoard.objects.get(
+            organization__id=organization_id, project=project
+        )
+
+        # The log no longer covers this version; the client must resync fully.
+        if since < kanban_board.changes_floor:
+            return JsonResponse(
+                {
+                    "board_id": kanban_board.board_id,
+                    "version": kanban_board.version,
+                    "full_sync": True,
+                    "board": _board_snapshot(kanban_board),
+                },
+                status=200,
+            )
+
+        changes = BoardChange.objects.filter(
+            board=kanban_board, version__gt=since
+        ).values_list("kind", "object_id", "action")
+
+        upserted = {BoardChange.Kind.COLUMN: [], BoardChange.Kind.TASK: []}
+        deleted = {BoardChange.Kind.COLUMN: [], BoardChange.Kind.TASK: []}
+        for kind, object_id, action in changes:
+            target = upserted if action == BoardChange.Action.UPSERT else deleted
+            target[kind].append(object_id)
+
+        columns = KanbanColumn.objects.filter(
+            board=kanban_board, column_id__in=upserted[BoardChange.Kind.COLUMN]
+        )
+        tasks = Task.objects.select_related("assigned_to").filter(
+            column__board=kanban_board, task_id__in=upserted[BoardChange.Kind.TASK]
+        )
+
+        return JsonResponse(
+            {
+                "board_id": kanban_board.board_id,
+                "version": kanban_board.version,
+                "full_sync": False,
+                "columns": [_column_to_dict(column) for column in columns],
+                "tasks": [_task_to_dict(task) for task in tasks],
+                "deleted_columns": deleted[BoardChange.Kind.COLUMN],
+                "deleted_tasks": deleted[BoardChange.Kind.TASK],
+            },
+            status=200,
+        )
+    except ValueError:
+        return JsonResponse({"error": "Nieprawidłowa wartość parametru since"}, status=400)
+    except Project.DoesNotExist:
+        return JsonResponse({"error": "Projekt nie znaleziony"}, status=404)
+    except KanbanBoard.DoesNotExist:
+        return JsonResponse({"error": "Tablica Kanban nie znaleziona"}, status=404)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
 @require_http_methods(["POST"])
 @csrf_exempt
 def add_column(request, organization_id, board_id):
@@ -144,10 +247,8 @@ def add_column(request, organization_id, board_id):
             )
 
         username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         is_admin = membership.role == "admin"
@@ -164,13 +265,17 @@ def add_column(request, organization_id, board_id):
         if not title:
             return JsonResponse({"error": "Tytuł nie znaleziony"}, status=404)
         if not position:
-            position = 0
+            position = next_position(KanbanColumn.objects.filter(board=board))
 
-        kanban_column = KanbanColumn.objects.create(
-            title=title,
-            board=board,
-            position=position,
-        )
+        with transaction.atomic():
+            kanban_column = KanbanColumn.objects.create(
+                title=title,
+                board=board,
+                position=position,
+            )
+            board.record_changes(
+                [(BoardChange.Kind.COLUMN, kanban_column.column_id, BoardChange.Action.UPSERT)]
+            )
 
         kanban_column_data = {
             "column_id": kanban_column.column_id,
@@ -202,10 +307,8 @@ def update_column_position(request, organization_id, board_id, column_id):
         title = data.get("title")
         username = request.user.username
 
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         is_admin = membership.role == "admin"
@@ -219,14 +322,23 @@ def update_column_position(request, organization_id, board_id, column_id):
         column = KanbanColumn.objects.get(column_id=column_id, board=board)
 
         # Allow updating title without requiring position.
-        if position is None and title is None:
+        if position is None and title is None and "after_column_id" not in data:
             return JsonResponse({"error": "Brak pól do aktualizacji"}, status=400)
 
+        # Placing after a neighbour (null = first) rewrites only this column.
+        if "after_column_id" in data:
+            position = column_position_after(
+                board, data["after_column_id"], column.column_id
+            )
         if position is not None:
             column.position = position
         if title:
             column.title = title
-        column.save()
+        with transaction.atomic():
+            column.save()
+            board.record_changes(
+                [(BoardChange.Kind.COLUMN, column.column_id, BoardChange.Action.UPSERT)]
+            )
 
         column_data = {
             "column_id": column.column_id,
@@ -256,10 +368,8 @@ def delete_column(request, organization_id, board_id, column_id):
             )
 
         username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         is_admin = membership.role == "admin"
@@ -272,7 +382,16 @@ def delete_column(request, organization_id, board_id, column_id):
 
         column = KanbanColumn.objects.get(column_id=column_id, board=board)
 
-        column.delete()
+        with transaction.atomic():
+            task_ids = list(column.tasks.values_list("task_id", flat=True))
+            column.delete()
+            board.record_changes(
+                [(BoardChange.Kind.COLUMN, column_id, BoardChange.Action.DELETE)]
+                + [
+                    (BoardChange.Kind.TASK, task_id, BoardChange.Action.DELETE)
+                    for task_id in task_ids
+                ]
+            )
 
         return JsonResponse(
             {"message": "Kolumna Kanban została pomyślnie usunięta"}, status=200
@@ -296,11 +415,8 @@ def get_column(request, organization_id, board_id, column_id):
                 {"error": "Użytkownik nie jest uwierzytelniony"}, status=401
             )
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         if (
@@ -339,10 +455,8 @@ def add_task(request, organization_id, board_id, column_id):
             )
 
         username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         is_admin = membership.role == "admin"
@@ -366,19 +480,23 @@ def add_task(request, organization_id, board_id, column_id):
         if not title:
             return JsonResponse({"error": "Tytuł nie znaleziony"}, status=404)
         if not position:
-            position = 0
+            position = next_position(Task.objects.filter(column=column))
         if not status:
             status = Task.Status.TODO
 
-        task = Task.objects.create(
-            title=title,
-            description=description or "",
-            column=column,
-            position=position,
-            due_date=due_date,
-            assigned_to_id=assigned_to_id,
-            status=status,
-        )
+        with transaction.atomic():
+            task = Task.objects.create(
+                title=title,
+                description=description or "",
+                column=column,
+                position=position,
+                due_date=due_date,
+                assigned_to_id=assigned_to_id,
+                status=status,
+            )
+            board.record_changes(
+                [(BoardChange.Kind.TASK, task.task_id, BoardChange.Action.UPSERT)]
+            )
 
         task_data = {
             "task_id": task.task_id,
@@ -412,12 +530,9 @@ def update_task(request, organization_id, board_id, column_id, task_id):
             )
 
         data = json.loads(request.body)
-        username = request.user.username
 
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         if (
@@ -442,10 +557,16 @@ def update_task(request, organization_id, board_id, column_id, task_id):
             # Validate target column belongs to same board.
             new_column = KanbanColumn.objects.get(column_id=new_column_id, board=board)
             # If no explicit position provided, append to end of target column.
-            if position is None:
-                position = Task.objects.filter(column=new_column).count()
+            if position is None and "after_task_id" not in data:
+                position = next_position(Task.objects.filter(column=new_column))
             task.column = new_column
 
+        # Placing after a neighbour (null = first) rewrites only this task.
+        if "after_task_id" in data:
+            position = task_position_after(
+                task.column, data["after_task_id"], task.task_id
+            )
+
         if title:
             task.title = title
         if description:
@@ -458,7 +579,11 @@ def update_task(request, organization_id, board_id, column_id, task_id):
             task.assigned_to_id = assigned_to_id
         if status:
             task.status = status
-        task.save()
+        with transaction.atomic():
+            task.save()
+            board.record_changes(
+                [(BoardChange.Kind.TASK, task.task_id, BoardChange.Action.UPSERT)]
+            )
 
         task_data = {
             "task_id": task.task_id,
@@ -484,6 +609,102 @@ def update_task(request, organization_id, board_id, column_id, task_id):
         return JsonResponse({"error": str(e)}, status=400)
 
 
+@require_http_methods(["PUT"])
+@csrf_exempt
+def reorder_tasks(request, organization_id, board_id):
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"error": "Użytkownik nie jest uwierzytelniony"}, status=401
+            )
+
+        data = json.loads(request.body)
+        moves = data.get("tasks")
+
+        if not isinstance(moves, list) or not moves:
+            return JsonResponse({"error": "Brak listy zadań do przeniesienia"}, status=400)
+
+        targets = {}
+        for move in moves:
+            task_id = int(move["task_id"])
+            if task_id in targets:
+                return JsonResponse(
+                    {"error": f"Zadanie {task_id} występuje więcej niż raz"}, status=400
+                )
+            targets[task_id] = (int(move["column_id"]), int(move["position"]))
+
+        membership = request.org_context.membership
+        board = KanbanBoard.objects.select_related("project").get(
+            board_id=board_id, organization__id=organization_id
+        )
+
+        is_admin = membership.role == "admin"
+        is_coordinator = board.project.coordinator_id == request.user.id
+        has_project_permission = membership.permissions.filter(
+            id=board.project.tag_id
+        ).exists()
+
+        if not (is_admin or is_coordinator or has_project_permission):
+            return JsonResponse({"error": "Brak uprawnień"}, status=403)
+
+        column_ids = {column_id for column_id, _ in targets.values()}
+        board_column_ids = set(
+            KanbanColumn.objects.filter(
+                board=board, column_id__in=column_ids
+            ).values_list("column_id", flat=True)
+        )
+        if column_ids - board_column_ids:
+            return JsonResponse({"error": "Kolumna Kanban nie znaleziona"}, status=404)
+
+        with transaction.atomic():
+            tasks = list(
+                Task.objects.select_for_update().filter(
+                    column__board=board, task_id__in=targets
+                )
+            )
+            if len(tasks) != len(targets):
+                transaction.set_rollback(True)
+                return JsonResponse({"error": "Zadanie nie znalezione"}, status=404)
+
+            for task in tasks:
+                task.column_id, task.position = targets[task.task_id]
+            Task.objects.bulk_update(tasks, ["column", "position"])
+
+            version = board.record_changes(
+                [
+                    (BoardChange.Kind.TASK, task.task_id, BoardChange.Action.UPSERT)
+                    for task in tasks
+                ]
+            )
+
+        return JsonResponse(
+            {
+                "board_id": board.board_id,
+                "version": version,
+                "tasks": [
+                    {
+                        "task_id": task.task_id,
+                        "column_id": task.column_id,
+                        "position": task.position,
+                    }
+                    for task in tasks
+                ],
+            },
+            status=200,
+        )
+    except KanbanBoard.DoesNotExist:
+        return JsonResponse({"error": "Tablica Kanban nie znaleziona"}, status=404)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Nieprawidłowy JSON"}, status=400)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse(
+            {"error": "Każde zadanie wymaga pól task_id, column_id i position"},
+            status=400,
+        )
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
 @require_http_methods(["DELETE"])
 @csrf_exempt
 def delete_task(request, organization_id, board_id, column_id, task_id):
@@ -494,10 +715,8 @@ def delete_task(request, organization_id, board_id, column_id, task_id):
             )
 
         username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         # Check if user is admin or coordinator of this project
@@ -512,7 +731,11 @@ def delete_task(request, organization_id, board_id, column_id, task_id):
         column = KanbanColumn.objects.get(column_id=column_id, board=board)
         task = Task.objects.get(task_id=task_id, column=column)
 
-        task.delete()
+        with transaction.atomic():
+            task.delete()
+            board.record_changes(
+                [(BoardChange.Kind.TASK, task_id, BoardChange.Action.DELETE)]
+            )
 
         return JsonResponse(
             {"message": "Zadanie zostało pomyślnie usunięte"}, status=200
@@ -538,11 +761,8 @@ def get_task(request, organization_id, board_id, column_id, task_id):
                 {"error": "Użytkownik nie jest uwierzytelniony"}, status=401
             )
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
-        organization = Organization.objects.get(id=organization_id)
+        membership = request.org_context.membership
+        organization = request.org_context.organization
         board = KanbanBoard.objects.get(board_id=board_id, organization=organization)
 
         if (
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OrganizationCalendarConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "organization_calendar"
+
+    def ready(self):
+        from . import feed  # noqa: F401  (registers feed invalidation signals)
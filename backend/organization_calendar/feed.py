@@ -0,0 +1,200 @@
+"""iCalendar (RFC 5545) feeds of the events a membership can see.
+
+Feeds are addressed by a signed token, since calendar clients cannot log in.
+Their validator (ETag / Last-Modified) combines the membership's permission
+fingerprint with an organization-wide calendar generation, which every event
+change bumps. A client polling an unchanged feed therefore gets a 304 answer
+without any event being read.
+"""
+
+import hashlib
+import time
+import uuid
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.permissions_checker import get_membership_permissions, invalidate_cached
+
+from .models import Event, EventOccurrence
+from .windows import STREAM_CHUNK_SIZE, in_window
+
+CACHE_TIMEOUT = getattr(settings, "CALENDAR_FEED_CACHE_TIMEOUT", 60 * 60)
+# Events that ended longer ago than this are left out of the feed.
+PAST_WINDOW = timedelta(days=getattr(settings, "CALENDAR_FEED_PAST_DAYS", 90))
+TOKEN_SALT = "organization_calendar.feed"
+
+
+def make_feed_token(membership):
+    return signing.dumps(membership.pk, salt=TOKEN_SALT, compress=True)
+
+
+def read_feed_token(token):
+    """Membership id from a feed token; raises ``signing.BadSignature``."""
+    return signing.loads(token, salt=TOKEN_SALT)
+
+
+# -----------------------------
+# Validators
+# -----------------------------
+def _generation_key(organization_id):
+    return f"calendar:feed:generation:{organization_id}"
+
+
+def _calendar_generation(organization_id):
+    """``(token, changed_at)`` of the organization's calendar contents."""
+    return cache.get_or_set(
+        _generation_key(organization_id), (uuid.uuid4().hex, time.time()), CACHE_TIMEOUT
+    )
+
+
+def feed_validators(membership):
+    """``(etag, last_modified)`` for the membership's feed."""
+    permissions = get_membership_permissions(membership)
+    fingerprint = f"{permissions.index.generation}:{permissions.bits}"
+    token, changed_at = _calendar_generation(membership.organization_id)
+    digest = hashlib.sha1(f"{membership.pk}:{fingerprint}:{token}".encode()).hexdigest()
+    return f'"{digest}"', changed_at
+
+
+def invalidate_feeds(organization_id):
+    invalidate_cached(_generation_key(organization_id))
+
+
+@receiver([post_save, post_delete], sender=Event)
+def _event_changed(sender, instance, **kwargs):
+    invalidate_feeds(instance.organization_id)
+
+
+@receiver([post_save, post_delete], sender=EventOccurrence)
+def _occurrence_changed(sender, instance, **kwargs):
+    organization_id = (
+        Event.objects.filter(pk=instance.event_id).values_list("organization_id", flat=True).first()
+    )
+    if organization_id is not None:
+        invalidate_feeds(organization_id)
+
+
+@receiver(m2m_changed, sender=Event.permissions.through)
+def _event_tags_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith("post_"):
+        invalidate_feeds(instance.organization_id)
+
+
+# -----------------------------
+# Rendering
+# -----------------------------
+def _escape(text):
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Fold a content line to 75 octets without splitting UTF-8 sequences."""
+    encoded = line.encode()
+    chunks = []
+    limit = 75
+    while len(encoded) > limit:
+        cut = limit
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        chunks.append(encoded[:cut])
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    chunks.append(encoded)
+    return b"\r\n ".join(chunks).decode() + "\r\n"
+
+
+def _stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _vevent(uid, event, start, end, name, description, extra=()):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{_stamp(event.updated_at)}",
+        f"LAST-MODIFIED:{_stamp(event.updated_at)}",
+        f"DTSTART:{_stamp(start)}",
+        f"DTEND:{_stamp(end)}",
+        f"SUMMARY:{_escape(name)}",
+        *extra,
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    if event.permissions.all():
+        categories = ",".join(_escape(tag.name) for tag in event.permissions.all())
+        lines.append(f"CATEGORIES:{categories}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def _render_event(event, domain):
+    uid = f"event-{event.event_id}@{domain}"
+    if not event.recurrence:
+        return _vevent(uid, event, event.start_time, event.end_time, event.name, event.description)
+
+    # Recurring events go out as one RRULE; clients expand them.
+    overrides = list(event.overrides.all())
+    extra = [f"RRULE:{event.recurrence.removeprefix('RRULE:')}"]
+    extra += [f"EXDATE:{_stamp(o.original_start)}" for o in overrides if o.cancelled]
+    chunks = [_vevent(uid, event, event.start_time, event.end_time, event.name, event.description, extra)]
+
+    duration = event.end_time - event.start_time
+    for override in overrides:
+        if override.cancelled:
+            continue
+        start = override.start_time or override.original_start
+        chunks.append(
+            _vevent(
+                uid,
+                event,
+                start,
+                override.end_time or start + duration,
+                override.name or event.name,
+                override.description if override.description is not None else event.description,
+                [f"RECURRENCE-ID:{_stamp(override.original_start)}"],
+            )
+        )
+    return "".join(chunks)
+
+
+def visible_feed_events(membership):
+    """Events for the feed, with the same visibility rules as get_user_events."""
+    permissions = get_membership_permissions(membership)
+    events = in_window(
+        Event.objects.filter(organization_id=membership.organization_id),
+        timezone.now() - PAST_WINDOW,
+        None,
+    )
+    for event in (
+        events.order_by("start_time", "event_id")
+        .prefetch_related("permissions", "overrides")
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    ):
+        tag_ids = [tag.id for tag in event.permissions.all()]
+        if not tag_ids or permissions.can_access(tag_ids):
+            yield event
+
+
+def render_feed(membership, domain):
+    """Yield the feed document piece by piece."""
+    yield _fold("BEGIN:VCALENDAR")
+    yield _fold("VERSION:2.0")
+    yield _fold("PRODID:-//UniOrg//Calendar//PL")
+    yield _fold("CALSCALE:GREGORIAN")
+    yield _fold(f"X-WR-CALNAME:{_escape(membership.organization.name)}")
+    for event in visible_feed_events(membership):
+        yield _render_event(event, domain)
+    yield _fold("END:VCALENDAR")
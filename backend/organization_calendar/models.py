@@ -1,5 +1,8 @@
 from django.db import models
 
+from .recurrence import series_end
+
+
 # Create your models here.
 class Event(models.Model):
     event_id = models.AutoField(primary_key=True)
@@ -17,3 +20,45 @@ class Event(models.Model):
         related_name="event_permissions",
         blank=True,
     )
+    # RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20261231". start_time/end_time
+    # describe the first occurrence; empty for one-off events.
+    recurrence = models.CharField(max_length=255, blank=True, default="")
+    # End of the last occurrence, null for series that never end.
+    recurrence_end = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Window queries bound start_time and end_time within one organization.
+        indexes = [
+            models.Index(fields=["organization", "start_time"]),
+            models.Index(fields=["organization", "end_time"]),
+            models.Index(fields=["organization", "recurrence_end"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Also validates the rule: an invalid one raises ValueError here.
+        self.recurrence_end = series_end(self) if self.recurrence else None
+        super().save(*args, **kwargs)
+
+
+class EventOccurrence(models.Model):
+    """A cancelled or changed occurrence of a recurring event."""
+
+    event = models.ForeignKey(
+        Event,
+        related_name="overrides",
+        on_delete=models.CASCADE,
+    )
+    original_start = models.DateTimeField()
+    cancelled = models.BooleanField(default=False)
+    name = models.CharField(max_length=255, blank=True, default="")
+    description = models.TextField(null=True, blank=True)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "original_start"], name="unique_event_occurrence"
+            ),
+        ]
@@ -0,0 +1,325 @@
+"""RRULE-style recurrence for calendar events.
+
+Supports the part of RFC 5545 the calendar needs: FREQ (DAILY, WEEKLY,
+MONTHLY, YEARLY), INTERVAL, COUNT, UNTIL and BYDAY for weekly rules.
+Occurrence starts are generated lazily and daily/weekly series jump straight
+to the requested window, so expanding a window costs what the window holds,
+not the age of the series.
+"""
+
+import calendar
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.permissions_checker import invalidate_cached
+
+CACHE_TIMEOUT = getattr(settings, "CALENDAR_OCCURRENCE_CACHE_TIMEOUT", 300)
+# Open-ended requests expand infinite series this far ahead of now.
+HORIZON = timedelta(days=getattr(settings, "CALENDAR_RECURRENCE_HORIZON_DAYS", 365))
+# Hard cap on occurrences returned for one series in one window.
+MAX_OCCURRENCES = 1000
+# Largest COUNT a rule may have.
+MAX_COUNT = 10000
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    interval: int = 1
+    count: int = None
+    until: datetime = None
+    byday: tuple = ()
+
+
+@dataclass(frozen=True)
+class Occurrence:
+    original_start: datetime
+    start: datetime
+    end: datetime
+    name: str
+    description: str
+
+
+def _parse_until(value):
+    if "T" in value:
+        parsed = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    else:
+        # A bare date includes the whole day.
+        parsed = datetime.combine(datetime.strptime(value, "%Y%m%d").date(), time.max)
+    return parsed.replace(tzinfo=dt_timezone.utc)
+
+
+def parse_rule(text):
+    """Parse ``FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10``; raises ValueError if invalid."""
+    parts = {}
+    for part in text.strip().removeprefix("RRULE:").split(";"):
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid recurrence part: {part}")
+        parts[key.strip().upper()] = value.strip().upper()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError("Recurrence needs FREQ=DAILY|WEEKLY|MONTHLY|YEARLY")
+    interval = int(parts.pop("INTERVAL", 1))
+    count = int(parts["COUNT"]) if "COUNT" in parts else None
+    parts.pop("COUNT", None)
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+    byday = tuple(day for day in parts.pop("BYDAY", "").split(",") if day)
+    if parts:
+        raise ValueError(f"Unsupported recurrence parts: {', '.join(parts)}")
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("INTERVAL and COUNT must be positive")
+    if count is not None and count > MAX_COUNT:
+        raise ValueError(f"COUNT may be at most {MAX_COUNT}")
+    if count is not None and until is not None:
+        raise ValueError("COUNT and UNTIL cannot be combined")
+    if byday and (freq != "WEEKLY" or any(day not in WEEKDAYS for day in byday)):
+        raise ValueError("BYDAY is only supported as weekdays of a WEEKLY rule")
+    byday = tuple(sorted(set(byday), key=WEEKDAYS.index))
+    return Rule(freq=freq, interval=interval, count=count, until=until, byday=byday)
+
+
+def _add_months(value, months):
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    if value.day > calendar.monthrange(year, month)[1]:
+        return None  # e.g. the 31st in a 30-day month: no occurrence
+    return value.replace(year=year, month=month)
+
+
+def _weekly_offsets(rule, dtstart):
+    days = rule.byday or (WEEKDAYS[dtstart.weekday()],)
+    return [timedelta(days=WEEKDAYS.index(day) - dtstart.weekday()) for day in days]
+
+
+def _candidates(rule, dtstart, first_period):
+    """Chronological candidate starts from period ``first_period`` on (unbounded)."""
+    period = first_period
+    while True:
+        if rule.freq == "DAILY":
+            yield dtstart + timedelta(days=period * rule.interval)
+        elif rule.freq == "WEEKLY":
+            week = dtstart + timedelta(weeks=period * rule.interval)
+            for offset in _weekly_offsets(rule, dtstart):
+                candidate = week + offset
+                if candidate >= dtstart:
+                    yield candidate
+        else:
+            months = period * rule.interval * (12 if rule.freq == "YEARLY" else 1)
+            candidate = _add_months(dtstart, months)
+            if candidate is not None:
+                yield candidate
+        period += 1
+
+
+def _skip_periods(rule, dtstart, not_before):
+    """Whole periods before ``not_before`` and the occurrences they hold."""
+    if rule.freq not in ("DAILY", "WEEKLY") or not_before is None or not_before <= dtstart:
+        return 0, 0
+    period_length = timedelta(days=rule.interval * (7 if rule.freq == "WEEKLY" else 1))
+    # Keep one period of slack so occurrences straddling the bound are kept.
+    periods = max(0, (not_before - dtstart) // period_length - 1)
+    if periods == 0:
+        return 0, 0
+    if rule.freq == "DAILY":
+        return periods, periods
+    offsets = _weekly_offsets(rule, dtstart)
+    first_week = sum(1 for offset in offsets if offset >= timedelta(0))
+    return periods, first_week + (periods - 1) * len(offsets)
+
+
+def iter_starts(rule, dtstart, not_before=None):
+    """Lazily yield occurrence starts, skipping ahead towards ``not_before``.
+
+    Starts before ``not_before`` may still be yielded; callers filter them.
+    """
+    first_period, produced = _skip_periods(rule, dtstart, not_before)
+    for start in _candidates(rule, dtstart, first_period):
+        if rule.count is not None and produced >= rule.count:
+            return
+        if rule.until is not None and start > rule.until:
+            return
+        produced += 1
+        yield start
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _last_start(rule, dtstart):
+    """Start of the final occurrence of a rule with COUNT or UNTIL.
+
+    Computed from the period arithmetic instead of walking the series, so a
+    distant UNTIL costs no more than a near one.
+    """
+    if rule.freq in ("DAILY", "WEEKLY"):
+        step = timedelta(days=rule.interval * (7 if rule.freq == "WEEKLY" else 1))
+        offsets = (
+            _weekly_offsets(rule, dtstart) if rule.freq == "WEEKLY" else [timedelta(0)]
+        )
+        first = [offset for offset in offsets if offset >= timedelta(0)]
+        if rule.count is not None:
+            if rule.count <= len(first):
+                return dtstart + first[rule.count - 1]
+            period, position = divmod(rule.count - 1 - len(first), len(offsets))
+            return dtstart + step * (period + 1) + offsets[position]
+        if rule.until < dtstart:
+            return dtstart
+        period = (rule.until - dtstart) // step
+        while period >= 0:
+            starts = [
+                dtstart + step * period + offset
+                for offset in (offsets if period else first)
+                if dtstart + step * period + offset <= rule.until
+            ]
+            if starts:
+                return starts[-1]
+            period -= 1
+        return dtstart
+
+    if rule.count is not None:
+        # Missing days (e.g. the 31st) are skipped, so walk; COUNT is capped.
+        last = dtstart
+        for last in iter_starts(rule, dtstart):
+            pass
+        return last
+    step = rule.interval * (12 if rule.freq == "YEARLY" else 1)
+    months = (rule.until.year - dtstart.year) * 12 + rule.until.month - dtstart.month
+    for period in range(max(0, months // step), 0, -1):
+        candidate = _add_months(dtstart, period * step)
+        if candidate is not None and candidate <= rule.until:
+            return candidate
+    return dtstart
+
+
+def series_end(event):
+    """End of the last occurrence, or None when the series never ends."""
+    start, end = _as_datetime(event.start_time), _as_datetime(event.end_time)
+    if not event.recurrence:
+        return end
+    rule = parse_rule(event.recurrence)
+    if rule.count is None and rule.until is None:
+        return None
+    try:
+        return _last_start(rule, start) + (end - start)
+    except OverflowError:
+        return None  # beyond the supported date range: treat as endless
+
+
+def is_occurrence(event, original_start):
+    rule = parse_rule(event.recurrence)
+    for start in iter_starts(rule, event.start_time, not_before=original_start):
+        if start >= original_start:
+            return start == original_start
+    return False
+
+
+def expand(event, window_start, window_end, overrides=()):
+    """Occurrences of ``event`` overlapping ``[window_start, window_end)``.
+
+    ``overrides`` (EventOccurrence rows) cancel or replace single occurrences
+    by their original start, including ones moved into the window.
+    """
+    rule = parse_rule(event.recurrence)
+    duration = event.end_time - event.start_time
+    by_start = {override.original_start: override for override in overrides}
+
+    occurrences = []
+    for start in iter_starts(rule, event.start_time, not_before=window_start - duration):
+        if start >= window_end or len(occurrences) >= MAX_OCCURRENCES:
+            break
+        if start + duration < window_start:
+            continue
+        occurrence = _apply(event, start, duration, by_start.pop(start, None))
+        if occurrence and occurrence.end >= window_start and occurrence.start < window_end:
+            occurrences.append(occurrence)
+
+    # Occurrences moved into the window from outside it.
+    for original_start, override in by_start.items():
+        occurrence = _apply(event, original_start, duration, override)
+        if (
+            occurrence
+            and occurrence.end >= window_start
+            and occurrence.start < window_end
+            and not window_start - duration <= original_start < window_end
+        ):
+            occurrences.append(occurrence)
+
+    occurrences.sort(key=lambda occurrence: occurrence.start)
+    return occurrences
+
+
+def _apply(event, original_start, duration, override):
+    if override is None:
+        return Occurrence(
+            original_start, original_start, original_start + duration,
+            event.name, event.description,
+        )
+    if override.cancelled:
+        return None
+    return Occurrence(
+        original_start,
+        override.start_time or original_start,
+        override.end_time or (override.start_time or original_start) + duration,
+        override.name or event.name,
+        override.description if override.description is not None else event.description,
+    )
+
+
+# -----------------------------
+# Window cache
+# -----------------------------
+def _series_key(event_id):
+    return f"calendar:series:{event_id}"
+
+
+def invalidate_series(event_id):
+    invalidate_cached(_series_key(event_id))
+
+
+def occurrences_in_window(event, window_start, window_end):
+    """``expand`` for one window, cached until the series or its overrides change."""
+    window_start = window_start or event.start_time
+    if window_end is None:
+        # Rounded up to midnight, so open-ended requests share one cache key a day.
+        horizon = timezone.now() + HORIZON
+        window_end = horizon.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    generation = cache.get_or_set(_series_key(event.pk), uuid.uuid4().hex, CACHE_TIMEOUT)
+    key = (
+        f"calendar:occurrences:{event.pk}:{generation}:"
+        f"{window_start.timestamp()}:{window_end.timestamp()}"
+    )
+    occurrences = cache.get(key)
+    if occurrences is None:
+        occurrences = expand(event, window_start, window_end, event.overrides.all())
+        cache.set(key, occurrences, CACHE_TIMEOUT)
+    return occurrences
+
+
+@receiver([post_save, post_delete], sender="organization_calendar.Event")
+def _event_changed(sender, instance, **kwargs):
+    invalidate_series(instance.pk)
+
+
+@receiver([post_save, post_delete], sender="organization_calendar.EventOccurrence")
+def _occurrence_changed(sender, instance, **kwargs):
+    invalidate_series(instance.event_id)
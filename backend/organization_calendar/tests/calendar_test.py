@@ -1,4 +1,5 @@
 import datetime
+import json
 
 from django.urls import reverse
 from django.utils import timezone
@@ -22,6 +23,10 @@ class ComprehensiveCalendarAPITests(APITestCase):
             f"Logowanie jako {username} nie powiodło się: {response.content}",
         )
 
+    def _stream_json(self, response):
+        # Listy wydarzeń są strumieniowane
+        return json.loads(b"".join(response.streaming_content))
+
     def _logout(self, organization_name):
         url = reverse("logout", args=[organization_name])
         response = self.client.post(url)
@@ -106,7 +111,97 @@ class ComprehensiveCalendarAPITests(APITestCase):
         url = reverse("get_all_events", args=[self.org.pk])
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(len(self._stream_json(response)), 3)
+
+    def test_events_are_limited_to_requested_window(self):
+        url = reverse("get_all_events", args=[self.org.pk])
+        window = {
+            "start": (self.event2.start_time - datetime.timedelta(minutes=30)).isoformat(),
+            "end": (self.event3.start_time).isoformat(),
+        }
+        response = self.client.get(url, window)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([e["name"] for e in self._stream_json(response)], ["QA Sync"])
+
+        # Koordynator widzi tylko swoje wydarzenia z okna
+        self._login("coordinator", "password123", self.org.slug)
+        url = reverse("get_my_events", args=[self.org.pk, self.coordinator_user.username])
+        window["end"] = (self.event3.end_time).isoformat()
+        response = self.client.get(url, window)
+        self.assertEqual([e["name"] for e in self._stream_json(response)], ["All Hands"])
+
+        response = self.client.get(url, {"start": "not-a-date"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recurring_event_is_expanded_for_window(self):
+        url = reverse("get_all_events", args=[self.org.pk])
+        start = datetime.datetime(2030, 1, 7, 10, 0, tzinfo=datetime.timezone.utc)  # poniedziałek
+        series = Event.objects.create(
+            name="Standup",
+            organization=self.org,
+            start_time=start,
+            end_time=start + datetime.timedelta(minutes=15),
+            recurrence="FREQ=WEEKLY;BYDAY=MO,WE",
+        )
+        window = {"start": "2030-03-04", "end": "2030-03-11"}
+
+        response = self.client.get(url, window)
+        rows = [e for e in self._stream_json(response) if e["event_id"] == series.event_id]
+        self.assertEqual([r["start_time"][:10] for r in rows], ["2030-03-04", "2030-03-06"])
+
+        # Odwołanie jednego wystąpienia i przeniesienie drugiego
+        occurrence_url = reverse("update_occurrence", args=[self.org.pk, series.event_id])
+        r = self.client.post(
+            occurrence_url, {"original_start": "2030-03-04T10:00:00Z", "cancelled": True}, format="json"
+        )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        r = self.client.post(
+            occurrence_url,
+            {"original_start": "2030-03-06T10:00:00Z", "start_time": "2030-03-07T12:00:00Z", "name": "Moved"},
+            format="json",
+        )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        r = self.client.post(occurrence_url, {"original_start": "2030-03-05T10:00:00Z"}, format="json")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, window)
+        rows = [e for e in self._stream_json(response) if e["event_id"] == series.event_id]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["name"], "Moved")
+        self.assertEqual(rows[0]["start_time"][:16], "2030-03-07T12:00")
+        self.assertEqual(rows[0]["end_time"][:16], "2030-03-07T12:15")
+
+    def test_ics_feed_supports_conditional_requests(self):
+        self._login("coordinator", "password123", self.org.slug)
+        r = self.client.get(reverse("get_feed_url", args=[self.org.pk]))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        feed_url = r.json()["url"]
+        # Kanał nie wymaga sesji - dostęp daje podpisany token w URL
+        self.client.logout()
+
+        response = self.client.get(feed_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("SUMMARY:Dev Meeting", body)
+        self.assertIn("SUMMARY:All Hands", body)
+        self.assertNotIn("QA Sync", body)
+
+        etag = response["ETag"]
+        response = self.client.get(feed_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(feed_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Zmiana wydarzenia unieważnia ETag
+        self.event1.name = "Dev Sync"
+        self.event1.save()
+        response = self.client.get(feed_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("SUMMARY:Dev Sync", b"".join(response.streaming_content).decode())
+
+        response = self.client.get(reverse("calendar_feed", args=["forged"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_non_admin_cannot_get_all_events(self):
         self._login("member", "password123", self.org.slug)
@@ -122,7 +217,7 @@ class ComprehensiveCalendarAPITests(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        data = response.json()
+        data = self._stream_json(response)
         self.assertEqual(len(data), 2)
         event_names = {e["name"] for e in data}
         self.assertIn("Dev Meeting", event_names)
@@ -0,0 +1,53 @@
+import datetime
+
+from django.test import SimpleTestCase
+
+from organization_calendar.recurrence import _last_start, iter_starts, parse_rule
+
+UTC = datetime.timezone.utc
+
+
+class RecurrenceRuleTests(SimpleTestCase):
+    def setUp(self):
+        # Poniedziałek
+        self.dtstart = datetime.datetime(2025, 1, 6, 9, 0, tzinfo=UTC)
+
+    def test_parse_rule_rejects_unsupported_parts(self):
+        rule = parse_rule("RRULE:FREQ=WEEKLY;BYDAY=WE,MO;COUNT=4")
+        self.assertEqual(rule.byday, ("MO", "WE"))
+        for text in ["", "FREQ=HOURLY", "FREQ=DAILY;COUNT=1000000000", "FREQ=DAILY;BYDAY=MO", "FREQ=DAILY;COUNT=2;UNTIL=20250101", "FREQ=DAILY;BYHOUR=9"]:
+            with self.assertRaises(ValueError):
+                parse_rule(text)
+
+    def test_skipping_ahead_matches_full_expansion(self):
+        for text in ["FREQ=DAILY;INTERVAL=3", "FREQ=WEEKLY;BYDAY=TU,FR;INTERVAL=2", "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=40"]:
+            rule = parse_rule(text)
+            not_before = self.dtstart + datetime.timedelta(days=200)
+            full = [s for s, _ in zip(iter_starts(rule, self.dtstart), range(500)) if s >= not_before]
+            skipped = [s for s, _ in zip(iter_starts(rule, self.dtstart, not_before), range(500)) if s >= not_before]
+            self.assertEqual(full[:20], skipped[:20], text)
+
+    def test_monthly_skips_missing_days(self):
+        rule = parse_rule("FREQ=MONTHLY;COUNT=3")
+        start = datetime.datetime(2025, 1, 31, 9, 0, tzinfo=UTC)
+        self.assertEqual(
+            [s.month for s in iter_starts(rule, start)], [1, 3, 5]
+        )
+
+    def test_last_start_matches_walking_the_series(self):
+        for text in [
+            "FREQ=DAILY;COUNT=1", "FREQ=DAILY;INTERVAL=3;COUNT=50", "FREQ=DAILY;UNTIL=20250301",
+            "FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=7", "FREQ=WEEKLY;BYDAY=SU,TU;INTERVAL=2;COUNT=9",
+            "FREQ=WEEKLY;BYDAY=SU,TH;UNTIL=20250601T000000Z", "FREQ=WEEKLY;UNTIL=20250105",
+            "FREQ=MONTHLY;UNTIL=20260715", "FREQ=YEARLY;INTERVAL=2;UNTIL=20330101",
+        ]:
+            rule = parse_rule(text)
+            for start in [self.dtstart, datetime.datetime(2024, 2, 29, 9, 0, tzinfo=UTC)]:
+                walked = list(iter_starts(rule, start))
+                self.assertEqual(_last_start(rule, start), walked[-1] if walked else start, text)
+
+    def test_distant_until_is_computed_not_walked(self):
+        # UNTIL w roku 9999 nie może wieszać zapisu wydarzenia
+        rule = parse_rule("FREQ=DAILY;UNTIL=99991231")
+        self.assertEqual(_last_start(rule, self.dtstart).date(), datetime.date(9999, 12, 31))
+
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import(
-    get_all_events, get_user_events, get_events_by_tag, create_event, delete_event, get_event, update_event
+    get_all_events, get_user_events, get_events_by_tag, create_event, delete_event, get_event, update_event,
+    update_occurrence, get_feed_url, calendar_feed,
 )
 
 urlpatterns = [
@@ -11,4 +12,7 @@ urlpatterns = [
     path('events/create/<int:organization_id>/', create_event, name='create_event'),
     path('events/delete/<int:organization_id>/<int:event_id>/', delete_event, name='delete_event'),
     path('events/update/<int:organization_id>/<int:event_id>/', update_event, name='update_event'),
+    path('events/feed/url/<int:organization_id>/', get_feed_url, name='get_feed_url'),
+    path('events/feed/<str:token>/calendar.ics', calendar_feed, name='calendar_feed'),
+    path('events/occurrence/<int:organization_id>/<int:event_id>/', update_occurrence, name='update_occurrence'),
 ]
@@ -1,11 +1,64 @@
 from django.db import transaction
-from django.http import JsonResponse
+from django.core import signing
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from .models import Event
-from organizations.models import Organization, Membership, Tag, CombinedTag
+from .models import Event, EventOccurrence
+from organizations.models import Membership, Organization, Tag, CombinedTag
 import json
-from core.permissions_checker import permission_to_access
+from core.permissions_checker import filter_by_tag, get_membership_permissions
+from .feed import feed_validators, make_feed_token, read_feed_token, render_feed
+from .recurrence import is_occurrence, occurrences_in_window
+from .windows import (
+    STREAM_CHUNK_SIZE,
+    in_window,
+    parse_moment,
+    parse_window,
+    stream_json_list,
+)
+
+
+def _event_to_dict(event):
+    return {
+        "event_id": event.event_id,
+        "name": event.name,
+        "description": event.description,
+        "start_time": event.start_time,
+        "end_time": event.end_time,
+        "organization_id": event.organization_id,
+        "permissions": [tag.name for tag in event.permissions.all()],
+        "recurrence": event.recurrence,
+    }
+
+
+def _windowed_events(request, organization_id):
+    start, end = parse_window(request.GET)
+    events = in_window(Event.objects.filter(organization_id=organization_id), start, end)
+    events = (
+        events.order_by("start_time", "event_id")
+        .prefetch_related("permissions", "overrides")
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    return start, end, events
+
+
+def _event_rows(event, start, end):
+    """The event itself, or each occurrence of a recurring event in the window."""
+    if not event.recurrence:
+        yield _event_to_dict(event)
+        return
+    for occurrence in occurrences_in_window(event, start, end):
+        row = _event_to_dict(event)
+        row.update(
+            name=occurrence.name,
+            description=occurrence.description,
+            start_time=occurrence.start,
+            end_time=occurrence.end,
+            original_start=occurrence.original_start,
+        )
+        yield row
 
 
 # Create your views here.
@@ -16,45 +69,18 @@ def get_all_events(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Unauthorized access"}, status=403)
 
-        organization = Organization.objects.get(id=organization_id)
-        events = Event.objects.filter(organization=organization)
-
-        # Apply date filtering if provided
-        start_date = request.GET.get("start_date")
-        end_date = request.GET.get("end_date")
-        if start_date:
-            # Events that end on or after the start date
-            events = events.filter(end_time__date__gte=start_date)
-        if end_date:
-            # Events that start on or before the end date
-            events = events.filter(start_time__date__lte=end_date)
-
-        events_data = []
-
-        for event in events:
-            events_data.append(
-                {
-                    "event_id": event.event_id,
-                    "name": event.name,
-                    "description": event.description,
-                    "start_time": event.start_time,
-                    "end_time": event.end_time,
-                    "organization_id": event.organization.id,
-                    "permissions": list(
-                        event.permissions.values_list("name", flat=True)
-                    ),
-                }
-            )
+        # Only events overlapping the requested window (start/end) are read,
+        # and they are streamed out chunk by chunk.
+        start, end, events = _windowed_events(request, membership.organization_id)
 
-        return JsonResponse(events_data, safe=False, status=200)
+        return stream_json_list(
+            row for event in events for row in _event_rows(event, start, end)
+        )
     except Organization.DoesNotExist:
         return JsonResponse({"error": "Organization not found"}, status=404)
     except Exception as e:
@@ -68,55 +94,21 @@ def get_user_events(request, organization_id, username):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
-        username = request.user.username
-
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         if not membership:
             return JsonResponse({"error": "Unauthorized access"}, status=403)
 
-        organization = Organization.objects.get(id=organization_id)
-        user_permissions = membership.permissions.all()
-
-        all_events = Event.objects.filter(organization=organization)
-
-        start_date = request.GET.get("start_date")
-        end_date = request.GET.get("end_date")
-        if start_date:
-            all_events = all_events.filter(end_time__date__gte=start_date)
-        if end_date:
-            all_events = all_events.filter(start_time__date__lte=end_date)
-
-        events = []
-
-        for event in all_events:
-            event_permissions = event.permissions.all()
+        user_permissions = get_membership_permissions(membership)
+        start, end, events = _windowed_events(request, membership.organization_id)
 
-            if len(event_permissions) == 0:
-                events.append(event)
-            elif permission_to_access(user_permissions, event_permissions):
-                events.append(event)
+        def visible(events):
+            for event in events:
+                event_tag_ids = [tag.id for tag in event.permissions.all()]
+                if not event_tag_ids or user_permissions.can_access(event_tag_ids):
+                    yield from _event_rows(event, start, end)
 
-        events_data = []
-
-        for event in events:
-            events_data.append(
-                {
-                    "event_id": event.event_id,
-                    "name": event.name,
-                    "description": event.description,
-                    "start_time": event.start_time,
-                    "end_time": event.end_time,
-                    "organization_id": event.organization.id,
-                    "permissions": list(
-                        event.permissions.values_list("name", flat=True)
-                    ),
-                }
-            )
-
-        return JsonResponse(events_data, safe=False, status=200)
+        return stream_json_list(visible(events))
     except Organization.DoesNotExist:
         return JsonResponse({"error": "Organization not found"}, status=404)
     except Exception as e:
@@ -130,36 +122,17 @@ def get_events_by_tag(request, organization_id, tag_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             if tag_id not in membership.permissions.values_list("id", flat=True):
                 return JsonResponse({"error": "Unauthorized access"}, status=403)
 
-        organization = Organization.objects.get(id=organization_id)
-        events = []
-
-        for event in Event.objects.filter(organization=organization):
-            if event.permissions.filter(id=tag_id).exists():
-                events.append(event)
-            else:
-                combined_tags = event.permissions.filter(combined=True)
-                for combined_tag in combined_tags:
-                    basic_tags = CombinedTag.objects.filter(
-                        combined_tag_id=combined_tag
-                    )
-                    basic_tag_ids = [
-                        basic_tag.basic_tag_id.id for basic_tag in basic_tags
-                    ]
-                    if tag_id in basic_tag_ids:
-                        if permission_to_access(
-                            membership.permissions, event.permissions.all()
-                        ):
-                            events.append(event)
-                            break
+        events = filter_by_tag(
+            Event.objects.filter(organization_id=membership.organization_id),
+            membership,
+            tag_id,
+        )
 
         events_data = []
 
@@ -171,7 +144,7 @@ def get_events_by_tag(request, organization_id, tag_id):
                     "description": event.description,
                     "start_time": event.start_time,
                     "end_time": event.end_time,
-                    "organization_id": event.organization.id,
+                    "organization_id": event.organization_id,
                 }
             )
 
@@ -189,18 +162,14 @@ def get_event(request, organization_id, event_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         event = Event.objects.get(event_id=event_id, organization__id=organization_id)
 
         if membership.role != "admin":
-            user_permissions = membership.permissions.all()
-            event_permissions = event.permissions.all()
+            event_tag_ids = event.permissions.values_list("id", flat=True)
 
-            if not permission_to_access(user_permissions, event_permissions):
+            if not get_membership_permissions(membership).can_access(event_tag_ids):
                 return JsonResponse({"error": "Unauthorized access"}, status=403)
 
         event_data = {
@@ -211,6 +180,7 @@ def get_event(request, organization_id, event_id):
             "end_time": event.end_time,
             "organization_id": event.organization.id,
             "permissions": list(event.permissions.values_list("name", flat=True)),
+            "recurrence": event.recurrence,
         }
 
         return JsonResponse(event_data, status=200)
@@ -227,10 +197,7 @@ def create_event(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             allowed_permissions = membership.permissions.all()
@@ -241,7 +208,7 @@ def create_event(request, organization_id):
         description = request.POST.get("description")
         start_time = request.POST.get("start_time")
         end_time = request.POST.get("end_time")
-        organization = Organization.objects.get(id=organization_id)
+        organization = request.org_context.organization
         permissions_str = request.POST.get("permissions")
 
         permissions_ids = []
@@ -277,7 +244,7 @@ def create_event(request, organization_id):
                         with transaction.atomic():
                             new_combined_tag = Tag.objects.create(
                                 name=permission,
-                                organization=Organization.objects.get(id=organization_id),
+                                organization=request.org_context.organization,
                                 combined=True,
                             )
 
@@ -306,6 +273,7 @@ def create_event(request, organization_id):
             start_time=start_time,
             end_time=end_time,
             organization=organization,
+            recurrence=request.POST.get("recurrence", ""),
         )
 
         event.permissions.set(Tag.objects.filter(id__in=permissions_ids))
@@ -319,6 +287,7 @@ def create_event(request, organization_id):
             "end_time": event.end_time,
             "organization_id": event.organization.id,
             "permissions": list(event.permissions.values_list("name", flat=True)),
+            "recurrence": event.recurrence,
         }
 
         return JsonResponse(event_data, status=201)
@@ -337,18 +306,14 @@ def delete_event(request, organization_id, event_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
 
         event = Event.objects.get(event_id=event_id, organization__id=organization_id)
 
         if membership.role != "admin":
-            user_permissions = membership.permissions.all()
-            event_permissions = event.permissions.all()
+            event_tag_ids = event.permissions.values_list("id", flat=True)
 
-            if not permission_to_access(user_permissions, event_permissions):
+            if not get_membership_permissions(membership).can_access(event_tag_ids):
                 return JsonResponse({"error": "Unauthorized access"}, status=403)
 
         event.delete()
@@ -368,17 +333,13 @@ def update_event(request, organization_id, event_id):
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
         data = json.loads(request.body)
-        username = request.user.username
-        membership = Membership.objects.get(
-            user__username=username, organization__id=organization_id
-        )
+        membership = request.org_context.membership
         event = Event.objects.get(event_id=event_id, organization__id=organization_id)
 
         if membership.role != "admin":
-            user_permissions = membership.permissions.all()
-            event_permissions = event.permissions.all()
+            event_tag_ids = event.permissions.values_list("id", flat=True)
 
-            if not permission_to_access(user_permissions, event_permissions):
+            if not get_membership_permissions(membership).can_access(event_tag_ids):
                 return JsonResponse({"error": "Unauthorized access"}, status=403)
 
         name = data.get("name")
@@ -435,7 +396,7 @@ def update_event(request, organization_id, event_id):
                             with transaction.atomic():
                                 new_combined_tag = Tag.objects.create(
                                     name=permission,
-                                    organization=Organization.objects.get(id=organization_id),
+                                    organization=request.org_context.organization,
                                     combined=True,
                                 )
 
@@ -458,6 +419,9 @@ def update_event(request, organization_id, event_id):
             event.name = name
         if description:
             event.description = description
+        if data.get("recurrence") is not None:
+            # "" turns a series back into a one-off event
+            event.recurrence = data["recurrence"]
         if start_time:
             if not both_dates_provided:
                     if start_time > event.end_time:
@@ -480,6 +444,7 @@ def update_event(request, organization_id, event_id):
             "end_time": event.end_time,
             "organization_id": event.organization.id,
             "permissions": list(event.permissions.values_list("name", flat=True)),
+            "recurrence": event.recurrence,
         }
 
 
@@ -488,3 +453,111 @@ def update_event(request, organization_id, event_id):
         return JsonResponse({"error": "Event not found"}, status=404)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
+
+
+@require_http_methods(["POST", "DELETE"])
+@csrf_exempt
+def update_occurrence(request, organization_id, event_id):
+    """Cancel or change (POST) or restore (DELETE) one occurrence of a series."""
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "User not authenticated"}, status=401)
+
+        data = json.loads(request.body)
+        membership = request.org_context.membership
+        event = Event.objects.get(event_id=event_id, organization__id=organization_id)
+
+        if membership.role != "admin":
+            event_tag_ids = event.permissions.values_list("id", flat=True)
+
+            if not get_membership_permissions(membership).can_access(event_tag_ids):
+                return JsonResponse({"error": "Unauthorized access"}, status=403)
+
+        if not event.recurrence:
+            return JsonResponse({"error": "Event is not recurring"}, status=400)
+
+        original_start = parse_moment(data.get("original_start") or "", "original_start")
+        if not is_occurrence(event, original_start):
+            return JsonResponse({"error": "No occurrence starts at original_start"}, status=400)
+
+        if request.method == "DELETE":
+            EventOccurrence.objects.filter(event=event, original_start=original_start).delete()
+            return JsonResponse({"message": "Occurrence restored"}, status=200)
+
+        start_time = parse_moment(data["start_time"], "start_time") if data.get("start_time") else None
+        end_time = parse_moment(data["end_time"], "end_time") if data.get("end_time") else None
+        if start_time and end_time and start_time > end_time:
+            return JsonResponse({"error": "Nieprawidłowy zakres czasu"}, status=400)
+
+        occurrence, _ = EventOccurrence.objects.update_or_create(
+            event=event,
+            original_start=original_start,
+            defaults={
+                "cancelled": bool(data.get("cancelled", False)),
+                "name": data.get("name") or "",
+                "description": data.get("description"),
+                "start_time": start_time,
+                "end_time": end_time,
+            },
+        )
+
+        return JsonResponse(
+            {
+                "event_id": event.event_id,
+                "original_start": occurrence.original_start,
+                "cancelled": occurrence.cancelled,
+                "name": occurrence.name or event.name,
+                "start_time": occurrence.start_time,
+                "end_time": occurrence.end_time,
+            },
+            status=200,
+        )
+    except Event.DoesNotExist:
+        return JsonResponse({"error": "Event not found"}, status=404)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
+@require_http_methods(["GET"])
+@csrf_exempt
+def get_feed_url(request, organization_id):
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "User not authenticated"}, status=401)
+
+        membership = request.org_context.membership
+        url = reverse("calendar_feed", args=[make_feed_token(membership)])
+
+        return JsonResponse({"url": request.build_absolute_uri(url)}, status=200)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
+@require_http_methods(["GET"])
+@csrf_exempt
+def calendar_feed(request, token):
+    """ICS feed for calendar clients, authorised by the signed token in the URL."""
+    try:
+        membership = Membership.objects.select_related("organization").get(
+            pk=read_feed_token(token)
+        )
+
+        etag, last_modified = feed_validators(membership)
+        if_none_match = request.headers.get("If-None-Match")
+        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        if (if_none_match and etag in parse_etags(if_none_match)) or (
+            not if_none_match and if_modified_since and if_modified_since >= int(last_modified)
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = StreamingHttpResponse(
+                render_feed(membership, request.get_host()),
+                content_type="text/calendar; charset=utf-8",
+            )
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+    except (signing.BadSignature, Membership.DoesNotExist):
+        return JsonResponse({"error": "Feed not found"}, status=404)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
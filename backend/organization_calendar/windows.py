@@ -0,0 +1,79 @@
+"""Date windows and streamed JSON output for calendar listings."""
+
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Rows pulled from the database per round trip while streaming.
+STREAM_CHUNK_SIZE = 500
+
+
+def parse_moment(value, name):
+    """Aware datetime from an ISO date or datetime; raises ValueError."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid {name}: {value}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_window(params):
+    """Return the ``(start, end)`` window requested in ``params``.
+
+    ``start``/``end`` take ISO dates or datetimes and form a half-open window.
+    The older ``start_date``/``end_date`` are whole days with an inclusive
+    end. Either bound may be None.
+    """
+    start = end = None
+    if params.get("start"):
+        start = parse_moment(params["start"], "start")
+    elif params.get("start_date"):
+        start = parse_moment(params["start_date"], "start_date")
+    if params.get("end"):
+        end = parse_moment(params["end"], "end")
+    elif params.get("end_date"):
+        end = parse_moment(params["end_date"], "end_date") + timedelta(days=1)
+    if start and end and end <= start:
+        raise ValueError("Window end must be after its start")
+    return start, end
+
+
+def in_window(events, start, end):
+    """Events overlapping ``[start, end)``, as sargable range predicates.
+
+    Each bound hits one of the (organization, start_time), (organization,
+    end_time) and (organization, recurrence_end) indexes. Recurring events
+    are matched by their whole series and expanded by the caller.
+    """
+    if start is not None:
+        events = events.filter(
+            Q(end_time__gte=start)
+            | Q(recurrence_end__gte=start)
+            | (Q(recurrence_end__isnull=True) & ~Q(recurrence=""))
+        )
+    if end is not None:
+        events = events.filter(start_time__lt=end)
+    return events
+
+
+def stream_json_list(items):
+    """Stream ``items`` (an iterable of dicts) as a JSON array."""
+
+    def chunks():
+        yield "["
+        for position, item in enumerate(items):
+            if position:
+                yield ","
+            yield json.dumps(item, cls=DjangoJSONEncoder)
+        yield "]"
+
+    return StreamingHttpResponse(chunks(), content_type="application/json")
@@ -0,0 +1,171 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.jwt_auth import token_memberships
+from core.permissions_checker import get_membership_permissions, invalidate_cached
+
+from .models import Membership, Organization
+
+CACHE_TIMEOUT = getattr(settings, "ORGANIZATION_CONTEXT_CACHE_TIMEOUT", 30)
+SLUG_CACHE_TIMEOUT = getattr(settings, "ORGANIZATION_SLUG_CACHE_TIMEOUT", 300)
+
+_slug_ids = {}
+_slug_ids_lock = threading.Lock()
+
+
+def _membership_key(user_id, organization_id):
+    return f"orgctx:membership:{organization_id}:{user_id}"
+
+
+def _organization_ids_key(user_id):
+    return f"orgctx:organizations:{user_id}"
+
+
+def _organization_key(organization_id):
+    return f"orgctx:organization:{organization_id}"
+
+
+def _cached(key, load):
+    value = cache.get(key) if CACHE_TIMEOUT else None
+    if value is None:
+        value = load()
+        if CACHE_TIMEOUT:
+            cache.set(key, value, CACHE_TIMEOUT)
+    return value
+
+
+def organization_id_for_slug(slug, refresh=False):
+    """Id of the organization with ``slug``, from an in-process map.
+
+    Entries are dropped when the organization is saved or deleted in this
+    process and expire after ``SLUG_CACHE_TIMEOUT`` otherwise, so callers
+    should also match the slug in their own query and retry with
+    ``refresh=True`` when it misses. Raises ``Organization.DoesNotExist``.
+    """
+    now = time.monotonic()
+    entry = None if refresh else _slug_ids.get(slug)
+    if entry is None or entry[1] <= now:
+        organization_id = Organization.objects.values_list("id", flat=True).get(slug=slug)
+        entry = (organization_id, now + SLUG_CACHE_TIMEOUT)
+        with _slug_ids_lock:
+            _slug_ids[slug] = entry
+    return entry[0]
+
+
+def _forget_slug_ids(organization_id):
+    with _slug_ids_lock:
+        for slug, (cached_id, _) in list(_slug_ids.items()):
+            if cached_id == organization_id:
+                del _slug_ids[slug]
+
+
+class OrganizationContext:
+    """The caller's organization, membership, role and permissions for one request.
+
+    Everything is resolved lazily on first access, so views that never touch
+    the context pay nothing. A missing membership raises
+    ``Membership.DoesNotExist`` just like the lookups it replaces.
+    ``memberships`` (organization id -> role, from the JWT in stateless mode)
+    is only a hint frozen at login: a listed organization still goes through
+    the membership lookup, so removals take effect, and an unlisted one is
+    checked against the user's cached organization ids, so organizations
+    joined since login are not refused.
+    """
+
+    def __init__(self, user, organization_id, memberships=None):
+        self.user = user
+        self.organization_id = int(organization_id)
+        self.memberships = memberships
+        self._membership = None
+        self._permissions = None
+
+    @property
+    def organization(self):
+        return self.membership.organization
+
+    @property
+    def membership(self):
+        if self._membership is None:
+            if (
+                self.memberships is not None
+                and self.organization_id not in self.memberships
+                and self.organization_id not in self._organization_ids()
+            ):
+                raise Membership.DoesNotExist("Membership matching query does not exist.")
+            membership = _cached(
+                _membership_key(self.user.pk, self.organization_id),
+                lambda: Membership.objects.get(
+                    user_id=self.user.pk, organization_id=self.organization_id
+                ),
+            )
+            membership.organization = _cached(
+                _organization_key(self.organization_id),
+                lambda: Organization.objects.get(id=self.organization_id),
+            )
+            membership.user = self.user
+            self._membership = membership
+        return self._membership
+
+    def _organization_ids(self):
+        return _cached(
+            _organization_ids_key(self.user.pk),
+            lambda: frozenset(
+                Membership.objects.filter(user_id=self.user.pk).values_list(
+                    "organization_id", flat=True
+                )
+            ),
+        )
+
+    @property
+    def role(self):
+        return self.membership.role
+
+    @property
+    def is_admin(self):
+        return self.role == Membership.Role.ADMIN
+
+    @property
+    def permissions(self):
+        if self._permissions is None:
+            self._permissions = get_membership_permissions(self.membership)
+        return self._permissions
+
+
+class OrganizationContextMiddleware:
+    """Attach ``request.org_context`` for views routed with an ``organization_id``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.org_context = None
+        organization_id = view_kwargs.get("organization_id")
+        user = getattr(request, "user", None)
+        if organization_id is not None and user is not None and user.is_authenticated:
+            request.org_context = OrganizationContext(
+                user, organization_id, memberships=token_memberships(request)
+            )
+        return None
+
+
+@receiver([post_save, post_delete], sender=Membership)
+def _membership_changed(sender, instance, **kwargs):
+    invalidate_cached(_membership_key(instance.user_id, instance.organization_id))
+    invalidate_cached(_organization_ids_key(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=Organization)
+def _organization_changed(sender, instance, **kwargs):
+    invalidate_cached(_organization_key(instance.pk))
+    organization_id = instance.pk
+    _forget_slug_ids(organization_id)
+    transaction.on_commit(lambda: _forget_slug_ids(organization_id))
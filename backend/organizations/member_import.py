@@ -0,0 +1,180 @@
+"""Bulk import of organization members from CSV or JSON.
+
+Rows are validated up front, identifiers are checked against the database
+in one query, and accepted rows are built with ``UserManager.build_users``
+(passwords hashed in a process pool) and inserted in chunks.
+``import_members`` validates eagerly, so bad input and database errors during
+validation reach the caller before any response is sent, and returns an
+iterator that yields one result per input row as each chunk commits, so the
+report can be streamed.
+"""
+
+import csv
+import io
+import json
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from chatsAndMessaging.visibility import refresh_memberships
+from core.email_utils import queue_credentials_emails
+
+from .models import Membership
+
+User = get_user_model()
+
+CHUNK_SIZE = 200
+MAX_ROWS = 5000
+
+
+def parse_rows(content_type, body):
+    """List of row dicts from a CSV or JSON body; raises ValueError."""
+    if "csv" in (content_type or ""):
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        rows = [
+            {key.strip(): (value or "").strip() for key, value in row.items() if key}
+            for row in reader
+        ]
+    else:
+        data = json.loads(body or "[]")
+        rows = data.get("members") if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("Oczekiwano listy członków")
+    if len(rows) > MAX_ROWS:
+        raise ValueError(f"Maksymalnie {MAX_ROWS} wierszy na import")
+    return rows
+
+
+def _validate(rows, organization):
+    """Split rows into accepted candidates and per-row errors."""
+    roles = set(Membership.Role.values)
+    results = {}
+    candidates = []
+    seen = set()
+    for number, row in enumerate(rows, start=1):
+        username = str(row.get("username") or "").strip()
+        role = str(row.get("role") or Membership.Role.MEMBER).strip()
+        error = None
+        if not username:
+            error = "Brakujące pole: username"
+        elif role not in roles:
+            error = f"Nieprawidłowa rola: {role}"
+        elif username in seen:
+            error = "Zduplikowany użytkownik w pliku"
+        if error:
+            results[number] = {"row": number, "username": username, "status": "error", "error": error}
+            continue
+        seen.add(username)
+        candidates.append(
+            {
+                "row": number,
+                "username": username,
+                "identifier": f"{username}_{organization.name}",
+                "email": str(row.get("email") or "").strip(),
+                "first_name": str(row.get("first_name") or "").strip(),
+                "last_name": str(row.get("last_name") or "").strip(),
+                "role": role,
+                "password": str(row["password"]) if row.get("password") else None,
+            }
+        )
+
+    existing = set(
+        User.objects.filter(
+            identifier__in=[candidate["identifier"] for candidate in candidates]
+        ).values_list("identifier", flat=True)
+    )
+    accepted = []
+    for candidate in candidates:
+        if candidate["identifier"] in existing:
+            results[candidate["row"]] = {
+                "row": candidate["row"],
+                "username": candidate["username"],
+                "status": "error",
+                "error": "Użytkownik już istnieje",
+            }
+        else:
+            accepted.append(candidate)
+    return accepted, results
+
+
+def _create_chunk(chunk, organization, invited_by):
+    for candidate in chunk:
+        candidate["generated"] = candidate["password"] is None
+        if candidate["generated"]:
+            candidate["password"] = secrets.token_urlsafe(12)
+    # Hashed before the transaction opens, so it is not held during the slow part.
+    users = User.objects.build_users(
+        {
+            "username": candidate["username"],
+            "identifier": candidate["identifier"],
+            "email": candidate["email"],
+            "first_name": candidate["first_name"],
+            "last_name": candidate["last_name"],
+            "password": candidate["password"],
+        }
+        for candidate in chunk
+    )
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        memberships = Membership.objects.bulk_create(
+            [
+                Membership(
+                    organization=organization,
+                    user=user,
+                    role=candidate["role"],
+                    invited_by=invited_by,
+                )
+                for candidate, user in zip(chunk, users)
+            ]
+        )
+        # bulk_create skips post_save, which keeps the chat visibility index.
+        refresh_memberships([membership.pk for membership in memberships])
+        queue_credentials_emails(
+            ((c["email"], c["username"], c["password"]) for c in chunk), organization.name
+        )
+
+
+def import_members(rows, organization, invited_by):
+    """Validate ``rows`` now; return an iterator of per-row result dicts in order.
+
+    Members are created while the iterator is consumed. A chunk that fails is
+    reported as an error for each of its rows and the import carries on.
+    """
+    accepted, results = _validate(rows, organization)
+    return _create_members(accepted, results, organization, invited_by)
+
+
+def _create_members(accepted, results, organization, invited_by):
+    next_row = 1
+    for start in range(0, len(accepted), CHUNK_SIZE):
+        chunk = accepted[start:start + CHUNK_SIZE]
+        try:
+            _create_chunk(chunk, organization, invited_by)
+        except Exception as exc:
+            for candidate in chunk:
+                results[candidate["row"]] = {
+                    "row": candidate["row"],
+                    "username": candidate["username"],
+                    "status": "error",
+                    "error": str(exc),
+                }
+        else:
+            for candidate in chunk:
+                result = {
+                    "row": candidate["row"],
+                    "username": candidate["username"],
+                    "status": "created",
+                    "role": candidate["role"],
+                }
+                if candidate["generated"]:
+                    result["generated_password"] = candidate["password"]
+                results[candidate["row"]] = result
+        # Report rows in input order, as far as they are decided.
+        while next_row in results:
+            yield results.pop(next_row)
+            next_row += 1
+    while next_row in results:
+        yield results.pop(next_row)
+        next_row += 1
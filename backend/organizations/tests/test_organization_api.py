@@ -1,8 +1,15 @@
+import json
+from unittest.mock import patch
+
+from django.db import DatabaseError
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from core.models import User
+from chatsAndMessaging.models import Chat, ChatVisibility
+from core.models import OutboundEmail, User
+from organizations import member_import
+from organizations.context import OrganizationContext
 from organizations.models import Membership, Organization, Project, Tag
 
 
@@ -160,6 +167,18 @@ class ComprehensiveOrganizationAPITests(APITestCase):
         self.org.refresh_from_db()
         self.assertEqual(self.org.name, "Updated TestOrg")
 
+    def test_edit_organization_keeps_concurrent_changes(self):
+        url = reverse("edit_organization", args=[self.org.pk])
+        # Organizacja trafia do pamięci podręcznej, a potem zmienia się w bazie
+        OrganizationContext(self.admin_user, self.org.pk).organization
+        Organization.objects.filter(pk=self.org.pk).update(description="Opis z innego żądania")
+
+        response = self.client.put(url, {"name": "Updated TestOrg"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.org.refresh_from_db()
+        self.assertEqual(self.org.name, "Updated TestOrg")
+        self.assertEqual(self.org.description, "Opis z innego żądania")
+
     def test_non_admin_cannot_edit_organization(self):
         self._login("member", "password123", self.org.slug)
         url = reverse("edit_organization", args=[self.org.pk])
@@ -170,10 +189,12 @@ class ComprehensiveOrganizationAPITests(APITestCase):
     # --- Zarządzanie Członkami ---
     def test_admin_can_invite_member(self):
         url = reverse("invite_member", args=[self.org.pk])
-        payload = {"invitee_username": "newbie", "role": "member"}
+        payload = {"invitee_username": "newbie", "invitee_email": "newbie@example.com", "role": "member"}
         response = self.client.post(url, payload, format="json")
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(User.objects.filter(username="newbie").exists())
+        # E-mail z danymi logowania czeka w kolejce, nie jest wysyłany w żądaniu
+        self.assertTrue(OutboundEmail.objects.filter(recipient="newbie@example.com").exists())
 
     def test_non_admin_cannot_invite_member(self):
         self._login("member", "password123", self.org.slug)
@@ -182,6 +203,75 @@ class ComprehensiveOrganizationAPITests(APITestCase):
         response = self.client.post(url, payload, format="json")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_admin_can_import_members_from_csv(self):
+        User.objects.create_user(
+            username="taken", password="pwd", identifier="taken_Test Organization"
+        )
+        public_chat = Chat.objects.create(name="Ogólny", organization=self.org)
+        url = reverse("import_members", args=[self.org.pk])
+        body = (
+            "username,email,role,password\n"
+            "anna,anna@example.com,member,\n"
+            "taken,,member,\n"
+            "bartek,,szef,\n"
+            "celina,celina@example.com,coordinator,Haslo123!\n"
+            "anna,,member,\n"
+        )
+        response = self.client.generic("POST", url, body, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+        self.assertEqual([r["row"] for r in report], [1, 2, 3, 4, 5])
+        self.assertEqual(
+            [r["status"] for r in report], ["created", "error", "error", "created", "error"]
+        )
+        self.assertIn("generated_password", report[0])
+        self.assertNotIn("generated_password", report[3])
+
+        celina = User.objects.get(identifier="celina_Test Organization")
+        self.assertTrue(celina.check_password("Haslo123!"))
+        membership = Membership.objects.get(user=celina, organization=self.org)
+        self.assertEqual(membership.role, "coordinator")
+        # Nowi członkowie widzą publiczne czaty, a e-maile trafiły do kolejki
+        self.assertTrue(ChatVisibility.objects.filter(membership=membership, chat=public_chat).exists())
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_import_members_reports_failures(self):
+        url = reverse("import_members", args=[self.org.pk])
+        body = "username,role\nanna,member\n"
+
+        # Błąd przy walidacji daje zwykłą odpowiedź JSON, a nie ucięty strumień
+        with patch.object(member_import, "_validate", side_effect=DatabaseError("baza niedostępna")):
+            response = self.client.generic("POST", url, body, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn("error", response.json())
+
+        # Błąd zapisu paczki trafia do raportu jako wiersz z błędem
+        with patch.object(member_import, "_create_chunk", side_effect=DatabaseError("zapis nieudany")):
+            response = self.client.generic("POST", url, body, content_type="text/csv")
+            report = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(report, [{"row": 1, "username": "anna", "status": "error", "error": "zapis nieudany"}])
+
+        # Nieoczekiwany błąd w trakcie strumienia kończy raport linią z błędem
+        def interrupted(*args):
+            raise RuntimeError("przerwano")
+            yield
+
+        with patch.object(member_import, "_create_members", side_effect=interrupted):
+            response = self.client.generic("POST", url, body, content_type="text/csv")
+            report = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(report, [{"status": "error", "error": "przerwano"}])
+        self.assertFalse(User.objects.filter(username="anna").exists())
+
+    def test_import_members_requires_admin_and_valid_payload(self):
+        url = reverse("import_members", args=[self.org.pk])
+        response = self.client.post(url, {"members": "nie-lista"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self._login("member", "password123", self.org.slug)
+        response = self.client.post(url, {"members": [{"username": "x"}]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_list_organization_users(self):
         url = reverse("get_organization_users", args=[self.org.pk])
         # Admin może listować
@@ -223,6 +313,18 @@ class ComprehensiveOrganizationAPITests(APITestCase):
         self.member_membership.refresh_from_db()
         self.assertEqual(self.member_membership.role, "coordinator")
 
+    def test_role_change_is_visible_on_next_request(self):
+        # Kontekst organizacji jest cache'owany - zmiana roli musi go unieważnić
+        self._login("member", "password123", self.org.slug)
+        url = reverse("get_organization_users", args=[self.org.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.member_membership.role = "coordinator"
+        self.member_membership.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_admin_can_update_member_profile(self):
         url = reverse(
             "update_member_profile", args=[self.org.pk, self.member_user.username]
@@ -1,10 +1,11 @@
 from datetime import datetime
+import csv
 import json
 import secrets
 
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
@@ -12,6 +13,7 @@ from django.views.decorators.http import require_http_methods
 from kanban.models import KanbanBoard
 from core.email_utils import send_new_user_credentials_email
 
+from . import member_import
 from .models import Membership, Organization, Tag, Project
 
 User = get_user_model()
@@ -181,10 +183,7 @@ def get_user_membership(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         membership_data = {
             "organization_id": membership.organization.id,
@@ -209,23 +208,25 @@ def edit_organization(request, organization_id):
         data = json.loads(request.body)
         name = data.get("name")
         description = data.get("description")
-        username = request.user.username
 
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
 
-        org = Organization.objects.get(id=organization_id)
-
+        # The context's organization is a cached copy; write only the edited
+        # columns to the current row so concurrent edits are not reverted.
+        org = Organization.objects.get(pk=organization_id)
+        changed = []
         if name:
             org.name = name
+            changed.append("name")
         if description:
             org.description = description
+            changed.append("description")
 
-        org.save()
+        if changed:
+            org.save(update_fields=changed)
 
         return JsonResponse(
             {"message": "Organizacja została pomyślnie zaktualizowana"}, status=200
@@ -261,10 +262,7 @@ def invite_member(request, organization_id):
         if not username:
             return JsonResponse({"error": "Brakujące pole: username"}, status=400)
 
-        membership = Membership.objects.get(
-            organization__id=organization_id,
-            user__username=username,
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -281,8 +279,8 @@ def invite_member(request, organization_id):
                 {"error": "Missing field: invitee_username"}, status=400
             )
 
-        invited_by = User.objects.get(username=username)
-        organization = Organization.objects.get(id=organization_id)
+        invited_by = request.user
+        organization = request.org_context.organization
 
         generated_password = raw_password or secrets.token_urlsafe(12)
         identifier = invitee_username + "_" + organization.name
@@ -304,12 +302,13 @@ def invite_member(request, organization_id):
                 organization=organization, user=invitee, role=role, invited_by=invited_by
             )
 
-        send_new_user_credentials_email(
-            recipient_email=invitee_email,
-            username=invitee_username,
-            password=generated_password,
-            organization_name=organization.name,
-        )
+            # Queued with the membership; sent in the background once committed.
+            send_new_user_credentials_email(
+                recipient_email=invitee_email,
+                username=invitee_username,
+                password=generated_password,
+                organization_name=organization.name,
+            )
 
         response_payload = {
             "message": "Członek został pomyślnie zaproszony",
@@ -336,6 +335,49 @@ def invite_member(request, organization_id):
         return JsonResponse({"error": str(e)}, status=400)
 
 
+def _ndjson_report(results):
+    # The status line is already sent, so a failure ends the report with an
+    # error line instead of silently truncating it.
+    try:
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"status": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+
+
+@require_http_methods(["POST"])
+@csrf_exempt
+def import_members(request, organization_id):
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
+
+        if request.org_context.membership.role != "admin":
+            return JsonResponse({"error": "Brak uprawnień"}, status=403)
+
+        upload = request.FILES.get("file")
+        if upload is not None:
+            content_type = "text/csv" if upload.name.lower().endswith(".csv") else upload.content_type
+            rows = member_import.parse_rows(content_type, upload.read())
+        else:
+            rows = member_import.parse_rows(request.content_type, request.body)
+
+        # Validated here, so bad rows or a failing query still get a JsonResponse.
+        results = member_import.import_members(
+            rows, request.org_context.organization, request.user
+        )
+        # One JSON object per row, sent as each chunk of members is committed.
+        return StreamingHttpResponse(
+            _ndjson_report(results), content_type="application/x-ndjson"
+        )
+    except Membership.DoesNotExist:
+        return JsonResponse({"error": "Nie znaleziono członkostwa"}, status=404)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return JsonResponse({"error": f"Nieprawidłowe dane: {str(e)}"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
 @require_http_methods(["GET"])
 @csrf_exempt
 def get_organization_users(request, organization_id):
@@ -343,10 +385,7 @@ def get_organization_users(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        requester_membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        requester_membership = request.org_context.membership
 
         if requester_membership.role == "member":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -382,10 +421,7 @@ def get_project_members(request, organization_id, project_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        requester_membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        requester_membership = request.org_context.membership
 
         project = Project.objects.get(id=project_id, organization__id=organization_id)
         project_tag = project.tag
@@ -429,11 +465,7 @@ def remove_organization_member(request, organization_id, username):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        admin_username = request.user.username
-
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=admin_username
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -458,12 +490,9 @@ def change_member_role(request, organization_id, username):
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
         data = json.loads(request.body)
-        admin_username = request.user.username
         new_role = data.get("new_role")
 
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=admin_username
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -502,12 +531,7 @@ def update_member_profile(request, organization_id, username):
         except json.JSONDecodeError:
             return JsonResponse({"error": "Nieprawidłowy format JSON"}, status=400)
 
-        admin_username = request.user.username
-
-        admin_membership = Membership.objects.get(
-            organization__id=organization_id,
-            user__username=admin_username,
-        )
+        admin_membership = request.org_context.membership
 
         if admin_membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -565,12 +589,9 @@ def edit_permissions(request, organization_id, username):
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
         data = json.loads(request.body)
-        admin_username = request.user.username
         tags_names = data.get("tags", [])
 
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=admin_username
-        )
+        membership = request.org_context.membership
 
         if membership.role == "member":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -630,10 +651,7 @@ def get_all_tags(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -660,10 +678,7 @@ def get_tags(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         tags = membership.permissions.all()
 
@@ -688,10 +703,7 @@ def create_tag(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -705,7 +717,7 @@ def create_tag(request, organization_id):
 
         if not name:
             return JsonResponse({"error": "Brak pola nazwy"}, status=400)
-        organization = Organization.objects.get(id=organization_id)
+        organization = request.org_context.organization
 
         if Tag.objects.filter(name=name, organization=organization).exists():
             return JsonResponse(
@@ -741,10 +753,7 @@ def delete_tag(request, organization_id, tag_name):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -768,10 +777,7 @@ def create_project(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         if membership.role not in ["admin", "coordinator"]:
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -806,7 +812,7 @@ def create_project(request, organization_id):
 
         if not all([name, start_dte, end_dte, tag_name]):
             return JsonResponse({"error": "Brakujące pola"}, status=400)
-        organization = Organization.objects.get(id=organization_id)
+        organization = request.org_context.organization
 
         if Tag.objects.filter(name=tag_name, organization=organization).exists():
             return JsonResponse(
@@ -880,10 +886,7 @@ def update_project(request, organization_id, project_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         if membership.role not in ["admin", "coordinator"]:
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -983,12 +986,7 @@ def get_projects(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-
-        membership = Membership.objects.get(
-            organization__id=organization_id,
-            user__username=username,
-        )
+        membership = request.org_context.membership
 
         if membership.role != "admin":
             return JsonResponse({"error": "Brak uprawnień"}, status=403)
@@ -1010,10 +1008,7 @@ def get_user_projects(request, organization_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         tags = membership.permissions.all()
 
@@ -1035,10 +1030,7 @@ def delete_project(request, organization_id, project_id):
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
-        username = request.user.username
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=username
-        )
+        membership = request.org_context.membership
 
         project = Project.objects.get(id=project_id, organization__id=organization_id)
         
@@ -1068,12 +1060,9 @@ def add_tag_to_user(request, organization_id, username):
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
         data = json.loads(request.body)
-        admin_username = request.user.username
         tag_name = data.get("tag_name")
 
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=admin_username
-        )
+        membership = request.org_context.membership
 
         if membership.role == "member" or (
             membership.role == "coordinator"
@@ -1111,12 +1100,9 @@ def remove_tag_from_user(request, organization_id, username):
             return JsonResponse({"error": "Użytkownik nie jest uwierzytelniony"}, status=401)
 
         data = json.loads(request.body)
-        admin_username = request.user.username
         tag_name = data.get("tag_name")
 
-        membership = Membership.objects.get(
-            organization__id=organization_id, user__username=admin_username
-        )
+        membership = request.org_context.membership
 
         if membership.role == "member" or (
             membership.role == "coordinator"
@@ -18,7 +18,7 @@ export function useChat(
   const { user, tokens } = useAuth() || {};
 
   // Pagination state
-  const [offset, setOffset] = useState(0);
+  const [cursor, setCursor] = useState(null);
   const [hasMore, setHasMore] = useState(true);
   const [loadingMore, setLoadingMore] = useState(false);
 
@@ -123,7 +123,7 @@ export function useChat(
           const headers = { Accept: "application/json" };
           if (tokens?.access) headers.Authorization = `Bearer ${tokens.access}`;
           const historyRes = await fetch(
-            `${BACKEND_BASE}/api/messages/${organizationId}/?chat_id=${chat_id}&limit=10&offset=0`,
+            `${BACKEND_BASE}/api/messages/${organizationId}/?chat_id=${chat_id}&limit=10`,
             { credentials: "include", headers }
           );
           if (historyRes.ok) {
@@ -147,7 +147,7 @@ export function useChat(
                 msg.author_username === (user?.username || username),
             }));
             setMessages(loadedMessages);
-            setOffset(10);
+            setCursor(historyData.before_cursor || null);
             setHasMore(historyData.has_more || false);
             console.log(
               `📜 Loaded ${loadedMessages.length} messages from history for ${channel}, hasMore: ${historyData.has_more}`
@@ -313,7 +313,7 @@ export function useChat(
       setChannel(newChannel);
       setMessages([]);
       // Reset pagination state
-      setOffset(0);
+      setCursor(null);
       setHasMore(true);
     },
     [channel]
@@ -334,7 +334,9 @@ export function useChat(
       const headers = { Accept: "application/json" };
       if (tokens?.access) headers.Authorization = `Bearer ${tokens.access}`;
       const historyRes = await fetch(
-        `${BACKEND_BASE}/api/messages/${organizationId}/?chat_id=${chat_id}&limit=10&offset=${offset}`,
+        `${BACKEND_BASE}/api/messages/${organizationId}/?chat_id=${chat_id}&limit=10${
+          cursor ? `&before=${encodeURIComponent(cursor)}` : ""
+        }`,
         { credentials: "include", headers }
       );
 
@@ -361,7 +363,7 @@ export function useChat(
 
         if (olderMessages.length > 0) {
           setMessages((prev) => [...olderMessages, ...prev]);
-          setOffset((prev) => prev + olderMessages.length);
+          setCursor(historyData.before_cursor || null);
         }
         setHasMore(historyData.has_more || false);
         console.log(
@@ -377,7 +379,7 @@ export function useChat(
     channel,
     loadingMore,
     hasMore,
-    offset,
+    cursor,
     chatMap,
     user?.id,
     user?.username,